@@ -0,0 +1,85 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+Microbenchmarks comparing the regex based color.decolorize and
+color.printed_len against the original sequential str.replace implementation.
+
+Usage (from the root of the repo): PYTHONPATH=. python benchmarks/bench_color.py
+
+To track the performance of the current implementation across versions, use
+the suite in scriptit.bench (python -m scriptit.bench) instead.
+"""
+
+# Standard
+from functools import partial
+import timeit
+
+# Local
+from scriptit import color
+
+
+def legacy_decolorize(x: str) -> str:
+    """The original str.replace based decolorize"""
+    for color_seq in list(color.FG_COLOR_CODES.values()) + list(
+        color.BG_COLOR_CODES.values()
+    ):
+        x = x.replace(f"{color_seq}m", "")
+    x = x.replace(color.COLOR_START, "")
+    x = x.replace(color.COLOR_END, "")
+    x = x.replace("0m", "")
+    return x
+
+
+def legacy_printed_len(x: str) -> int:
+    """The original decolorize based printed length"""
+    return len(legacy_decolorize(x))
+
+
+CASES = {
+    "short_plain": "hello world",
+    "short_color": color.colorize("hello", "red") + " world",
+    "line_mixed": " ".join(
+        color.colorize(f"word{i}", "green") if i % 3 == 0 else f"word{i}"
+        for i in range(20)
+    ),
+    "blob_plain": "lorem ipsum dolor sit amet " * 4000,
+    "blob_color": (color.colorize("lorem", "blue") + " ipsum dolor ") * 4000,
+}
+
+
+def main():
+    print(
+        f"{'case':<14}{'function':<14}{'legacy (us)':>14}{'new (us)':>14}"
+        f"{'speedup':>10}"
+    )
+    for name, text in CASES.items():
+        number = max(1, 200000 // len(text))
+        for label, legacy_fn, new_fn in [
+            ("decolorize", legacy_decolorize, color.decolorize),
+            ("printed_len", legacy_printed_len, color.printed_len),
+        ]:
+            legacy = min(
+                timeit.repeat(partial(legacy_fn, text), number=number, repeat=5)
+            )
+            new = min(timeit.repeat(partial(new_fn, text), number=number, repeat=5))
+            print(
+                f"{name:<14}{label:<14}{legacy / number * 1e6:>14.2f}"
+                f"{new / number * 1e6:>14.2f}{legacy / new:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,9 @@ in a uinx terminal.
 """
 
 # Local
-from . import color, shape, size
+from . import color, metrics, progress, recording, shape, size, stats, terminal
 from .app import TerminalApp
+from .progress import track
 from .refresh_printer import RefreshPrinter
+from .table_view import TableView
+from .widget import Widget
@@ -0,0 +1,276 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+asyncio variants of the RefreshPrinter and TerminalApp that never block the
+event loop on terminal I/O. For example:
+
+async def main():
+    async with AsyncTerminalApp(fps=20) as app:
+        while running:
+            app.add(status())
+            app.refresh()
+            await asyncio.sleep(0.1)
+
+Frames are written through a non-blocking write pipe transport connected to a
+duplicate of the output stream's file descriptor. Streams without a usable file
+descriptor (e.g. io.StringIO) are written to directly. While the transport is
+connected, the file descriptor is in non-blocking mode, so other output to the
+same stream should go through the app (e.g. as log records).
+
+The AsyncTerminalApp draws frames from a task on the event loop at most fps
+times per second. refresh() and captured log records (from any thread) only
+mark the app dirty. When the terminal can't keep up, the app waits for the
+transport's buffer to drain before drawing the latest state, so intermediate
+frames are skipped rather than queued.
+"""
+
+# Standard
+from contextlib import suppress
+from typing import Optional
+import asyncio
+import os
+import threading
+
+# Local
+from .app import TerminalApp
+from .refresh_printer import RefreshPrinter
+
+## Public ######################################################################
+
+
+class AsyncRefreshPrinter(RefreshPrinter):
+    __doc__ = __doc__
+
+    def __init__(self, *args, **kwargs):
+        """Set up the printer. All arguments are passed to RefreshPrinter."""
+        if kwargs.get("adaptive"):
+            raise ValueError(
+                "AsyncRefreshPrinter skips frames based on the transport's flow "
+                "control and does not support adaptive"
+            )
+        super().__init__(*args, **kwargs)
+        self._transport = None
+        self._protocol = None
+        self._fileno = None
+        self._was_blocking = True
+
+    async def __aenter__(self) -> "AsyncRefreshPrinter":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.aclose()
+
+    @property
+    def connected(self) -> bool:
+        """Whether frames are being written through the pipe transport"""
+        return self._transport is not None
+
+    async def start(self):
+        """Connect the non-blocking transport for the output stream if it has a
+        file descriptor that supports it
+        """
+        if self._transport is not None:
+            return
+        try:
+            fileno = self.write_stream.fileno()
+        except (AttributeError, OSError, ValueError):
+            return
+        self.write_stream.flush()
+        was_blocking = os.get_blocking(fileno)
+        pipe = os.fdopen(os.dup(fileno), "wb", buffering=0)
+        loop = asyncio.get_running_loop()
+        try:
+            self._transport, self._protocol = await loop.connect_write_pipe(
+                lambda: _WriteProtocol(loop), pipe
+            )
+        except (OSError, ValueError):
+            # Regular files are not supported by pipe transports
+            pipe.close()
+            os.set_blocking(fileno, was_blocking)
+            return
+        self._fileno = fileno
+        self._was_blocking = was_blocking
+
+    async def drain(self):
+        """Wait until the transport is ready to accept more output"""
+        if self._protocol is not None:
+            await self._protocol.drain()
+
+    async def aclose(self):
+        """Write everything that is buffered, disconnect the transport and close
+        the recording
+        """
+        if self._transport is not None:
+            transport, self._transport = self._transport, None
+            protocol, self._protocol = self._protocol, None
+            transport.close()
+            await protocol.wait_closed()
+            os.set_blocking(self._fileno, self._was_blocking)
+        self.close()
+
+    ## Implementation ############################################################
+
+    def _write(self, text: str):
+        """Hand the text to the transport without blocking"""
+        if self._transport is None:
+            super()._write(text)
+            return
+        encoding = getattr(self.write_stream, "encoding", None) or "utf-8"
+        self._transport.write(text.encode(encoding, "replace"))
+
+
+class AsyncTerminalApp(TerminalApp):
+    __doc__ = __doc__
+
+    PRINTER_TYPE = AsyncRefreshPrinter
+
+    def __init__(self, *args, fps: float = 30.0, **kwargs):
+        """Set up the app
+
+        Args:
+            *args: Positional arguments for TerminalApp
+            fps (float): The maximum number of frames to draw per second
+            **kwargs: Keyword arguments for TerminalApp
+        """
+        if fps <= 0:
+            raise ValueError(f"Invalid fps: {fps}")
+        super().__init__(*args, **kwargs)
+        self.fps = fps
+        self._loop = None
+        self._loop_thread = None
+        self._dirty = None
+        self._force = False
+        self._task = None
+
+    async def __aenter__(self) -> "AsyncTerminalApp":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.aclose()
+
+    async def start(self):
+        """Connect the printer and start drawing frames on the running loop"""
+        if self._task is not None:
+            return
+        await self.printer.start()
+        self._dirty = asyncio.Event()
+        self._loop_thread = threading.get_ident()
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    def refresh(self, force=False):
+        """Take the content added since the last refresh and mark the app dirty
+        so that it is drawn on the next tick. Before the app is started, this
+        draws immediately.
+        """
+        if self._loop is None:
+            super().refresh(force=force)
+            return
+        with self._content_lock:
+            self.previous_content_entities = self._take_content()
+        self._force = self._force or force
+        self._mark_dirty()
+
+    async def aclose(self):
+        """Stop drawing, draw the final frame if needed, write everything that
+        is buffered and release the app's resources
+        """
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            if self._dirty.is_set():
+                await self.printer.drain()
+                self._refresh(force=True, use_previous=True)
+        await self.printer.aclose()
+        self._loop = None
+        self.close()
+
+    ## Implementation ############################################################
+
+    def _on_log(self):
+        """Mark the app dirty once it is running. Before that, captured log
+        records are handled as in TerminalApp.
+        """
+        if self._loop is None:
+            super()._on_log()
+        else:
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        """Wake up the drawing task from any thread"""
+        loop = self._loop
+        if loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._dirty.set()
+            return
+        # The loop may be closed while the record is being emitted
+        with suppress(RuntimeError):
+            loop.call_soon_threadsafe(self._dirty.set)
+
+    async def _run(self):
+        """Drawing task body"""
+        interval = 1.0 / self.fps
+        while True:
+            await self._dirty.wait()
+            await self.printer.drain()
+            self._dirty.clear()
+            force, self._force = self._force, False
+            self._refresh(force=force, use_previous=True, blocking=False)
+            await asyncio.sleep(interval)
+
+
+## Impl ########################################################################
+
+
+class _WriteProtocol(asyncio.Protocol):
+    """Protocol for the write pipe that tracks flow control and closing"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._paused = False
+        self._drain_waiter: Optional[asyncio.Future] = None
+        self._closed = loop.create_future()
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_drain()
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._paused = False
+        self._wake_drain()
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    async def drain(self):
+        if self._paused:
+            self._drain_waiter = self._loop.create_future()
+            await self._drain_waiter
+
+    async def wait_closed(self):
+        await self._closed
+
+    def _wake_drain(self):
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
@@ -15,25 +15,61 @@
 ################################################################################
 """
 This utility is used to create a terminal app that has a logging panel and an
-output panel for non-log output. It also offers an embedded mode which will
-simply route all logging and output lines to the standard python logger.
+output panel for non-log output. It also offers an embedded mode for output
+that is not a terminal (e.g. a pipe to a log collector): when the printer is
+append-only, each frame writes the new log lines followed by the content lines
+that changed since the previous frame, without any panel framing or cursor
+control.
+
+The app can be used from multiple threads. Content added with add() goes into a
+buffer owned by the calling thread and the buffers are merged in the order the
+content was added when a frame is drawn, so adding content never contends with
+other threads. Frames are assembled and written while holding a single render
+lock, since the printer's report is shared by all threads. Redraws triggered by
+log records never wait for that lock: if another thread is drawing, the redraw
+is handed off to that thread, which draws again once it finishes.
+
+Log records emitted on the thread that created the app are drawn right away on
+that thread, after the logging handler's lock is released so that other threads
+logging through the same handler don't wait for the draw. Records emitted on
+other threads never do terminal I/O: their redraws are handed off to a
+background drawing thread (started the first time another thread logs), which
+coalesces them. With max_fps, all log-triggered redraws go through the
+rate-limited background thread instead.
 """
 
 # Standard
 from functools import partial
-from io import StringIO
-from typing import Callable, Optional, TextIO
+from itertools import count
+from operator import itemgetter
+from typing import Any, Callable, List, Optional, TextIO, Tuple
+import heapq
 import logging
-import shutil
+import threading
+import time
+import warnings
 
 # Local
-from .refresh_printer import RefreshPrinter
+from .background_writer import BackgroundWriter
+from .log_buffer import LogBuffer
+from .metrics import MetricsPanel, MetricsRegistry
+from .refresh_printer import RefreshPrinter, _content_lines, _resolve_content
+from .scheduler import FrameScheduler
+from .stats import RenderStats
+from .terminal import get_terminal_size
+from .widget import Widget
 
 
 class TerminalApp:
     __doc__ = __doc__
 
     CONSOLE_START = "== CONSOLE "
+    METRICS_START = "== METRICS "
+    PRINTER_TYPE = RefreshPrinter
+
+    # Rate limit for the background thread that draws the redraws for records
+    # logged on other threads when max_fps is not set
+    HANDOFF_MAX_FPS = 1000.0
 
     ## Construction ##############################################################
 
@@ -45,6 +81,17 @@ class TerminalApp:
         log_file: Optional[str] = None,
         preserve_log_handlers: bool = False,
         *args,
+        log_buffer_size: int = 10000,
+        max_fps: Optional[float] = None,
+        log_file_async: bool = False,
+        log_file_queue_size: int = 10000,
+        log_file_flush_interval: float = 1.0,
+        log_file_block_on_full: bool = True,
+        lazy_log_format: bool = False,
+        dedupe_log_records: bool = False,
+        metrics: Optional[MetricsRegistry] = None,
+        stats: Optional[RenderStats] = None,
+        stats_footer: bool = False,
         **kwargs,
     ):
         """Set up the app with configuration for how to display in the terminal
@@ -61,6 +108,36 @@ class TerminalApp:
             preserve_log_handlers (bool): If true, log messages will be emitted
                 by existing handlers as well as being captured by the app's
                 handler wrapper
+            log_buffer_size (int): The maximum number of log lines to retain in
+                memory for display in the log panel
+            max_fps (Optional[float]): If set, redraws triggered by log records
+                are coalesced and performed on a background thread at most this
+                many times per second rather than once per record. Call close()
+                (or use the app as a context manager) to flush the final frame.
+            log_file_async (bool): Write to the log file from a background
+                thread in large batches so that logging calls never wait on
+                disk I/O. Call close() (or use the app as a context manager) to
+                drain the pending records.
+            log_file_queue_size (int): With log_file_async, the maximum number
+                of records waiting to be written
+            log_file_flush_interval (float): With log_file_async, the maximum
+                number of seconds between flushes of the log file
+            log_file_block_on_full (bool): With log_file_async, whether logging
+                calls block (True) or drop the record (False) when the queue is
+                full
+            lazy_log_format (bool): Store raw log records and only format the
+                ones that are displayed in the log panel (or written to the log
+                file). Formatted text is memoized per record.
+            dedupe_log_records (bool): Capture each log record once, no matter
+                how many handlers it passes through on its way up the logger
+                hierarchy, rather than once per handler
+            metrics (Optional[MetricsRegistry]): Metrics to show in a panel
+                below the log console. They are only read when a frame is drawn.
+            stats (Optional[RenderStats]): Stats to record the cost of each
+                frame and the number of captured log records in
+            stats_footer (bool): Show a one-line summary of the stats below the
+                content (not shown in embedded mode). Stats are created if not
+                given.
         """
         self.log_console_size = log_console_size
         self.log_console_pct = log_console_pct
@@ -69,52 +146,157 @@ class TerminalApp:
             log_console_pct > 0 and log_console_pct <= 1.0
         )
 
+        # Set up the optional instrumentation
+        if stats_footer and stats is None:
+            stats = RenderStats()
+        self.stats = stats
+        self.stats_footer = stats_footer
+
         # Set up the log handlers
-        self.log_string_output = StringIO()
-        self.log_stream = self.log_string_output
+        self._scheduler = None
+        self._handoff_scheduler = None
+        self._handoff_lock = threading.Lock()
+        self._owner_thread = threading.get_ident()
+        self._render_lock = threading.Lock()
+        self._redraw_pending = False
+        self.log_buffer = LogBuffer(log_buffer_size)
+        self.lazy_log_format = lazy_log_format
+        self.log_stream = None if lazy_log_format else self.log_buffer
         if log_file is not None:
-            # Hold the file open here for writing and close on __del__
+            # Hold the file open here for writing and close on close() or __del__
             self.log_file_handle = open(log_file, "w")  # noqa: SIM115
-            self.log_stream = TextOutputSplitter(
-                self.log_string_output, self.log_file_handle
+            if log_file_async:
+                self.log_file_handle = BackgroundWriter(
+                    self.log_file_handle,
+                    queue_size=log_file_queue_size,
+                    flush_interval=log_file_flush_interval,
+                    block_on_full=log_file_block_on_full,
+                )
+            self.log_stream = (
+                self.log_file_handle
+                if lazy_log_format
+                else TextOutputSplitter(self.log_buffer, self.log_file_handle)
             )
-        self._wrap_all_logging(preserve_log_handlers)
+        self._wrap_all_logging(preserve_log_handlers, dedupe_log_records)
 
-        # Set up a buffer to store non-log lines in
+        # Set up per-thread buffers to store non-log lines in
         self.previous_content_entities = []
-        self.content_entries = []
+        self._content_local = threading.local()
+        self._content_buffers: List[Tuple[threading.Thread, list]] = []
+        self._content_buffers_lock = threading.Lock()
+        self._content_lock = threading.Lock()
+        self._content_sequence = count()
+
+        # Mark of the last log line written in embedded (append-only) mode
+        self._log_mark = 0
+
+        # Set up the panel for live metrics
+        self.metrics_panel = MetricsPanel(metrics) if metrics is not None else None
 
         # Set up the refresh printer that will manage the output on the screen
-        self.printer = RefreshPrinter(*args, **kwargs)
+        self.printer = self.PRINTER_TYPE(*args, stats=stats, **kwargs)
+
+        # Set up the scheduler for log-triggered redraws if rate limited
+        if max_fps is not None:
+            self._scheduler = FrameScheduler(self._redraw, max_fps)
 
     def __del__(self):
         if log_file_handle := getattr(self, "log_file_handle", None):
             log_file_handle.close()
 
+    def __enter__(self) -> "TerminalApp":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
     ## Interface #################################################################
 
     def add(self, content):
-        self.content_entries.append(content)
+        """Add content to be shown in the next frame. This only touches a buffer
+        owned by the calling thread.
+
+        Content may be lazy: callables are called and generators are joined as
+        lines only if the content falls in the visible part of the panel.
+        """
+        buffer = getattr(self._content_local, "buffer", None)
+        if buffer is None:
+            buffer = self._content_local.buffer = []
+            with self._content_buffers_lock:
+                self._content_buffers.append((threading.current_thread(), buffer))
+        buffer.append((next(self._content_sequence), content))
+
+    @property
+    def log_string_output(self) -> LogBuffer:
+        """Deprecated: the captured log lines are held in log_buffer, which
+        also supports getvalue()
+        """
+        warnings.warn(
+            "TerminalApp.log_string_output is deprecated, use log_buffer instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return self.log_buffer
+
+    @property
+    def content_entries(self) -> List[Any]:
+        """The content added since the last refresh, in the order it was added"""
+        with self._content_buffers_lock:
+            buffers = [list(buffer) for _, buffer in self._content_buffers]
+        return [entry for _, entry in heapq.merge(*buffers, key=itemgetter(0))]
+
+    @content_entries.setter
+    def content_entries(self, entries: List[Any]):
+        """Replace the content added since the last refresh"""
+        with self._content_lock:
+            self._take_content()
+            for entry in entries:
+                self.add(entry)
 
     def refresh(self, force=False):
         self._refresh(force=force, use_previous=False)
 
+    def close(self):
+        """Flush any pending frame, stop capturing log records and release the
+        app's resources
+        """
+        if self._scheduler is not None:
+            self._scheduler.stop()
+        if self._handoff_scheduler is not None:
+            self._handoff_scheduler.stop()
+        self.printer.close()
+        self._unwrap_all_logging()
+        if log_file_handle := getattr(self, "log_file_handle", None):
+            log_file_handle.close()
+
     ## Implementation ############################################################
 
-    def _wrap_all_logging(self, preserve_log_handlers: bool):
+    def _wrap_all_logging(self, preserve_log_handlers: bool, dedupe: bool = False):
         """This helper takes ownership of all logging handlers now and for the
         future (unless another framework patches the root logger). The goal is
         to funnel _all_ logging messages to the app's output stream, regardless
         of when log configuration is invoked.
         """
-        # Local binding for instantiating wrapped handlers
-        make_wrapped_handler: Callable[[logging.Handler], HandlerWrapper] = partial(
+        # Local binding for instantiating wrapped handlers. Once the app is
+        # closed, handlers are no longer wrapped.
+        self._logging_root = logging.root
+        self._handler_wrappers: Optional[List[HandlerWrapper]] = []
+        wrap_handler = partial(
             HandlerWrapper,
             log_stream=self.log_stream,
             log_to_wrapped=preserve_log_handlers,
-            callback=self.refresh,
+            callback=self._on_log if self.stats is None else self._on_log_counted,
+            log_buffer=self.log_buffer if self.lazy_log_format else None,
+            dedupe=dedupe,
         )
 
+        def make_wrapped_handler(handler: logging.Handler) -> logging.Handler:
+            if self._handler_wrappers is None:
+                return handler
+            wrapper = wrap_handler(handler)
+            self._handler_wrappers.append(wrapper)
+            return wrapper
+
         # Update all existing handlers
         # NOTE: The choice here to update _all_ handlers is based on the
         #   assumption that a user will be unlikely to configure multiple
@@ -122,7 +304,9 @@ class TerminalApp:
         #   up duplicated for each handler. The alternative is to attempt to
         #   decide _which_ of the multiple handlers should be wrapped, but this
         #   gets further complicated by needing to handle future handlers, so
-        #   the simpler choice is to just let this be a user problem.
+        #   the simpler choice is to just let this be a user problem. Users that
+        #   do configure multiple handlers can enable dedupe_log_records to have
+        #   each record captured only by the first wrapper that sees it.
         for logger in [logging.root] + list(logging.root.manager.loggerDict.values()):
             if isinstance(logger, logging.PlaceHolder):
                 continue
@@ -132,10 +316,12 @@ class TerminalApp:
 
         # When new loggers are set up and have handlers directly configured,
         # intercept them and wrap the handlers
-        class WrappedLogger(logging.Logger):
+        class WrappedLogger(_CapturingLogger):
             def addHandler(self, handler: logging.Handler):
                 super().addHandler(make_wrapped_handler(handler))
 
+        self._orig_logger_class = logging.root.manager.loggerClass
+        self._wrapped_logger_class = WrappedLogger
         logging.root.manager.setLoggerClass(WrappedLogger)
 
         # Monkey-patch the addHandler function on the root logger so that when
@@ -145,15 +331,156 @@ class TerminalApp:
         def addHandler(handler: logging.Handler):
             orig_root_add_handler(make_wrapped_handler(handler))
 
+        self._orig_root_add_handler = logging.root.__dict__.get("addHandler")
+        self._root_add_handler = addHandler
         logging.root.addHandler = addHandler
 
-    def _refresh(self, force, use_previous):
+    def _unwrap_all_logging(self):
+        """Stop capturing log records: put the wrapped handlers back in place
+        of their wrappers and undo the patches made by _wrap_all_logging (unless
+        something else has replaced them since)
+        """
+        wrappers, self._handler_wrappers = self._handler_wrappers, None
+        if wrappers is None:
+            return
+        for wrapper in wrappers:
+            wrapper.active = False
+        wrapper_ids = {id(wrapper) for wrapper in wrappers}
+        root = self._logging_root
+        for logger in [root] + list(root.manager.loggerDict.values()):
+            if isinstance(logger, logging.PlaceHolder):
+                continue
+            for i, handler in enumerate(logger.handlers):
+                if id(handler) in wrapper_ids:
+                    logger.handlers[i] = handler.wrapped_handler
+        if root.manager.loggerClass is self._wrapped_logger_class:
+            root.manager.loggerClass = self._orig_logger_class
+        if root.__dict__.get("addHandler") is self._root_add_handler:
+            if self._orig_root_add_handler is None:
+                del root.addHandler
+            else:
+                root.addHandler = self._orig_root_add_handler
+
+    def _on_log(self):
+        """Callback for captured log records. With a scheduler, the app is
+        simply marked dirty. Without one, records logged on the thread that
+        created the app are redrawn immediately unless another thread is already
+        drawing, and redraws for records logged on other threads are handed off
+        to the background drawing thread.
+        """
+        if self._scheduler is not None:
+            self._scheduler.mark_dirty()
+        elif threading.get_ident() == self._owner_thread:
+            self._refresh(force=False, use_previous=True, blocking=False)
+        else:
+            self._get_handoff_scheduler().mark_dirty()
+
+    def _get_handoff_scheduler(self) -> FrameScheduler:
+        """Get the scheduler that draws redraws for records logged on other
+        threads, starting it on first use
+        """
+        scheduler = self._handoff_scheduler
+        if scheduler is None:
+            with self._handoff_lock:
+                if self._handoff_scheduler is None:
+                    self._handoff_scheduler = FrameScheduler(
+                        partial(self._refresh, force=False, use_previous=True),
+                        self.HANDOFF_MAX_FPS,
+                    )
+                scheduler = self._handoff_scheduler
+        return scheduler
+
+    def _on_log_counted(self):
+        """Callback for captured log records that counts them in the stats"""
+        self.stats.count_log_record()
+        self._on_log()
+
+    def _redraw(self):
+        """Redraw the current state of the app without consuming new content"""
+        self._refresh(force=True, use_previous=True)
+
+    def _refresh(self, force, use_previous, blocking=True):
         """
         Refresh function with full functionality for console and main panes
+
+        If blocking is False and another thread holds the render lock, the
+        redraw is flagged as pending and left to the thread holding the lock,
+        which draws again before returning.
         """
+        if not use_previous:
+            with self._content_lock:
+                self.previous_content_entities = self._take_content()
+        while True:
+            if not self._render_lock.acquire(blocking=blocking):
+                # Flag the redraw, then try once more in case the holder
+                # released the lock before it could see the flag
+                self._redraw_pending = True
+                if not self._render_lock.acquire(blocking=False):
+                    return
+            try:
+                self._redraw_pending = False
+                self._draw(force)
+            finally:
+                self._render_lock.release()
+            if not self._redraw_pending:
+                return
+            blocking = False
+
+    def _take_content(self) -> List[Any]:
+        """Remove the content from all threads' buffers and merge it in the
+        order it was added
+        """
+        with self._content_buffers_lock:
+            buffers = list(self._content_buffers)
+        chunks = []
+        for _, buffer in buffers:
+            # Only this function removes entries, so anything the owning thread
+            # appends between these two steps stays in its buffer
+            chunk = buffer[: len(buffer)]
+            del buffer[: len(chunk)]
+            chunks.append(chunk)
+
+        # Drop the buffers of threads that have exited
+        if any(not thread.is_alive() for thread, _ in buffers):
+            with self._content_buffers_lock:
+                self._content_buffers = [
+                    (thread, buffer)
+                    for thread, buffer in self._content_buffers
+                    if thread.is_alive() or buffer
+                ]
+        return [entry for _, entry in heapq.merge(*chunks, key=itemgetter(0))]
+
+    def _visible_content(self, width: int, height: int) -> List[str]:
+        """Get the lines of content that fit in the content panel. Entries are
+        evaluated and wrapped from the bottom up until the panel is full, so
+        entries that scrolled out of view are never evaluated. Lazy entries
+        are replaced by their value once evaluated.
+        """
+        entries = self.previous_content_entities
+        lines = []
+        for idx in range(len(entries) - 1, -1, -1):
+            if len(lines) >= height:
+                break
+            entry = entries[idx]
+            if not isinstance(entry, (str, Widget)):
+                entry = entries[idx] = _resolve_content(entry)
+            lines.extend(reversed(_content_lines(entry, width, height)))
+        lines = lines[:height]
+        lines.reverse()
+        return lines
+
+    def _draw(self, force):
+        """Assemble the frame for the current content and write it. The render
+        lock must be held.
+        """
+        if self.stats is not None:
+            self.stats.frame_start = time.perf_counter()
+        if self.printer.append_only:
+            self._draw_embedded(force)
+            return
 
         # Get terminal size info
-        term_info = shutil.get_terminal_size()
+        term_info = get_terminal_size()
         width = term_info.columns
         height = term_info.lines
 
@@ -165,40 +492,52 @@ class TerminalApp:
 
         # Add the log console
         heading = self.CONSOLE_START
-        raw_log_lines = filter(
-            lambda line: bool(line.strip()),
-            self.log_string_output.getvalue().split("\n"),
-        )
-        log_lines = []
-        for line in raw_log_lines:
-            while len(line) > width:
-                log_lines.append(line[:width])
-                line = line[width:]
-            log_lines.append(line)
-        # DEBUG
-        print(log_lines)
+        log_lines = self.log_buffer.tail(max_log_lines, width)
         self.printer.add(heading + "=" * max(0, width - len(heading)))
-        for line in log_lines[-max_log_lines:]:
+        for line in log_lines:
             self.printer.add(line)
         if self.pad_log_console:
             for _ in range(max(0, max_log_lines - len(log_lines))):
                 self.printer.add("")
+
+        # Add the metrics panel, taking its lines from the content
+        if self.metrics_panel is not None:
+            heading = self.METRICS_START
+            metrics_lines = self.metrics_panel.render(width, max(0, content_height - 2))
+            self.printer.add(heading + "=" * max(0, width - len(heading)))
+            for line in metrics_lines:
+                self.printer.add(line, wrap=False)
+            content_height -= len(metrics_lines) + 1
         self.printer.add("=" * width)
 
-        # Add the content
-        content = (
-            self.content_entries if not use_previous else self.previous_content_entities
-        )
-        for line in content[-content_height:]:
-            self.printer.add(line)
+        # Add the content, leaving room for the stats footer
+        if self.stats_footer:
+            content_height -= 1
+        for line in self._visible_content(width, content_height):
+            self.printer.add(line, wrap=False)
+        if self.stats_footer:
+            self.printer.add(self.stats.footer(width), wrap=False)
 
         # Refresh
         self.printer.refresh(force=force)
 
-        # Reset the content buffer if not using the previous one
-        if not use_previous:
-            self.previous_content_entities = self.content_entries
-            self.content_entries = []
+    def _draw_embedded(self, force):
+        """Write the new log lines and let the append-only printer write the
+        content lines that changed. The render lock must be held.
+        """
+        log_lines, self._log_mark = self.log_buffer.lines_since(self._log_mark)
+        self.printer.emit(log_lines)
+        if self.metrics_panel is not None:
+            width = get_terminal_size().columns
+            n_metrics = len(self.metrics_panel.registry)
+            for line in self.metrics_panel.render(width, n_metrics):
+                self.printer.add(line, wrap=False)
+        entries = self.previous_content_entities
+        for idx, entry in enumerate(entries):
+            if not isinstance(entry, (str, Widget)):
+                entry = entries[idx] = _resolve_content(entry)
+            self.printer.add(entry, wrap=False)
+        self.printer.refresh(force=force)
 
 
 ## Impl ########################################################################
@@ -215,7 +554,6 @@ class TextOutputSplitter(TextIO):
         """Write to all streams"""
         for s in self.streams:
             s.write(*args, **kwargs)
-            s.flush()
 
     def flush(self):
         """Flush all streams"""
@@ -231,22 +569,36 @@ class HandlerWrapper(logging.Handler):
     def __init__(
         self,
         wrapped_handler: logging.Handler,
-        log_stream: TextIO,
+        log_stream: Optional[TextIO],
         log_to_wrapped: bool = False,
         callback: Optional[Callable[[], None]] = None,
+        log_buffer: Optional[LogBuffer] = None,
+        dedupe: bool = False,
     ):
         """Set up with the handler to wrap
 
         Args:
             wrapped_handler (logging.Handler): The handler to wrap
-            log_stream (TextIO): The output text stream
+            log_stream (Optional[TextIO]): The output text stream
             log_to_wrapped (bool): If True, the wrapped handler's emit will be
                 called after the formatted record is written to the stream
+            callback (Optional[Callable[[], None]]): Function to call after
+                each record is captured
+            log_buffer (Optional[LogBuffer]): If given, records are appended to
+                the buffer unformatted and only formatted when displayed (or
+                when written to log_stream)
+            dedupe (bool): If True, a record is only captured (and the callback
+                only called) by the first wrapper that handles it. Other
+                wrappers writing to the same destination skip it.
         """
         self.wrapped_handler = wrapped_handler
         self.log_stream = log_stream
+        self.log_buffer = log_buffer
+        self.dedupe = dedupe
+        self._sink_id = id(log_buffer if log_buffer is not None else log_stream)
         self.log_to_wrapped = log_to_wrapped
         self.callback = callback
+        self.active = True
         super().__init__()
 
         # Forward all handler methods to the wrapped handler except those
@@ -267,12 +619,88 @@ class HandlerWrapper(logging.Handler):
         ]:
             setattr(self, method_name, getattr(self.wrapped_handler, method_name))
 
+    def handle(self, record: logging.LogRecord):
+        """Emit the record while holding the wrapped handler's lock, as
+        logging.Handler.handle does, but only call the callback (which may draw
+        a frame) once the lock is released so that other threads logging
+        through the same handler never wait on terminal I/O
+        """
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.acquire()
+            try:
+                captured = self._emit(record)
+            finally:
+                self.release()
+            if captured:
+                self._notify(record)
+        return rv
+
     def emit(self, record: logging.LogRecord):
-        """Capture a record as it is emitted and write it to the stream"""
-        formatted = self.wrapped_handler.format(record)
-        self.log_stream.write(formatted + "\n")
-        self.log_stream.flush()
-        if self.log_to_wrapped:
+        """Capture a record as it is emitted and write it to the stream. Once
+        the wrapper is inactive, records are only emitted by the wrapped handler.
+        """
+        if self._emit(record):
+            self._notify(record)
+
+    def _emit(self, record: logging.LogRecord) -> bool:
+        """Capture the record and emit it with the wrapped handler if
+        configured to
+
+        Returns:
+            captured (bool): Whether the record was captured by this wrapper
+        """
+        if not self.active:
             self.wrapped_handler.emit(record)
-        if self.callback:
-            self.callback()
+            return False
+        try:
+            captured = self._capture(record)
+            if self.log_to_wrapped:
+                self.wrapped_handler.emit(record)
+            return captured
+        except Exception:
+            self.handleError(record)
+            return False
+
+    def _notify(self, record: logging.LogRecord):
+        """Call the callback for a captured record"""
+        if self.callback is not None:
+            try:
+                self.callback()
+            except Exception:
+                self.handleError(record)
+
+    def _capture(self, record: logging.LogRecord) -> bool:
+        """Write the record to the capture destination unless deduplicating
+        and another wrapper already captured it
+
+        Returns:
+            captured (bool): Whether the record was captured by this wrapper
+        """
+        if self.dedupe:
+            if record.__dict__.get(_CAPTURED_BY_ATTR) == self._sink_id:
+                return False
+            record.__dict__[_CAPTURED_BY_ATTR] = self._sink_id
+        if self.log_buffer is not None:
+            entry = self.log_buffer.append_record(record, self.wrapped_handler.format)
+            if self.log_stream is not None:
+                self.log_stream.write(entry.text + "\n")
+                self.log_stream.flush()
+        else:
+            formatted = self.wrapped_handler.format(record)
+            self.log_stream.write(formatted + "\n")
+            self.log_stream.flush()
+        return True
+
+
+class _CapturingLogger(logging.Logger):
+    """Base for the logger classes installed by TerminalApp to wrap handlers
+    added to new loggers, so that they can be recognized (e.g. by
+    multiprocess.init_worker in a forked worker)
+    """
+
+
+## Record attribute used to mark which capture destination handled a record
+_CAPTURED_BY_ATTR = "_scriptit_captured_by"
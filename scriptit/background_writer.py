@@ -0,0 +1,144 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+The BackgroundWriter is a text stream that hands writes off to a background
+thread through a bounded queue. The background thread batches everything that
+is queued into a single large write to the wrapped stream and only flushes the
+wrapped stream periodically, so the cost of a write on the calling thread is a
+single queue put. When the queue is full, writes either block until there is
+room or are dropped (and counted). Closing the writer drains the queue, and
+writes after close are dropped.
+
+Since writes usually come from logging calls on arbitrary threads, write()
+never raises. If writing to (or flushing) the wrapped stream fails, the
+background thread keeps draining the queue so that blocked writers and close()
+never hang. The text of the failed batch is lost, and the error is raised from
+close().
+"""
+
+# Standard
+from typing import Optional, TextIO
+import atexit
+import queue
+import threading
+import time
+
+## Public ######################################################################
+
+
+class BackgroundWriter(TextIO):
+    __doc__ = __doc__
+
+    def __init__(
+        self,
+        stream: TextIO,
+        queue_size: int = 10000,
+        flush_interval: float = 1.0,
+        block_on_full: bool = True,
+    ):
+        """Set up the writer and start the background thread
+
+        Args:
+            stream (TextIO): The stream to write to
+            queue_size (int): The maximum number of pending writes
+            flush_interval (float): The maximum number of seconds between
+                flushes of the wrapped stream
+            block_on_full (bool): If True, writes block while the queue is full.
+                If False, they are dropped.
+        """
+        self.stream = stream
+        self.flush_interval = flush_interval
+        self.block_on_full = block_on_full
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, text: str) -> int:
+        """Queue the text to be written
+
+        Args:
+            text (str): The text to write
+
+        Returns:
+            n_chars (int): The number of characters queued (0 if dropped)
+        """
+        if self._closed:
+            self.dropped += 1
+            return 0
+        try:
+            self._queue.put(text, block=self.block_on_full)
+        except queue.Full:
+            self.dropped += 1
+            return 0
+        return len(text)
+
+    def flush(self):
+        """Flushing is handled by the background thread, so this does not block
+        on the wrapped stream
+        """
+
+    def close(self):
+        """Write everything that is queued, flush and close the wrapped stream"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+        self.stream.close()
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    ## Implementation ############################################################
+
+    def _run(self):
+        """Background thread body"""
+        last_flush = time.monotonic()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = _STOP in batch
+            if stop:
+                batch = [item for item in batch if item is not _STOP]
+            now = time.monotonic()
+            try:
+                if batch:
+                    self.stream.write("".join(batch))
+                if stop or now - last_flush >= self.flush_interval:
+                    last_flush = now
+                    self.stream.flush()
+            except Exception as err:
+                # Keep draining so that writers and close() don't hang
+                self._error = err
+            if stop:
+                return
+
+
+## Impl ########################################################################
+
+_STOP = object()
@@ -0,0 +1,369 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+Benchmarks for the hot paths of scriptit, used to check whether a change (or an
+upgrade) makes terminal apps slower. For example:
+
+python -m scriptit.bench --output before.json
+... upgrade ...
+python -m scriptit.bench --baseline before.json --max-ratio 1.2
+
+Each benchmark times a single operation (e.g. one call to color.decolorize or
+one RefreshPrinter frame) at several sizes. The number of calls per timing is
+calibrated so that each timing takes at least min_time seconds, and the median
+of the repeated timings is reported. Results are printed as JSON. When a
+baseline file from a previous run is given, each result also holds the baseline
+time and the ratio of the current time to it, and the exit status is non-zero
+if any ratio exceeds max_ratio.
+
+All output goes to an in-memory FakeTerminal and the terminal geometry is fixed
+while the benchmarks run, so results do not depend on the real terminal.
+"""
+
+# Standard
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# Local
+from . import color, shape, size, terminal
+from .app import HandlerWrapper, TextOutputSplitter
+from .log_buffer import LogBuffer
+from .refresh_printer import RefreshPrinter
+
+## Public ######################################################################
+
+
+class FakeTerminal(io.TextIOBase):
+    """In-memory text stream that behaves like a terminal and discards what is
+    written, keeping only a count of the characters
+    """
+
+    def __init__(self):
+        self.chars = 0
+
+    def isatty(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.chars += len(text)
+        return len(text)
+
+
+# Map from benchmark name to a setup function returning the operation to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def run_benchmarks(
+    pattern: Optional[str] = None,
+    min_time: float = 0.05,
+    repeat: int = 5,
+    columns: int = 120,
+    lines: int = 40,
+) -> Dict[str, Dict[str, float]]:
+    """Run the benchmarks
+
+    Args:
+        pattern (Optional[str]): Only run benchmarks whose name contains this
+        min_time (float): The minimum number of seconds for each timing
+        repeat (int): The number of timings per benchmark
+        columns (int): The terminal width to use
+        lines (int): The terminal height to use
+
+    Returns:
+        results (Dict[str, Dict[str, float]]): For each benchmark, the median
+            and minimum seconds per operation and the number of operations per
+            timing
+    """
+    results = {}
+    with _terminal_geometry(columns, lines):
+        for name, setup in BENCHMARKS.items():
+            if pattern is None or pattern in name:
+                results[name] = _time_op(setup(), min_time, repeat)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+) -> List[str]:
+    """Add the baseline times and ratios to the results
+
+    Args:
+        results (Dict[str, Dict[str, float]]): The current results, updated in
+            place
+        baseline (Dict[str, Dict[str, float]]): The results of a previous run
+
+    Returns:
+        missing (List[str]): The names of the current results that are not in
+            the baseline
+    """
+    missing = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            missing.append(name)
+            continue
+        result["baseline"] = previous["seconds"]
+        result["ratio"] = result["seconds"] / previous["seconds"]
+    return missing
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks from the command line"""
+    parser = argparse.ArgumentParser(
+        prog="python -m scriptit.bench",
+        description="Benchmark the hot paths of scriptit",
+    )
+    parser.add_argument(
+        "--filter", "-k", default=None, help="Only run benchmarks containing this"
+    )
+    parser.add_argument(
+        "--output", "-o", default=None, help="File to write the JSON results to"
+    )
+    parser.add_argument(
+        "--baseline", "-b", default=None, help="JSON results to compare against"
+    )
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        default=None,
+        help="Fail if any benchmark is slower than the baseline by this ratio",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.05,
+        help="Minimum seconds per timing",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of timings per benchmark"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the benchmarks and exit"
+    )
+    args = parser.parse_args(argv)
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    if args.repeat < 1 or args.min_time <= 0:
+        parser.error("--repeat and --min-time must be positive")
+
+    baseline = None
+    if args.baseline is not None:
+        try:
+            with open(args.baseline) as handle:
+                baseline = json.load(handle)["results"]
+        except (OSError, ValueError, KeyError) as err:
+            parser.error(f"cannot load baseline {args.baseline}: {err}")
+
+    results = run_benchmarks(args.filter, args.min_time, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    slower = []
+    if baseline is not None:
+        report["missing_from_baseline"] = compare(results, baseline)
+        if args.max_ratio is not None:
+            slower = [
+                name
+                for name, result in results.items()
+                if result.get("ratio", 0) > args.max_ratio
+            ]
+            report["slower"] = slower
+
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+    return 1 if slower else 0
+
+
+## Benchmarks ##################################################################
+
+
+def _colored_text(n_words: int) -> str:
+    colors = ["red", "green", "blue", "yellow"]
+    return " ".join(
+        color.colorize(f"word{i}", colors[i % len(colors)]) if i % 3 else f"word{i}"
+        for i in range(n_words)
+    )
+
+
+def _plain_text(n_words: int) -> str:
+    return " ".join(f"word{i % 17}" * (1 + i % 3) for i in range(n_words))
+
+
+def _bench_decolorize(n_words: int) -> Callable[[], Any]:
+    text = _colored_text(n_words)
+    return partial(color.decolorize, text)
+
+
+def _bench_word_wrap(n_words: int) -> Callable[[], Any]:
+    text = _plain_text(n_words)
+    return partial(shape._word_wrap_to_len, text, 40)
+
+
+def _bench_table(n_rows: int, n_cols: int) -> Callable[[], Any]:
+    columns = [
+        [f"col {col}"] + [f"value {row}-{col}" * (1 + row % 3) for row in range(n_rows)]
+        for col in range(n_cols)
+    ]
+    return partial(shape.table, columns, width=100)
+
+
+def _bench_box(n_words: int) -> Callable[[], Any]:
+    text = _plain_text(n_words)
+    return partial(shape.box, text, width=80)
+
+
+def _bench_refresh(n_lines: int, diff: bool) -> Callable[[], Any]:
+    """One frame in which a single line changes"""
+    printer = RefreshPrinter(write_stream=FakeTerminal(), diff=diff)
+    lines = [f"line {i}: " + _plain_text(8) for i in range(n_lines)]
+    frame = [0]
+
+    def op():
+        frame[0] += 1
+        lines[frame[0] % n_lines] = f"line {frame[0]}: " + "x" * (frame[0] % 50)
+        for line in lines:
+            printer.add(line)
+        printer.refresh()
+
+    return op
+
+
+def _bench_emit(log_file: bool) -> Callable[[], Any]:
+    """One log record captured by the handler wrapper"""
+    handler = logging.StreamHandler(FakeTerminal())
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    log_stream = LogBuffer(10000)
+    if log_file:
+        # The file is removed right away and closed when the benchmark is done
+        handle = tempfile.TemporaryFile("w")  # noqa: SIM115
+        log_stream = TextOutputSplitter(log_stream, handle)
+    wrapper = HandlerWrapper(handler, log_stream)
+    record = logging.LogRecord(
+        "bench", logging.INFO, __file__, 0, "request %d done in %.3fs", (42, 0.5), None
+    )
+    op = partial(wrapper.emit, record)
+    if log_file:
+        op.handle = handle
+    return op
+
+
+def _bench_to_hr(n_values: int) -> Callable[[], Any]:
+    values = [(i * 7919) ** 3 for i in range(n_values)]
+    return lambda: [size.to_hr(value) for value in values]
+
+
+def _bench_from_hr(n_values: int) -> Callable[[], Any]:
+    values = [size.to_hr((i * 7919) ** 3) for i in range(n_values)]
+    return lambda: [size.from_hr(value) for value in values]
+
+
+for _n_words in [10, 100, 1000]:
+    BENCHMARKS[f"color.decolorize[{_n_words}]"] = partial(_bench_decolorize, _n_words)
+for _n_words in [10, 100, 1000]:
+    BENCHMARKS[f"shape._word_wrap_to_len[{_n_words}]"] = partial(
+        _bench_word_wrap, _n_words
+    )
+for _n_rows, _n_cols in [(10, 3), (100, 5), (1000, 5)]:
+    BENCHMARKS[f"shape.table[{_n_rows}x{_n_cols}]"] = partial(
+        _bench_table, _n_rows, _n_cols
+    )
+for _n_words in [10, 100, 1000]:
+    BENCHMARKS[f"shape.box[{_n_words}]"] = partial(_bench_box, _n_words)
+for _n_lines in [10, 40, 200]:
+    BENCHMARKS[f"RefreshPrinter.refresh[{_n_lines}]"] = partial(
+        _bench_refresh, _n_lines, False
+    )
+    BENCHMARKS[f"RefreshPrinter.refresh[{_n_lines},diff]"] = partial(
+        _bench_refresh, _n_lines, True
+    )
+BENCHMARKS["HandlerWrapper.emit"] = partial(_bench_emit, False)
+BENCHMARKS["HandlerWrapper.emit[log_file]"] = partial(_bench_emit, True)
+BENCHMARKS["size.to_hr[10000]"] = partial(_bench_to_hr, 10000)
+BENCHMARKS["size.from_hr[10000]"] = partial(_bench_from_hr, 10000)
+
+
+## Impl ########################################################################
+
+
+@contextmanager
+def _terminal_geometry(columns: int, lines: int):
+    """Fix the terminal size reported to scriptit"""
+    previous = {key: os.environ.get(key) for key in ("COLUMNS", "LINES")}
+    os.environ["COLUMNS"] = str(columns)
+    os.environ["LINES"] = str(lines)
+    terminal.invalidate()
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        terminal.invalidate()
+
+
+def _time_op(op: Callable[[], Any], min_time: float, repeat: int) -> Dict[str, float]:
+    """Time an operation, calibrating the number of calls per timing"""
+    number = 1
+    while True:
+        elapsed = _time_calls(op, number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    timings = [elapsed] + [_time_calls(op, number) for _ in range(repeat - 1)]
+    handle = getattr(op, "handle", None)
+    if handle is not None:
+        handle.close()
+    per_op = [timing / number for timing in timings]
+    return {
+        "seconds": statistics.median(per_op),
+        "min": min(per_op),
+        "number": number,
+    }
+
+
+def _time_calls(op: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        op()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sys.exit(main())
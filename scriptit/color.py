@@ -20,6 +20,7 @@ Utilities for working with a terminal
 # Standard
 from enum import Enum
 from typing import Dict, Union
+import re
 
 ## Public ######################################################################
 
@@ -91,6 +92,12 @@ BG_COLOR_CODES.update(**{entry.value: BG_COLOR_CODES[entry] for entry in Colors}
 COLOR_START = "\033["
 COLOR_END = "\033[0m"
 
+## Pattern matching any ANSI escape sequence: CSI sequences (including SGR color
+## codes and cursor movement), OSC sequences and two-character escapes
+ANSI_ESCAPE = re.compile(
+    r"\033(?:\[[0-?]*[ -/]*[@-~]|\][^\007\033]*(?:\007|\033\\)|[@-_])"
+)
+
 
 def colorize(x: str, color: Union[Colors, str]) -> str:
     """Render the given text with the desired color
@@ -119,7 +126,8 @@ def bg_colorize(x: str, color: Union[Colors, str]) -> str:
 
 
 def decolorize(x: str) -> str:
-    """Remove all color encoding from a string
+    """Remove all color encoding (and any other ANSI escape sequences) from a
+    string
 
     Args:
         x (str): The string with color
@@ -127,12 +135,24 @@ def decolorize(x: str) -> str:
     Returns:
         x_no_color (str): The input string with color removed
     """
-    for color_seq in list(FG_COLOR_CODES.values()) + list(BG_COLOR_CODES.values()):
-        x = x.replace(f"{color_seq}m", "")
-    x = x.replace(COLOR_START, "")
-    x = x.replace(COLOR_END, "")
-    x = x.replace("0m", "")  # TODO: Make this not prone to removing "1.0mb"
-    return x
+    if "\033" not in x:
+        return x
+    return ANSI_ESCAPE.sub("", x)
+
+
+def printed_len(x: str) -> int:
+    """Get the number of visible characters in a string, ignoring any ANSI
+    escape sequences
+
+    Args:
+        x (str): The string to measure
+
+    Returns:
+        length (int): The length of the string as printed
+    """
+    if "\033" not in x:
+        return len(x)
+    return len(x) - sum(map(len, ANSI_ESCAPE.findall(x)))
 
 
 ## Impl ########################################################################
@@ -0,0 +1,229 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+The LogBuffer is a bounded, line-oriented store for captured log output. It
+behaves like a write-only text stream, but only retains the most recent lines so
+that memory use stays flat for long running jobs and reading the tail of the
+log costs time proportional to the number of lines requested rather than the
+full history.
+
+Raw logging.LogRecords can also be appended along with the function that
+formats them. Records are only formatted when they are read (e.g. because they
+fall in the visible part of the log panel) and the formatted text is memoized.
+Since formatting is deferred, mutable logging arguments are rendered with their
+state at the time the record is first read. Formatting errors are also deferred,
+so rather than raising in the thread that reads the record, a record that fails
+to format is shown as its raw message along with the error. Each record is
+formatted exactly once even when several threads read it at the same time, and
+formatting never happens while holding the buffer's lock, so appending records
+never waits for a formatter.
+"""
+
+# Standard
+from collections import deque
+from typing import Callable, Deque, List, Optional, TextIO, Tuple
+import logging
+import threading
+
+## Public ######################################################################
+
+
+class LogBuffer(TextIO):
+    __doc__ = __doc__
+
+    def __init__(self, capacity: int = 10000):
+        """Set up the buffer
+
+        Args:
+            capacity (int): The maximum number of entries (lines written as
+                text or appended records) to retain
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid LogBuffer capacity: {capacity}")
+        self.capacity = capacity
+        self._entries: Deque[_LogEntry] = deque(maxlen=capacity)
+        self._partial = ""
+        self._n_appended = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def write(self, text: str) -> int:
+        """Write text to the buffer. Complete lines are stored as individual
+        records and any trailing partial line is held until its newline
+        arrives. Lines that are entirely whitespace are discarded.
+
+        Args:
+            text (str): The text to write
+
+        Returns:
+            n_chars (int): The number of characters written
+        """
+        with self._lock:
+            *lines, self._partial = (self._partial + text).split("\n")
+            for line in lines:
+                if line.strip():
+                    self._entries.append(_LogEntry(line))
+                    self._n_appended += 1
+        return len(text)
+
+    def flush(self):
+        """Nothing to flush for an in-memory buffer"""
+
+    def append_record(
+        self,
+        record: logging.LogRecord,
+        formatter: Callable[[logging.LogRecord], str],
+    ) -> "_LogEntry":
+        """Append a record that will be formatted lazily
+
+        Args:
+            record (logging.LogRecord): The record to store
+            formatter (Callable[[logging.LogRecord], str]): The function used
+                to format the record when it is read
+
+        Returns:
+            entry (_LogEntry): The stored entry. Its text attribute formats the
+                record (once).
+        """
+        entry = _LogEntry(record=record, formatter=formatter, lock=threading.Lock())
+        with self._lock:
+            self._entries.append(entry)
+            self._n_appended += 1
+        return entry
+
+    def tail(self, n_lines: int, width: Optional[int] = None) -> List[str]:
+        """Get the last n_lines lines in the buffer, optionally wrapped to the
+        given width
+
+        Args:
+            n_lines (int): The number of (wrapped) lines to return
+            width (Optional[int]): The width to wrap lines to. If None, lines
+                are not wrapped.
+
+        Returns:
+            lines (List[str]): Up to n_lines lines, oldest first
+        """
+        if n_lines <= 0:
+            return []
+        out = []
+        stop = None
+        while len(out) < n_lines:
+            # Take the next (older) chunk of entries under the lock and format
+            # them outside of it. Entries are numbered by when they were
+            # appended so that appends in the meantime don't shift the chunks.
+            with self._lock:
+                if stop is None:
+                    stop = self._n_appended
+                first = self._n_appended - len(self._entries)
+                start = max(first, stop - n_lines)
+                entries = [
+                    self._entries[idx - first] for idx in range(stop - 1, start - 1, -1)
+                ]
+            if not entries:
+                break
+            for entry in entries:
+                out.extend(reversed(entry.wrapped(width)))
+                if len(out) >= n_lines:
+                    break
+            stop = start
+        return list(reversed(out[:n_lines]))
+
+    def lines_since(self, mark: int) -> Tuple[List[str], int]:
+        """Get the lines of the entries appended since the given mark. Entries
+        that were dropped from the buffer in the meantime are skipped.
+
+        Args:
+            mark (int): The mark returned by the previous call (0 initially)
+
+        Returns:
+            lines (List[str]): The unwrapped lines of the new entries
+            mark (int): The mark to pass to the next call
+        """
+        with self._lock:
+            n_new = min(self._n_appended - mark, len(self._entries))
+            entries = [self._entries[-i] for i in range(n_new, 0, -1)]
+            mark = self._n_appended
+        return [line for entry in entries for line in entry.wrapped(None)], mark
+
+    def getvalue(self) -> str:
+        """Get the full retained content as a single string"""
+        with self._lock:
+            entries = list(self._entries)
+        return "".join(line + "\n" for entry in entries for line in entry.wrapped(None))
+
+
+## Impl ########################################################################
+
+
+class _LogEntry:
+    """A single captured line or record with its formatted text and most recent
+    wrapping memoized. Records carry a lock so that they are formatted once.
+    """
+
+    __slots__ = ("_text", "_record", "_formatter", "_lock", "_wrapped")
+
+    def __init__(
+        self,
+        text: Optional[str] = None,
+        record: Optional[logging.LogRecord] = None,
+        formatter: Optional[Callable[[logging.LogRecord], str]] = None,
+        lock: Optional[threading.Lock] = None,
+    ):
+        self._text = text
+        self._record = record
+        self._formatter = formatter
+        self._lock = lock
+        # The (width, lines) of the most recent wrapping, replaced as a whole
+        self._wrapped: Optional[Tuple[Optional[int], List[str]]] = None
+
+    @property
+    def text(self) -> str:
+        """The formatted text, formatting the record on first access"""
+        text = self._text
+        if text is None:
+            with self._lock:
+                text = self._text
+                if text is None:
+                    record = self._record
+                    try:
+                        text = self._formatter(record)
+                    except Exception as err:
+                        text = f"{record.msg} [format error: {err!r}]"
+                    self._text = text
+                    self._record = None
+                    self._formatter = None
+        return text
+
+    def wrapped(self, width: Optional[int]) -> List[str]:
+        """Get the non-blank lines of the entry split into chunks no longer than
+        width
+        """
+        memo = self._wrapped
+        if memo is None or memo[0] != width:
+            wrapped = []
+            for line in self.text.split("\n"):
+                if not line.strip():
+                    continue
+                if not width or len(line) <= width:
+                    wrapped.append(line)
+                else:
+                    wrapped.extend(
+                        line[i : i + width] for i in range(0, len(line), width)
+                    )
+            memo = self._wrapped = (width, wrapped)
+        return memo[1]
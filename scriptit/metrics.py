@@ -0,0 +1,350 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+A registry of live metrics (counters, gauges and histograms) that hot code can
+update cheaply and a widget that renders them. For example:
+
+metrics = MetricsRegistry()
+requests = metrics.counter("requests")
+latency = metrics.histogram("latency")
+app = TerminalApp(metrics=metrics)
+while True:
+    ...
+    requests.inc()
+    latency.observe(elapsed)
+
+Metric values live in fixed-size arrays, so updates are a single indexed
+arithmetic operation with no string formatting. Counters and histograms write
+to an array owned by the updating thread, so concurrent updates are never lost.
+When a thread exits, its values are folded into a shared array and its array is
+released.
+The arrays are summed, and rates are computed since the previous frame, only
+when the MetricsPanel is rendered.
+"""
+
+# Standard
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import math
+import threading
+import time
+
+# Local
+from .widget import Widget
+
+## Public ######################################################################
+
+# Default histogram bucket upper bounds (e.g. for latencies in seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """A monotonically increasing count"""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, slot: int):
+        self.name = name
+        self._local = registry._local
+        self._new_row = registry._new_row
+        self._slot = slot
+
+    def inc(self, amount: float = 1):
+        """Increment the counter
+
+        Args:
+            amount (float): The amount to add
+        """
+        try:
+            row = self._local.row
+        except AttributeError:
+            row = self._new_row()
+        row[self._slot] += amount
+
+
+class Gauge:
+    """A value that is set to the most recent measurement"""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, slot: int):
+        self.name = name
+        self._values = registry._gauges
+        self._slot = slot
+
+    def set(self, value: float):
+        """Set the current value
+
+        Args:
+            value (float): The new value
+        """
+        self._values[self._slot] = value
+
+
+class Histogram:
+    """A distribution of observed values counted in fixed buckets"""
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        slot: int,
+        buckets: Sequence[float],
+    ):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._local = registry._local
+        self._new_row = registry._new_row
+        self._slot = slot
+        self._sum_slot = slot + len(self.buckets) + 1
+
+    def observe(self, value: float):
+        """Record an observed value
+
+        Args:
+            value (float): The observed value
+        """
+        try:
+            row = self._local.row
+        except AttributeError:
+            row = self._new_row()
+        row[self._slot + bisect_left(self.buckets, value)] += 1
+        row[self._sum_slot] += value
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    """The set of metrics shown together in a MetricsPanel"""
+
+    def __init__(self, capacity: int = 1024):
+        """Set up the registry
+
+        Args:
+            capacity (int): The number of array slots available to counters and
+                histograms (a counter uses one slot and a histogram uses two
+                more than its number of buckets)
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid metrics capacity: {capacity}")
+        self.capacity = capacity
+        self._metrics: Dict[str, Metric] = {}
+        self._next_slot = 0
+        self._gauges = array("d")
+        self._rows: List[Tuple[threading.Thread, array]] = []
+        self._base = array("d", bytes(8 * capacity))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._metrics)
+
+    def __iter__(self):
+        return iter(list(self._metrics.values()))
+
+    def counter(self, name: str) -> Counter:
+        """Get or create the counter with the given name"""
+        return self._get_or_create(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        """Get or create the gauge with the given name"""
+        return self._get_or_create(name, Gauge)
+
+    def histogram(
+        self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Get or create the histogram with the given name
+
+        Args:
+            name (str): The name of the histogram
+            buckets (Sequence[float]): Sorted upper bounds of the buckets. Values
+                above the last bound are counted in an overflow bucket.
+
+        Returns:
+            histogram (Histogram): The histogram
+        """
+        if not buckets or any(a >= b for a, b in zip(buckets, buckets[1:])):
+            raise ValueError(f"Histogram buckets must be sorted: {buckets}")
+        return self._get_or_create(name, Histogram, buckets)
+
+    def snapshot(self) -> Dict[str, Union[float, List[float]]]:
+        """Read the current values of all metrics. Counters and gauges map to
+        their value. Histograms map to their bucket counts (including the
+        overflow bucket) followed by the sum of the observed values.
+        """
+        totals = self._totals()
+        out = {}
+        for name, metric in list(self._metrics.items()):
+            if isinstance(metric, Gauge):
+                out[name] = self._gauges[metric._slot]
+            elif isinstance(metric, Counter):
+                out[name] = totals[metric._slot]
+            else:
+                out[name] = totals[metric._slot : metric._sum_slot + 1]
+        return out
+
+    ## Implementation ############################################################
+
+    def _get_or_create(self, name: str, metric_type: type, *args) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is not None:
+                if not isinstance(metric, metric_type):
+                    raise ValueError(
+                        f"Metric {name} is a {type(metric).__name__}, not a "
+                        f"{metric_type.__name__}"
+                    )
+                return metric
+            if metric_type is Gauge:
+                slot = len(self._gauges)
+                self._gauges.append(0.0)
+            else:
+                slot = self._next_slot
+                n_slots = 1 if metric_type is Counter else len(args[0]) + 2
+                if slot + n_slots > self.capacity:
+                    raise ValueError(f"Metrics capacity exceeded adding {name}")
+                self._next_slot += n_slots
+            metric = metric_type(self, name, slot, *args)
+            self._metrics[name] = metric
+            return metric
+
+    def _new_row(self) -> array:
+        """Allocate the calling thread's array of counter values"""
+        row = array("d", bytes(8 * self.capacity))
+        self._local.row = row
+        with self._lock:
+            self._fold_dead_rows()
+            self._rows.append((threading.current_thread(), row))
+        return row
+
+    def _fold_dead_rows(self):
+        """Add the arrays of threads that have exited into the shared base
+        array and release them. The lock must be held.
+        """
+        live_rows = []
+        for thread, row in self._rows:
+            if thread.is_alive():
+                live_rows.append((thread, row))
+            else:
+                for idx, value in enumerate(row[: self._next_slot]):
+                    self._base[idx] += value
+        self._rows = live_rows
+
+    def _totals(self) -> List[float]:
+        """Sum the counter values across the threads' arrays"""
+        with self._lock:
+            self._fold_dead_rows()
+            totals = self._base.tolist()[: self._next_slot]
+            rows = [row for _, row in self._rows]
+        for row in rows:
+            for idx, value in enumerate(row[: self._next_slot]):
+                totals[idx] += value
+        return totals
+
+
+class MetricsPanel(Widget):
+    """Widget that renders the metrics of a registry, one per line, with rates
+    computed since the previous time it was rendered
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        """Set up the panel
+
+        Args:
+            registry (MetricsRegistry): The metrics to render
+        """
+        self.registry = registry
+        self._previous: Dict[str, float] = {}
+        self._previous_time: Optional[float] = None
+
+    def render(self, width: int, height: int) -> List[str]:
+        """Render one line per metric
+
+        Args:
+            width (int): The maximum line width
+            height (int): The maximum number of lines
+
+        Returns:
+            lines (List[str]): The lines for the metrics
+        """
+        now = time.monotonic()
+        elapsed = None
+        if self._previous_time is not None and now > self._previous_time:
+            elapsed = now - self._previous_time
+        values = self.registry.snapshot()
+        previous = self._previous
+        self._previous = {}
+        self._previous_time = now
+
+        rows: List[Tuple[str, str]] = []
+        for metric in self.registry:
+            value = values[metric.name]
+            if isinstance(metric, Gauge):
+                rows.append((metric.name, _fmt_value(value)))
+                continue
+            if isinstance(metric, Counter):
+                count = value
+                text = _fmt_value(count)
+            else:
+                count = sum(value[:-1])
+                text = f"n={_fmt_value(count)}"
+                if count:
+                    text += f" mean={_fmt_value(value[-1] / count)}"
+                    text += "".join(
+                        f" p{int(q * 100)}={_quantile(metric.buckets, value, q)}"
+                        for q in (0.5, 0.9, 0.99)
+                    )
+            self._previous[metric.name] = count
+            if elapsed is not None and metric.name in previous:
+                rate = (count - previous[metric.name]) / elapsed
+                text += f" ({_fmt_value(rate)}/s)"
+            rows.append((metric.name, text))
+
+        if not rows:
+            return []
+        name_width = max(len(name) for name, _ in rows)
+        return [
+            f"{name.ljust(name_width)} {text}"[:width]
+            for name, text in rows[: max(0, height)]
+        ]
+
+
+## Impl ########################################################################
+
+
+def _fmt_value(value: float) -> str:
+    """Format a metric value compactly"""
+    if not math.isfinite(value):
+        return str(value)
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return f"{value:.4g}"
+
+
+def _quantile(buckets: Sequence[float], values: Sequence[float], q: float) -> str:
+    """Estimate a quantile from the bucket counts by interpolating within the
+    bucket that contains it
+    """
+    counts = values[:-1]
+    target = q * sum(counts)
+    seen = 0.0
+    for idx, count in enumerate(counts):
+        if count and seen + count >= target:
+            if idx == len(buckets):
+                return f">{_fmt_value(buckets[-1])}"
+            lower = buckets[idx - 1] if idx else min(0.0, buckets[0])
+            upper = buckets[idx]
+            return _fmt_value(lower + (upper - lower) * (target - seen) / count)
+        seen += count
+    return "-"
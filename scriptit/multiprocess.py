@@ -0,0 +1,365 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+Tools for aggregating log records and content from worker processes into a
+single TerminalApp so that all rendering happens in the parent process.
+
+In the parent, a ProcessCollector owns a multiprocessing queue and a thread
+that feeds what arrives on it into the app. Log records are re-dispatched
+through the parent's loggers (as with logging.handlers.QueueListener) so they
+are captured by the app like any other record. In each worker, init_worker
+replaces the logging handlers with one that ships records to the parent, and
+add() ships content for the app. Messages are batched so that workers pay for
+one pickle and queue put per batch rather than per record. Workers started
+with fork inherit the parent app's logging patches, so init_worker also undoes
+them: records are only captured (and drawn) by the parent. For example:
+
+app = TerminalApp()
+with ProcessCollector(app) as collector:
+    with ProcessPoolExecutor(
+        initializer=multiprocess.init_worker, initargs=(collector.queue,)
+    ) as pool:
+        ...
+
+For progress reporting, SharedCounters is an array of integer counters in shared
+memory. Workers increment their slot directly, with no message passing per
+update, and the parent reads the counters when it renders (e.g. as tasks of a
+progress.ProgressGroup).
+"""
+
+# Standard
+from multiprocessing import shared_memory
+from typing import Any, List, Optional, Tuple
+import atexit
+import logging
+import multiprocessing
+import multiprocessing.util
+import threading
+
+# Local
+from .app import HandlerWrapper, _CapturingLogger
+
+## Parent ######################################################################
+
+
+class ProcessCollector:
+    __doc__ = __doc__
+
+    def __init__(self, app: Any, context: Optional[Any] = None):
+        """Set up the collector
+
+        Args:
+            app (TerminalApp): The app to feed log records and content into
+            context (Optional[multiprocessing.context.BaseContext]): The
+                multiprocessing context used to create the queue. This should
+                match the context used to create the worker processes.
+        """
+        self.app = app
+        context = context or multiprocessing.get_context()
+        self.queue = context.Queue()
+        self._thread = None
+
+    def __enter__(self) -> "ProcessCollector":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def start(self):
+        """Start the thread that reads from the queue"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Process everything that has already been sent and stop the reader
+        thread. Workers should be finished (and flushed) before stopping.
+        """
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    ## Implementation ############################################################
+
+    def _run(self):
+        """Reader thread body"""
+        while (batch := self.queue.get()) is not None:
+            self._handle_batch(batch)
+
+    def _handle_batch(self, batch: List[Tuple[str, Any]]):
+        """Feed a batch of messages from a worker into the app"""
+        for kind, payload in batch:
+            if kind == _LOG:
+                record = logging.makeLogRecord(payload)
+                logger = logging.getLogger(record.name)
+                if logger.isEnabledFor(record.levelno):
+                    logger.handle(record)
+            else:
+                self.app.add(payload)
+
+
+## Worker ######################################################################
+
+
+def init_worker(
+    queue: Any,
+    batch_size: int = 100,
+    flush_interval: float = 0.1,
+    level: Optional[int] = None,
+):
+    """Configure the current (worker) process to send log records and content
+    to a ProcessCollector. This is suitable for use as a pool initializer.
+
+    Args:
+        queue (multiprocessing.Queue): The collector's queue
+        batch_size (int): Number of messages to accumulate before sending
+        flush_interval (float): Maximum number of seconds a message waits
+            before being sent
+        level (Optional[int]): If given, the level for the worker's root logger
+    """
+    global _SENDER
+    if _SENDER is not None:
+        _SENDER.close()
+    _SENDER = _BatchSender(queue, batch_size, flush_interval)
+    root = logging.getLogger()
+    _release_app_logging(root)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_ForwardingHandler(_SENDER))
+    if level is not None:
+        root.setLevel(level)
+
+
+def add(content: Any):
+    """Send content to be added to the parent's TerminalApp
+
+    Args:
+        content (Any): The content to add. It is stringified in the worker.
+    """
+    _get_sender().send((_CONTENT, str(content)))
+
+
+def flush():
+    """Send any batched messages immediately"""
+    _get_sender().flush()
+
+
+## Shared Counters #############################################################
+
+
+class SharedCounters:
+    """An array of 64-bit integer counters in shared memory. The process that
+    creates the counters owns the memory and unlinks it when closed. Instances
+    can be passed to worker processes (e.g. as task arguments or initargs), and
+    they attach to the same memory by name when unpickled.
+
+    Updates are not synchronized, so each slot should only be written by one
+    process (e.g. one slot per worker or per task). Any process may read any
+    slot at any time.
+    """
+
+    def __init__(self, n_slots: int, name: Optional[str] = None, create: bool = True):
+        """Create or attach to the counters
+
+        Args:
+            n_slots (int): The number of counters
+            name (Optional[str]): The name of the shared memory block. A unique
+                name is generated if not given when creating.
+            create (bool): Create a new block (True) or attach to an existing
+                block with the given name (False)
+        """
+        if n_slots < 1:
+            raise ValueError(f"Invalid number of slots: {n_slots}")
+        size = n_slots * _COUNTER_SIZE
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.n_slots = n_slots
+        self.owner = create
+        # New blocks are zero filled. The block may be rounded up to a whole
+        # number of pages, so only the requested size is used.
+        self._view = self._shm.buf[:size].cast(_COUNTER_FORMAT)
+
+    def __reduce__(self):
+        return (SharedCounters, (self.n_slots, self.name, False))
+
+    def __enter__(self) -> "SharedCounters":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.n_slots
+
+    def __getitem__(self, slot: int) -> int:
+        return self._view[slot]
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory block"""
+        return self._shm.name
+
+    def add(self, slot: int, amount: int = 1):
+        """Increment the counter in the given slot
+
+        Args:
+            slot (int): The index of the counter
+            amount (int): The amount to add
+        """
+        self._view[slot] += amount
+
+    def get(self, slot: int) -> int:
+        """Get the value of the counter in the given slot
+
+        Args:
+            slot (int): The index of the counter
+
+        Returns:
+            value (int): The current value of the counter
+        """
+        return self._view[slot]
+
+    def values(self) -> List[int]:
+        """Get a snapshot of all of the counters"""
+        return self._view.tolist()
+
+    def close(self):
+        """Detach from the shared memory, and unlink it if this is the owner"""
+        view = getattr(self, "_view", None)
+        if view is None:
+            return
+        self._view = None
+        view.release()
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+## Impl ########################################################################
+
+_COUNTER_FORMAT = "q"
+_COUNTER_SIZE = 8
+
+_LOG = "log"
+_CONTENT = "content"
+
+_SENDER: Optional["_BatchSender"] = None
+
+
+def _release_app_logging(root: logging.Logger):
+    """Undo the logging patches of a TerminalApp inherited from the parent by
+    a forked worker: restore the root logger's addHandler and the logger
+    class, and drop the handler wrappers, which would capture records in the
+    worker's copy of the app instead of forwarding them
+    """
+    vars(root).pop("addHandler", None)
+    manager = root.manager
+    if manager.loggerClass is not None and issubclass(
+        manager.loggerClass, _CapturingLogger
+    ):
+        manager.loggerClass = None
+    for logger in [root] + list(manager.loggerDict.values()):
+        if isinstance(logger, logging.PlaceHolder):
+            continue
+        if isinstance(logger, _CapturingLogger):
+            logger.__class__ = logging.Logger
+        for handler in list(logger.handlers):
+            if isinstance(handler, HandlerWrapper):
+                logger.removeHandler(handler)
+
+
+def _get_sender() -> "_BatchSender":
+    if _SENDER is None:
+        raise RuntimeError("init_worker must be called before sending content")
+    return _SENDER
+
+
+class _BatchSender:
+    """Accumulates messages and puts them on the queue in batches, either when
+    the batch is full or when the flush interval elapses
+    """
+
+    def __init__(self, queue: Any, batch_size: int, flush_interval: float):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._batch = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        # Flush at exit for both plain interpreter exit and multiprocessing
+        # workers, which exit without running atexit handlers. The priority
+        # must be higher than that of the queue's own finalizer (10), which
+        # stops its feeder thread.
+        atexit.register(self.close)
+        multiprocessing.util.Finalize(self, self.close, exitpriority=100)
+
+    def send(self, message: Tuple[str, Any]):
+        with self._lock:
+            self._batch.append(message)
+            full = len(self._batch) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if batch:
+            self.queue.put(batch)
+
+    def close(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            atexit.unregister(self.close)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+class _ForwardingHandler(logging.Handler):
+    """Logging handler that sends records to the parent process"""
+
+    def __init__(self, sender: _BatchSender):
+        super().__init__()
+        self.sender = sender
+
+    def emit(self, record: logging.LogRecord):
+        """Prepare the record for pickling (as QueueHandler does) and send it"""
+        try:
+            msg = self.format(record)
+            payload = dict(record.__dict__)
+            payload.update(
+                msg=msg,
+                message=msg,
+                args=None,
+                exc_info=None,
+                exc_text=None,
+                stack_info=None,
+            )
+            self.sender.send((_LOG, payload))
+        except Exception:  # pragma: no cover
+            self.handleError(record)
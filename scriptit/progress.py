@@ -0,0 +1,466 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+The ProgressGroup is a widget that tracks the progress of many concurrent tasks
+(e.g. downloads or shards) and renders a progress bar for each of the most
+recently active ones along with a summary bar for the whole group. For example:
+
+group = ProgressGroup(top_k=5)
+task = group.add_task("shard-1", total=1000)
+...
+task.advance(10)  # From any thread
+...
+app.add(group)
+app.refresh()
+
+Workers only ever increment a counter that belongs to their own thread, so
+updates never take a lock. The counters are summed, and throughput and ETA are
+computed from the timestamped samples, when the group is rendered. Bars are
+built with shape.progress_bar and each one is only rebuilt when its number of
+filled cells changes.
+
+Progress can also be read from an external counter, such as a slot of a
+multiprocess.SharedCounters that worker processes increment:
+
+counters = SharedCounters(n_shards)
+for i in range(n_shards):
+    group.add_task(f"shard-{i}", total=1000, counter=partial(counters.get, i))
+
+For single loops, track() wraps an iterable and shows its progress with a
+RefreshPrinter:
+
+for item in track(items):
+    ...
+
+The clock is only read every N iterations, where N adapts to the observed speed
+of the loop so that checks happen a few times per refresh interval. Between
+checks, the cost of an iteration is a counter increment. Loops nested inside a
+tracked loop in the same thread are shown below it using the outer loop's
+printer.
+"""
+
+# Standard
+from collections import deque
+from contextlib import suppress
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+import threading
+import time
+
+# Local
+from .refresh_printer import RefreshPrinter
+from .shape import progress_bar
+from .terminal import get_terminal_size
+from .widget import Widget
+
+## Public ######################################################################
+
+
+class ProgressTask:
+    """A single tracked task. Instances are created with ProgressGroup.add_task
+    and may be advanced from any thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        total: Optional[float] = None,
+        counter: Optional[Callable[[], float]] = None,
+    ):
+        """Set up the task
+
+        Args:
+            name (str): The name shown next to the task's bar
+            total (Optional[float]): The amount of work in the task, if known
+            counter (Optional[Callable[[], float]]): Function that reads the
+                amount of work completed outside of advance() (e.g. in another
+                process). It is called when the task is rendered.
+        """
+        self.name = name
+        self.total = total
+        self.counter = counter
+        self.finished = False
+        self._slots: Dict[int, float] = {}
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._last_change = 0.0
+        self._bar_key = None
+        self._bar = ""
+
+    def advance(self, amount: float = 1):
+        """Record progress on the task. Each thread only writes its own slot, so
+        this does not need a lock.
+
+        Args:
+            amount (float): The amount of work completed
+        """
+        ident = threading.get_ident()
+        self._slots[ident] = self._slots.get(ident, 0) + amount
+
+    def finish(self):
+        """Mark the task as finished so that it no longer counts as active"""
+        self.finished = True
+
+    @property
+    def completed(self) -> float:
+        """The total amount of work completed across all threads (and the
+        external counter)
+        """
+        completed = sum(self._slots.copy().values())
+        if self.counter is not None:
+            completed += self.counter()
+        return completed
+
+
+class ProgressGroup(Widget):
+    __doc__ = __doc__
+
+    def __init__(
+        self,
+        top_k: int = 10,
+        sample_window: float = 10.0,
+        summary_name: str = "total",
+        done_char: str = "=",
+        undone_char: str = "-",
+        head_char: str = ">",
+    ):
+        """Set up the group
+
+        Args:
+            top_k (int): The maximum number of task bars to show
+            sample_window (float): The number of seconds of samples used to
+                compute throughput
+            summary_name (str): The name shown next to the summary bar
+            done_char (str): The character representing completion
+            undone_char (str): The character representing incomplete
+            head_char (str): The character representing the head of the bars
+        """
+        if top_k < 0:
+            raise ValueError(f"Invalid top_k: {top_k}")
+        if len(done_char) != 1 or len(undone_char) != 1 or len(head_char) != 1:
+            raise ValueError("All char args must have length 1")
+        self.top_k = top_k
+        self.sample_window = sample_window
+        self.bar_chars = (done_char, undone_char, head_char)
+        self._tasks: List[ProgressTask] = []
+        self._tasks_lock = threading.Lock()
+        self._summary = ProgressTask(summary_name)
+        self._name_width = len(summary_name)
+        self._stats_width = 0
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    ## Interface #################################################################
+
+    def add_task(
+        self,
+        name: str,
+        total: Optional[float] = None,
+        counter: Optional[Callable[[], float]] = None,
+    ) -> ProgressTask:
+        """Add a task to the group
+
+        Args:
+            name (str): The name shown next to the task's bar
+            total (Optional[float]): The amount of work in the task, if known
+            counter (Optional[Callable[[], float]]): Function that reads the
+                amount of work completed outside of advance()
+
+        Returns:
+            task (ProgressTask): The task to advance
+        """
+        task = ProgressTask(name, total, counter)
+        with self._tasks_lock:
+            self._tasks.append(task)
+            self._name_width = max(self._name_width, len(name))
+        return task
+
+    def render(self, width: int, height: int) -> List[str]:
+        """Render the bars for the most recently active tasks followed by the
+        summary bar
+
+        Args:
+            width (int): The maximum line width
+            height (int): The maximum number of lines
+
+        Returns:
+            lines (List[str]): The lines for the group
+        """
+        if height <= 0:
+            return []
+        with self._tasks_lock:
+            tasks = list(self._tasks)
+        now = time.monotonic()
+
+        # Sample all of the tasks
+        completed_sum = 0
+        total_sum = 0
+        active = []
+        n_done = 0
+        for idx, task in enumerate(tasks):
+            completed = task.completed
+            rate = self._sample(task, completed, now)
+            completed_sum += completed
+            if total_sum is not None:
+                total_sum = None if task.total is None else total_sum + task.total
+            if task.finished or (task.total is not None and completed >= task.total):
+                n_done += 1
+            else:
+                active.append((task._last_change, -idx, task, completed, rate))
+
+        # Pick the most recently active tasks and show them in the order they
+        # were added, followed by the summary of the whole group
+        n_shown = min(self.top_k, height - 1)
+        shown = heapq.nlargest(n_shown, active, key=lambda entry: entry[:2])
+        shown.sort(key=lambda entry: -entry[1])
+        rows = [(task, completed, rate) for _, _, task, completed, rate in shown]
+        summary = self._summary
+        summary.total = total_sum or None
+        rows.append((summary, completed_sum, self._sample(summary, completed_sum, now)))
+
+        # Format the rows with the bars aligned. The column widths only grow so
+        # that the bars don't change size from frame to frame.
+        stats = [self._stats(task, completed, rate) for task, completed, rate in rows]
+        stats[-1] = (
+            stats[-1][0],
+            f"{stats[-1][1]} [{len(active)} active, {n_done} done]",
+        )
+        name_width = self._name_width
+        self._stats_width = max([self._stats_width] + [len(text) for _, text in stats])
+        bar_width = width - name_width - self._stats_width - 1
+        lines = []
+        for (task, _, _), (pct, text) in zip(rows, stats):
+            name = task.name.ljust(name_width)
+            if bar_width < 3:
+                lines.append(f"{name}{text}"[:width])
+            else:
+                lines.append(f"{name} {self._bar(task, pct, bar_width)}{text}")
+        return lines
+
+    ## Implementation ############################################################
+
+    def _sample(self, task: ProgressTask, completed: float, now: float) -> float:
+        """Add a sample for the task and compute its throughput over the sample
+        window
+        """
+        samples = task._samples
+        if not samples or samples[-1][1] != completed:
+            task._last_change = now
+        samples.append((now, completed))
+        while len(samples) > 2 and now - samples[0][0] > self.sample_window:
+            samples.popleft()
+        start_time, start_completed = samples[0]
+        if now <= start_time:
+            return 0.0
+        return (completed - start_completed) / (now - start_time)
+
+    @staticmethod
+    def _stats(task: ProgressTask, completed: float, rate: float) -> Tuple[float, str]:
+        """Get the completion fraction and the stats text for a task"""
+        if not task.total:
+            return 0.0, f" {_fmt_num(completed):>6} {_fmt_num(rate):>6}/s"
+        remaining = task.total - completed
+        if remaining <= 0:
+            eta = "done"
+        elif rate > 0:
+            eta = _fmt_duration(remaining / rate)
+        else:
+            eta = "--:--"
+        pct = completed / task.total
+        total = _fmt_num(task.total)
+        return pct, (
+            f" {pct:4.0%} {_fmt_num(completed):>{len(total)}}/{total}"
+            f" {_fmt_num(rate):>6}/s ETA {eta:>7}"
+        )
+
+    def _bar(self, task: ProgressTask, pct: float, bar_width: int) -> str:
+        """Get the bar for the task, only rebuilding it when the number of
+        filled cells changes
+        """
+        pct = max(min(1.0, pct), 0.0)
+        key = (bar_width, int((bar_width - 3) * pct))
+        if key != task._bar_key:
+            task._bar = progress_bar(pct, bar_width, *self.bar_chars)
+            task._bar_key = key
+        return task._bar
+
+
+def track(
+    iterable: Iterable[Any],
+    total: Optional[int] = None,
+    name: str = "",
+    printer: Optional[RefreshPrinter] = None,
+    refresh_interval: float = 0.1,
+) -> Iterator[Any]:
+    """Iterate over the iterable while showing its progress
+
+    Args:
+        iterable (Iterable[Any]): The values to iterate over
+        total (Optional[int]): The number of values. Defaults to len(iterable)
+            if the iterable supports it.
+        name (str): The name shown before the progress bar
+        printer (Optional[RefreshPrinter]): The printer to show progress with.
+            Defaults to a new diffing RefreshPrinter. Ignored for loops nested
+            in another tracked loop, which share the outer loop's printer.
+        refresh_interval (float): The target number of seconds between frames
+
+    Returns:
+        iterator (Iterator[Any]): Iterator over the values of the iterable
+    """
+    if total is None:
+        with suppress(TypeError):
+            total = len(iterable)
+    return _track_iter(iterable, _Tracker(name, total), printer, refresh_interval)
+
+
+## Impl ########################################################################
+
+
+def _fmt_num(num: float) -> str:
+    """Format a count compactly"""
+    units = ("", "K", "M", "G", "T")
+    idx = 0
+    while abs(num) >= 1000 and idx < len(units) - 1:
+        num /= 1000
+        idx += 1
+    unit = units[idx]
+    if num == int(num):
+        return f"{int(num)}{unit}"
+    return f"{num:.1f}{unit}"
+
+
+def _fmt_duration(seconds: float) -> str:
+    """Format a number of seconds as [H:]MM:SS"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+_TRACK_LOCAL = threading.local()
+
+
+class _TrackDisplay:
+    """The display shared by the (nested) tracked loops of a single thread"""
+
+    def __init__(self, printer: RefreshPrinter, refresh_interval: float):
+        self.printer = printer
+        self.refresh_interval = refresh_interval
+        self.trackers: List[_Tracker] = []
+        self.last_refresh = time.perf_counter()
+        # Check interval from the last loop at each depth so that repeated inner
+        # loops don't start over from checking every iteration
+        self.steps: List[int] = []
+
+    def render(self, now: float, force: bool = False):
+        width = get_terminal_size().columns
+        for depth, tracker in enumerate(self.trackers):
+            self.printer.add(tracker.format(depth, width, now), wrap=False)
+        self.printer.refresh(force=force)
+        self.last_refresh = now
+
+
+class _Tracker:
+    """The progress state of a single tracked loop"""
+
+    def __init__(self, name: str, total: Optional[int]):
+        self.name = name
+        self.total = total
+        self.count = 0
+        self.start = time.perf_counter()
+        self.display: Optional[_TrackDisplay] = None
+        self._last_check = self.start
+        self._last_count = 0
+
+    def check(self, count: int, step: int) -> int:
+        """Read the clock, draw a frame if one is due and compute the number of
+        iterations until the next check
+        """
+        now = time.perf_counter()
+        display = self.display
+        elapsed = now - self._last_check
+        n_iters = count - self._last_count
+        self.count = count
+        self._last_check = now
+        self._last_count = count
+        if now - display.last_refresh >= display.refresh_interval:
+            display.render(now)
+
+        # Aim for two checks per refresh interval without growing too quickly
+        target = display.refresh_interval / 2
+        if elapsed > 0:
+            step = min(step * 2, int(n_iters * target / elapsed))
+        else:
+            step *= 2
+        return max(1, step)
+
+    def format(self, depth: int, width: int, now: float) -> str:
+        """Format the line for the loop"""
+        elapsed = now - self.start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        name = "  " * depth + self.name
+        if self.total:
+            pct = self.count / self.total
+            remaining = self.total - self.count
+            eta = _fmt_duration(remaining / rate) if rate > 0 else "--:--"
+            stats = (
+                f" {pct:4.0%} {self.count}/{self.total}"
+                f" {_fmt_num(rate)}/s ETA {eta}"
+            )
+            bar_width = width - len(name) - len(stats) - (1 if name else 0)
+            if bar_width >= 3:
+                bar = progress_bar(pct, bar_width)
+                return f"{name} {bar}{stats}" if name else f"{bar}{stats}"
+        else:
+            stats = f" {self.count} {_fmt_num(rate)}/s {_fmt_duration(elapsed)}"
+        return f"{name}{stats}"[:width]
+
+
+def _track_iter(
+    iterable: Iterable[Any],
+    tracker: _Tracker,
+    printer: Optional[RefreshPrinter],
+    refresh_interval: float,
+) -> Iterator[Any]:
+    """Generator for track() that attaches the tracker to the thread's display"""
+    display = getattr(_TRACK_LOCAL, "display", None)
+    if display is None:
+        display = _TrackDisplay(printer or RefreshPrinter(diff=True), refresh_interval)
+        _TRACK_LOCAL.display = display
+    depth = len(display.trackers)
+    display.trackers.append(tracker)
+    tracker.display = display
+    if depth == len(display.steps):
+        display.steps.append(1)
+    step = display.steps[depth]
+    count = 0
+    next_check = step
+    try:
+        for item in iterable:
+            yield item
+            count += 1
+            if count >= next_check:
+                step = tracker.check(count, step)
+                next_check = count + step
+    finally:
+        tracker.count = count
+        display.steps[depth] = step
+        if depth == 0:
+            display.render(time.perf_counter(), force=True)
+            _TRACK_LOCAL.display = None
+        else:
+            display.trackers.remove(tracker)
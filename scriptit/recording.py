@@ -0,0 +1,126 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+The FrameRecorder writes everything a RefreshPrinter outputs to a file in the
+asciicast v2 format: a JSON header line followed by one JSON line per event.
+Recordings are append-only, so they survive the process dying mid-session, and
+can be played with python -m scriptit.replay or other asciicast players. Each
+output event holds exactly the text the printer wrote (diff frames when diff
+rendering is enabled) with a timestamp from the monotonic clock, relative to the
+start of the recording.
+
+To make seeking cheap, the printer periodically writes a full frame (a
+keyframe) instead of a diff. Each keyframe output event is preceded by a marker
+event labeled "keyframe:<n>", where n is the number of characters at the start
+of the keyframe that clear the previous frame.
+"""
+
+# Standard
+from typing import TextIO, Union
+import json
+import threading
+import time
+
+# Local
+from .terminal import get_terminal_size
+
+## Public ######################################################################
+
+KEYFRAME_LABEL = "keyframe:"
+
+
+class FrameRecorder:
+    """Writer that appends timestamped output events to an asciicast v2 file"""
+
+    def __init__(
+        self,
+        target: Union[str, TextIO],
+        keyframe_interval: float = 10.0,
+    ):
+        """Open the recording and write its header
+
+        Args:
+            target (Union[str, TextIO]): The path of the file to record to or an
+                open text stream
+            keyframe_interval (float): The number of seconds between keyframes
+        """
+        if keyframe_interval <= 0:
+            raise ValueError(f"Invalid keyframe interval: {keyframe_interval}")
+        self.keyframe_interval = keyframe_interval
+        if isinstance(target, str):
+            # Hold the file open here for writing and close in close()
+            self.stream = open(target, "w")  # noqa: SIM115
+            self._owns_stream = True
+        else:
+            self.stream = target
+            self._owns_stream = False
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._next_keyframe = 0.0
+        term_size = get_terminal_size()
+        self._write_line(
+            {
+                "version": 2,
+                "width": term_size.columns,
+                "height": term_size.lines,
+                "timestamp": int(time.time()),
+            }
+        )
+
+    def keyframe_due(self) -> bool:
+        """Whether the next frame should be recorded as a keyframe"""
+        return time.monotonic() - self._start >= self._next_keyframe
+
+    def keyframe(self, clear_len: int):
+        """Mark the next output event as a keyframe
+
+        Args:
+            clear_len (int): The number of characters at the start of the next
+                output event that clear the previous frame
+        """
+        elapsed = time.monotonic() - self._start
+        self._next_keyframe = elapsed + self.keyframe_interval
+        self._event(elapsed, "m", f"{KEYFRAME_LABEL}{clear_len}")
+
+    def output(self, text: str):
+        """Record text written to the terminal
+
+        Args:
+            text (str): The text that was written
+        """
+        self._event(time.monotonic() - self._start, "o", text)
+
+    def close(self):
+        """Flush the recording and close the file if it was opened here"""
+        with self._lock:
+            if self.stream is None:
+                return
+            stream, self.stream = self.stream, None
+            if self._owns_stream:
+                stream.close()
+            else:
+                stream.flush()
+
+    ## Implementation ############################################################
+
+    def _event(self, elapsed: float, code: str, data: str):
+        self._write_line([round(elapsed, 6), code, data])
+
+    def _write_line(self, value):
+        with self._lock:
+            if self.stream is not None:
+                self.stream.write(json.dumps(value) + "\n")
+                self.stream.flush()
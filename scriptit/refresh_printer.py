@@ -25,20 +25,64 @@ for i in range(100):
     p.refresh()
     time.sleep(1)
 
+Content is only evaluated and wrapped when a frame is written, so adding content
+for frames that are skipped (see refresh_rate) costs very little. Besides
+strings and Widgets, content may be a callable (called when the frame is
+written) or a generator of lines.
+
+When the output stream is not a terminal (e.g. a pipe to a log collector), the
+printer switches to an append-only mode: each frame only writes the lines that
+were not part of the previous frame, with no cursor movement or padding.
+
+With adaptive=True, the printer measures how long frame writes take and spaces
+frames out so that at most half of the time is spent writing when the output is
+slow (e.g. a slow SSH session or a full pipe). Frames that arrive too soon, or
+while another thread is writing, are not written. The most recent one is kept
+and written later from a timer thread (or by flush_pending), so the latest state
+always reaches the screen and no caller waits for more than one frame write.
+
 NOTE: the report can smoothly grow in the number of lines. Reducing the number
-    of lines may result in odd behavior.
+    of lines may result in odd behavior unless diff rendering is enabled.
+
+With diff=True, each frame is compared line-by-line with the previous frame and
+only the rows that changed are rewritten using cursor positioning escapes. Rows
+that got shorter have only their trailing columns cleared, and rows left over
+from a longer previous frame are erased.
+
+With record set to a path (or stream), everything the printer writes is also
+recorded with timestamps in asciicast v2 format for later playback with
+python -m scriptit.replay. Every keyframe_interval seconds, one frame is written
+in full rather than as a diff so that playback can seek without replaying the
+whole recording (see scriptit.recording).
 """
 
 # Standard
-from typing import Any, TextIO
-import shutil
+from collections import Counter
+from types import GeneratorType
+from typing import Any, List, Optional, TextIO, Tuple, Union
+import os
 import sys
+import threading
+import time
+
+# Local
+from .color import printed_len
+from .recording import FrameRecorder
+from .stats import RenderStats, _count_changed_lines
+from .terminal import get_terminal_size
+from .widget import Widget
 
 
 class RefreshPrinter:
     __doc__ = __doc__
 
     UP_LINE = "\033[F"
+    CLEAR_LINE_END = "\033[K"
+    CLEAR_SCREEN_END = "\033[J"
+    SYNC_START = "\033[?2026h"
+    SYNC_END = "\033[?2026l"
+    ADAPTIVE_WRITE_SHARE = 0.5
+    ADAPTIVE_LATENCY_WEIGHT = 0.2
 
     def __init__(
         self,
@@ -46,6 +90,13 @@ class RefreshPrinter:
         mute: bool = False,
         refresh_rate: int = 1,
         write_stream: TextIO = sys.stdout,
+        diff: bool = False,
+        sync_output: bool = False,
+        append_only: Optional[bool] = None,
+        adaptive: bool = False,
+        record: Optional[Union[str, TextIO]] = None,
+        keyframe_interval: float = 10.0,
+        stats: Optional[RenderStats] = None,
     ):
         """Set up the printer
 
@@ -56,29 +107,97 @@ class RefreshPrinter:
             refresh_rate (bool): Number of refreshes between writing to the
                 output stream
             write_stream (TextIO): The output stream
+            diff (bool): Only rewrite the lines that changed since the previous
+                frame rather than clearing and rewriting the whole frame
+            sync_output (bool): Wrap each frame in synchronized output escapes
+                (DEC mode 2026) so that supporting terminals never display a
+                partially drawn frame
+            append_only (Optional[bool]): Only write the lines of each frame that
+                were not in the previous frame, without cursor movement, padding
+                or wrapping. By default, this is enabled when the output stream
+                has a file descriptor that is not a terminal.
+            adaptive (bool): Skip frames based on the measured write latency
+                so that callers don't stall on a slow output stream. Call
+                flush_pending() when done to write the final frame.
+            record (Optional[Union[str, TextIO]]): A file path (or stream) to
+                record the output to for replay. Call close() when done to
+                close the recording.
+            keyframe_interval (float): With record, the number of seconds
+                between frames that are written in full so that replay can seek
+            stats (Optional[RenderStats]): Stats to record the time, bytes and
+                changed lines of each frame in
         """
         self.do_refresh = do_refresh
         self.mute = mute
         self.refresh_rate = refresh_rate
         self.write_stream = write_stream
+        self.diff = diff
+        self.sync_output = sync_output
+        self.append_only = (
+            _is_non_tty(write_stream) if append_only is None else append_only
+        )
+
+        self.adaptive = adaptive
 
         self.last_report = None
-        self.current_report = []
+        self._report: List[str] = []
+        self._pending: List[Tuple[Any, bool]] = []
         self.refreshes = 0
 
+        # State for adaptive frame dropping
+        self.skipped = 0
+        self.write_latency: Optional[float] = None
+        self._next_write = 0.0
+        self._latest: Optional[List[str]] = None
+        self._latest_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+        # Optional instrumentation
+        self.stats = stats
+
+        # Recorder for replay
+        self.recorder = (
+            FrameRecorder(record, keyframe_interval) if record is not None else None
+        )
+
+    @property
+    def current_report(self) -> List[str]:
+        """The lines of the report being built. Content added since the last
+        access is evaluated and wrapped when this is read.
+        """
+        self._resolve_pending()
+        return self._report
+
+    @current_report.setter
+    def current_report(self, report: List[str]):
+        self._report = report
+        self._pending = []
+
+    def emit(self, lines: List[str]):
+        """Write lines directly, outside of the refreshed report. This is meant
+        for append-only output such as new log lines.
+
+        Args:
+            lines (List[str]): The lines to write
+        """
+        if lines and not self.mute:
+            text = "".join(line + "\n" for line in lines)
+            if self.recorder is not None:
+                self.recorder.output(text)
+            self._write_counted(text)
+
     def add(self, content: Any, wrap: bool = True):
-        """Add the given content to the report
+        """Add the given content to the report. It is evaluated and wrapped when
+        the frame is written.
 
         Args:
-            content (Any): The content to add
-            wrap (bool): Whether or not to perform line wrapping
+            content (Any): The content to add. Callables are called and
+                generators are joined as lines.
+            wrap (bool): Whether or not to perform line wrapping. Widgets are
+                always rendered to fit the terminal.
         """
-        width = shutil.get_terminal_size().columns
-        for line in str(content).split("\n"):
-            while wrap and len(line) > width:
-                self.current_report.append(line[:width])
-                line = line[width:]
-            self.current_report.append(line)
+        self._pending.append((content, wrap))
 
     # When ready to cycle from the last report to the current, call refresh
     def refresh(self, force: bool = False):
@@ -88,23 +207,274 @@ class RefreshPrinter:
             force (bool): Force the refreshed content to be written, regardless
                 of refresh rate
         """
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
         self.refreshes += 1
-        width = shutil.get_terminal_size().columns
         if force or self.refresh_rate == 1 or self.refreshes % self.refresh_rate == 1:
-            if self.do_refresh and self.last_report is not None and not self.mute:
-                line_clear = self.UP_LINE + " " * width
-                self.write_stream.write(
-                    line_clear * (len(self.last_report) + 1) + "\r\n"
-                )
-            for i, line in enumerate(self.current_report):
-                if (
-                    self.last_report is not None
-                    and i < len(self.last_report)
-                    and len(line) < len(self.last_report[i])
-                ):
-                    line += " " * (len(self.last_report[i]) - len(line))
+            if stats is not None:
+                # Evaluate the content up front to measure it separately
+                self._resolve_pending()
+                wrap_time = time.perf_counter() - start
+            if self.adaptive:
+                self._refresh_adaptive(force)
+            else:
                 if not self.mute:
-                    self.write_stream.write(line + "\n")
-            self.write_stream.flush()
-            self.last_report = self.current_report
+                    self._write_frame(self._render_frame())
+                self.last_report = self.current_report
+                self.current_report = []
+            if stats is not None:
+                stats.end_frame(start, wrap_time)
+            return
+        if stats is not None:
+            stats.skip_frame()
         self.current_report = []
+
+    def flush_pending(self):
+        """Write the most recent frame if it was skipped by adaptive refreshing"""
+        with self._latest_lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self._write_latest(blocking=True)
+
+    def close(self):
+        """Write any pending frame and close the recording"""
+        self.flush_pending()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    ## Implementation ############################################################
+
+    def _resolve_pending(self):
+        """Evaluate and wrap the content added since the last resolve into the
+        current report
+        """
+        if self._pending:
+            pending, self._pending = self._pending, []
+            term_size = get_terminal_size()
+            wrap_lines = not self.append_only
+            for content, wrap in pending:
+                self._report.extend(
+                    _content_lines(
+                        content, term_size.columns, term_size.lines, wrap and wrap_lines
+                    )
+                )
+
+    def _refresh_adaptive(self, force: bool):
+        """Keep the current report as the latest frame and write it unless the
+        output is behind or another thread is writing
+        """
+        with self._latest_lock:
+            if self._latest is not None:
+                self.skipped += 1
+            self._latest = self.current_report
+            self.current_report = []
+        due = force or time.monotonic() >= self._next_write
+        if due and self._write_latest(blocking=force):
+            return
+        self._schedule_flush()
+
+    def _write_latest(self, blocking: bool) -> bool:
+        """Write the latest frame, if any, and update the write latency. Returns
+        False if the write lock could not be acquired.
+        """
+        if not self._write_lock.acquire(blocking=blocking):
+            return False
+        try:
+            with self._latest_lock:
+                report, self._latest = self._latest, None
+            if report is None:
+                return True
+            if not self.mute:
+                start = time.monotonic()
+                self._write_frame(self._render_frame(report))
+                end = time.monotonic()
+                latency = end - start
+                if self.write_latency is not None:
+                    weight = self.ADAPTIVE_LATENCY_WEIGHT
+                    latency = weight * latency + (1 - weight) * self.write_latency
+                self.write_latency = latency
+                self._next_write = end + latency * (1 / self.ADAPTIVE_WRITE_SHARE - 1)
+            self.last_report = report
+        finally:
+            self._write_lock.release()
+        if self._latest is not None:
+            self._schedule_flush()
+        return True
+
+    def _schedule_flush(self):
+        """Start a timer to write the latest frame once the output has caught up"""
+        with self._latest_lock:
+            if self._timer is not None or self._latest is None:
+                return
+            delay = max(0.0, self._next_write - time.monotonic())
+            self._timer = threading.Timer(delay, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._latest_lock:
+            self._timer = None
+        self._write_latest(blocking=True)
+
+    def _render_frame(self, report: Optional[List[str]] = None) -> str:
+        """Assemble the full output for the given report (the current report by
+        default) as a single string
+        """
+        if report is None:
+            report = self.current_report
+        if self.stats is not None:
+            self.stats.add_lines_changed(_count_changed_lines(self.last_report, report))
+        if self.append_only:
+            return self._render_append(self.last_report, report)
+        keyframe = (
+            self.recorder is not None
+            and self.do_refresh
+            and self.recorder.keyframe_due()
+        )
+        if (
+            self.do_refresh
+            and self.last_report is not None
+            and self.diff
+            and not keyframe
+        ):
+            return self._render_diff(self.last_report, report)
+        parts = []
+        if self.do_refresh and self.last_report is not None:
+            width = get_terminal_size().columns
+            line_clear = self.UP_LINE + " " * width
+            parts.append(line_clear * (len(self.last_report) + 1) + "\r\n")
+        if keyframe:
+            self.recorder.keyframe(len(parts[0]) if parts else 0)
+        for i, line in enumerate(report):
+            parts.append(line)
+            if (
+                self.last_report is not None
+                and i < len(self.last_report)
+                and len(line) < len(self.last_report[i])
+            ):
+                parts.append(" " * (len(self.last_report[i]) - len(line)))
+            parts.append("\n")
+        return "".join(parts)
+
+    def _write_frame(self, frame: str):
+        """Send a rendered frame to the output stream with a single write"""
+        if not frame:
+            return
+        if self.recorder is not None:
+            self.recorder.output(frame)
+        if self.sync_output and not self.append_only:
+            frame = self.SYNC_START + frame + self.SYNC_END
+        self._write_counted(frame)
+
+    def _write_counted(self, text: str):
+        """Write text, recording the time and bytes in the stats if enabled"""
+        if self.stats is None:
+            self._write(text)
+            return
+        start = time.perf_counter()
+        self._write(text)
+        self.stats.add_write(
+            len(text.encode("utf-8", "replace")), time.perf_counter() - start
+        )
+
+    def _write(self, text: str):
+        """Write text to the output stream and flush it"""
+        self.write_stream.write(text)
+        self.write_stream.flush()
+
+    @staticmethod
+    def _render_append(
+        last_report: Optional[List[str]], current_report: List[str]
+    ) -> str:
+        """Render the lines of the current frame that were not in the previous
+        frame. Repeated lines are matched by count.
+        """
+        previous = Counter(last_report or ())
+        parts = []
+        for line in current_report:
+            if previous[line] > 0:
+                previous[line] -= 1
+            else:
+                parts.append(line + "\n")
+        return "".join(parts)
+
+    @classmethod
+    def _render_diff(cls, last_report: List[str], current_report: List[str]) -> str:
+        """Render the escape sequence that transforms the previous frame into
+        the current frame, touching only the rows that differ. The cursor is
+        assumed to start (and will end) on the row just below the frame.
+        """
+        parts = []
+        n_last = len(last_report)
+        n_current = len(current_report)
+        row = n_last
+        for i, line in enumerate(current_report[:n_last]):
+            prev_line = last_report[i]
+            if line == prev_line:
+                continue
+            parts.append(cls._move_rows(row, i))
+            parts.append(line)
+            if printed_len(line) < printed_len(prev_line):
+                parts.append(cls.CLEAR_LINE_END)
+            row = i
+        if n_current < n_last:
+            parts.append(cls._move_rows(row, n_current))
+            parts.append(cls.CLEAR_SCREEN_END)
+        else:
+            parts.append(cls._move_rows(row, n_last))
+            parts.extend(line + "\n" for line in current_report[n_last:])
+        return "".join(parts)
+
+    @staticmethod
+    def _move_rows(from_row: int, to_row: int) -> str:
+        """Get the escape sequence to move the cursor to the start of another
+        row relative to the current row
+        """
+        if to_row < from_row:
+            return f"\033[{from_row - to_row}F"
+        if to_row > from_row:
+            return f"\033[{to_row - from_row}E"
+        return "\r"
+
+
+## Impl ########################################################################
+
+
+def _is_non_tty(stream: TextIO) -> bool:
+    """Whether the stream writes to a file descriptor that is not a terminal.
+    Streams without a file descriptor (e.g. io.StringIO) are assumed to be
+    consumed like a terminal.
+    """
+    try:
+        return not os.isatty(stream.fileno())
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _resolve_content(content: Any) -> Any:
+    """Evaluate lazy content: callables are called and generators are joined
+    into lines
+    """
+    if callable(content) and not isinstance(content, Widget):
+        content = content()
+    if isinstance(content, GeneratorType):
+        content = "\n".join(str(line) for line in content)
+    return content
+
+
+def _content_lines(
+    content: Any, width: int, height: int, wrap: bool = True
+) -> List[str]:
+    """Evaluate the content and split it into lines that fit the given width"""
+    content = _resolve_content(content)
+    if isinstance(content, Widget):
+        return content.render(width, height)
+    lines = []
+    for line in str(content).split("\n"):
+        while wrap and len(line) > width:
+            lines.append(line[:width])
+            line = line[width:]
+        lines.append(line)
+    return lines
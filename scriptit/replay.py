@@ -0,0 +1,194 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+Playback of recordings made with the record option of RefreshPrinter (or
+TerminalApp). For example:
+
+app = TerminalApp(record="session.cast")
+...
+app.close()
+
+and later:
+
+python -m scriptit.replay session.cast --speed 4 --seek 120
+
+To seek, the player jumps to the last keyframe before the target time (see
+scriptit.recording), skips the part of it that clears the previous frame and
+writes every event up to the target time at once. Playback then continues with
+the recorded timing.
+"""
+
+# Standard
+from bisect import bisect_right
+from contextlib import suppress
+from typing import List, Optional, TextIO, Tuple, Union
+import argparse
+import json
+import sys
+import time
+
+# Local
+from .recording import KEYFRAME_LABEL
+
+## Public ######################################################################
+
+
+class Recording:
+    """A recording loaded for playback, with an index of its keyframes"""
+
+    def __init__(self, header: dict, events: List[Tuple[float, str, str]]):
+        """Index the keyframes of the recording
+
+        Args:
+            header (dict): The asciicast header
+            events (List[Tuple[float, str, str]]): The (time, code, data) events
+        """
+        self.header = header
+        self.events = events
+
+        # Map each keyframe's time to the index of its output event and the
+        # length of its clearing prefix
+        self.keyframe_times: List[float] = []
+        self.keyframes: List[Tuple[int, int]] = []
+        for idx, (timestamp, code, data) in enumerate(events):
+            if code == "m" and data.startswith(KEYFRAME_LABEL):
+                self.keyframe_times.append(timestamp)
+                self.keyframes.append((idx + 1, int(data[len(KEYFRAME_LABEL) :])))
+
+    @classmethod
+    def load(cls, source: Union[str, TextIO]) -> "Recording":
+        """Read an asciicast v2 recording
+
+        Args:
+            source (Union[str, TextIO]): The path of the recording or an open
+                text stream
+
+        Returns:
+            recording (Recording): The loaded recording
+        """
+        if isinstance(source, str):
+            with open(source) as handle:
+                return cls.load(handle)
+        header = json.loads(source.readline() or "{}")
+        if header.get("version") != 2:
+            raise ValueError("Only asciicast v2 recordings are supported")
+        events = []
+        for line in source:
+            if line.strip():
+                timestamp, code, data = json.loads(line)
+                events.append((float(timestamp), code, data))
+        return cls(header, events)
+
+    @property
+    def duration(self) -> float:
+        """The time of the last event"""
+        return self.events[-1][0] if self.events else 0.0
+
+    def seek(self, position: float) -> Tuple[str, int]:
+        """Get the text that reproduces the screen at the given time
+
+        Args:
+            position (float): The time to seek to in seconds
+
+        Returns:
+            text (str): The text to write to show the screen at that time
+            next_idx (int): The index of the first event after that time
+        """
+        start_idx, skip = 0, 0
+        keyframe_idx = bisect_right(self.keyframe_times, position) - 1
+        if keyframe_idx >= 0:
+            start_idx, skip = self.keyframes[keyframe_idx]
+        parts = []
+        idx = start_idx
+        while idx < len(self.events) and self.events[idx][0] <= position:
+            _, code, data = self.events[idx]
+            if code == "o":
+                parts.append(data[skip:])
+                skip = 0
+            idx += 1
+        return "".join(parts), idx
+
+    def play(
+        self,
+        stream: TextIO = sys.stdout,
+        speed: float = 1.0,
+        start: float = 0.0,
+        max_wait: Optional[float] = None,
+    ):
+        """Write the recording to the stream with its original timing
+
+        Args:
+            stream (TextIO): The stream to play to
+            speed (float): The playback speed multiplier
+            start (float): The time to start playing from in seconds
+            max_wait (Optional[float]): The maximum number of seconds to wait
+                between events (after applying the speed)
+        """
+        if speed <= 0:
+            raise ValueError(f"Invalid playback speed: {speed}")
+        text, idx = self.seek(start)
+        if text:
+            stream.write(text)
+            stream.flush()
+        previous = start
+        for timestamp, code, data in self.events[idx:]:
+            if code != "o":
+                continue
+            delay = (timestamp - previous) / speed
+            if max_wait is not None:
+                delay = min(delay, max_wait)
+            if delay > 0:
+                time.sleep(delay)
+            stream.write(data)
+            stream.flush()
+            previous = timestamp
+
+
+def main(argv: Optional[List[str]] = None):
+    """Play a recording in the terminal"""
+    parser = argparse.ArgumentParser(
+        prog="python -m scriptit.replay",
+        description="Play a recording made by a RefreshPrinter",
+    )
+    parser.add_argument("recording", help="Path to the asciicast v2 recording")
+    parser.add_argument(
+        "--speed", "-s", type=float, default=1.0, help="Playback speed multiplier"
+    )
+    parser.add_argument(
+        "--seek", "-t", type=float, default=0.0, help="Time to start from (seconds)"
+    )
+    parser.add_argument(
+        "--max-wait",
+        "-w",
+        type=float,
+        default=None,
+        help="Maximum pause between events (seconds)",
+    )
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error(f"invalid speed: {args.speed}")
+    try:
+        recording = Recording.load(args.recording)
+    except (OSError, ValueError) as err:
+        parser.error(f"cannot load {args.recording}: {err}")
+    with suppress(KeyboardInterrupt):
+        recording.play(
+            sys.stdout, speed=args.speed, start=args.seek, max_wait=args.max_wait
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+The FrameScheduler coalesces redraw requests and performs them on a background
+thread at a bounded rate. Callers mark the scheduler dirty (which is cheap and
+never blocks on rendering) and the scheduler renders at most max_fps frames
+per second. When stopped, any pending frame is flushed.
+
+An exception raised while rendering on the background thread is reported
+through threading.excepthook and the thread keeps running, so a single bad
+frame does not stop later frames from being drawn.
+"""
+
+# Standard
+from typing import Callable
+import atexit
+import sys
+import threading
+import time
+
+## Public ######################################################################
+
+
+class FrameScheduler:
+    __doc__ = __doc__
+
+    def __init__(self, render: Callable[[], None], max_fps: float = 30.0):
+        """Set up the scheduler and start the render thread
+
+        Args:
+            render (Callable[[], None]): The function that draws a frame
+            max_fps (float): The maximum number of frames to render per second
+        """
+        if max_fps <= 0:
+            raise ValueError(f"Invalid max_fps: {max_fps}")
+        self.render = render
+        self.max_fps = max_fps
+        self._interval = 1.0 / max_fps
+        self._last_frame = 0.0
+        self._pending = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._render_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @property
+    def running(self) -> bool:
+        return not self._stop.is_set()
+
+    def mark_dirty(self):
+        """Request that a frame be rendered"""
+        self._pending = True
+        self._wake.set()
+
+    def flush(self):
+        """Render a frame immediately on the calling thread if one is pending"""
+        self._render_if_pending()
+
+    def stop(self):
+        """Stop the render thread and flush any pending frame"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        atexit.unregister(self.stop)
+        self._render_if_pending()
+
+    ## Implementation ############################################################
+
+    def _run(self):
+        """Render thread body"""
+        while not self._stop.is_set():
+            self._wake.wait()
+            delay = self._last_frame + self._interval - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            self._wake.clear()
+            try:
+                self._render_if_pending()
+            except Exception:
+                threading.excepthook(
+                    threading.ExceptHookArgs((*sys.exc_info(), self._thread))
+                )
+
+    def _render_if_pending(self):
+        """Render a frame if one is pending, clearing the pending state first so
+        that requests made during rendering trigger another frame
+        """
+        with self._render_lock:
+            if not self._pending:
+                return
+            self._pending = False
+            self._last_frame = time.monotonic()
+            self.render()
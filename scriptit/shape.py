@@ -18,11 +18,12 @@ Utilities for working with a terminal
 """
 
 # Standard
-from typing import Any, List, Optional, Tuple
-import shutil
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 # Local
-from .color import decolorize
+from .color import printed_len
+from .terminal import get_terminal_size
 
 ## Public ######################################################################
 
@@ -55,7 +56,7 @@ def progress_bar(
     # computed and should not break
     complete_pct = max(min(1.0, complete_pct), 0.0)
     if width is None:
-        width = shutil.get_terminal_size().columns
+        width = get_terminal_size().columns
     n_done = int((width - 3) * complete_pct)
     n_undone = width - 3 - n_done
     return "[{}{}{}]".format(done_char * n_done, head_char, undone_char * n_undone)
@@ -73,22 +74,20 @@ def box(x: Any, char: str = "#", width: Optional[int] = None) -> str:
         boxed_text (str): The wrapped text inside the box
     """
     if width is None:
-        width = shutil.get_terminal_size().columns
+        width = get_terminal_size().columns
     x = str(x)
     raw_lines = x.split("\n")
-    lines = []
-    longest = 0
     max_len = width - 4
-    for line in raw_lines:
-        sublines, longest_subline_len = _word_wrap_to_len(line, max_len)
-        lines += sublines
-        longest = max(longest, longest_subline_len)
-    out = "{}\n".format(char * (longest + 4))
-    for line in lines:
-        padding = " " * (longest - _printed_len(line))
-        out += f"{char} {line}{padding} {char}\n"
-    out += "{}\n".format(char * (longest + 4))
-    return out
+    lines = [
+        wrapped for line in raw_lines for wrapped in _iter_word_wrap(line, max_len)
+    ]
+    longest = max(line_len for _, line_len in lines)
+    out = ["{}\n".format(char * (longest + 4))]
+    for line, line_len in lines:
+        padding = " " * (longest - line_len)
+        out.append(f"{char} {line}{padding} {char}\n")
+    out.append("{}\n".format(char * (longest + 4)))
+    return "".join(out)
 
 
 def table(
@@ -125,94 +124,105 @@ def table(
         table (str): The formatted table string
     """
     # Validate arguments
-    if any(
-        len(char) != 1 for char in [hframe_char, vframe_char, corner_char, header_char]
-    ):
-        raise ValueError("*_char args must be a single character")
+    _validate_table_chars(hframe_char, vframe_char, corner_char, header_char)
     if len(set([len(col) for col in columns])) > 1:
         raise ValueError("All columns must have equal length")
 
-    if max_width is None:
-        max_width = shutil.get_terminal_size().columns
-    if min_width is None:
-        min_width = 2 * len(columns) + 1 if width is None else width
-
     # Stringify all column content
     columns = [[str(val) for val in col] for col in columns]
     empty_cols = [i for i, col in enumerate(columns) if not any(col)]
     if empty_cols:
         raise ValueError(f"Found empty column(s) when stringified: {empty_cols}")
 
-    # Determine the raw max width of each column
-    max_col_width = max_width - 3 - 2 * (len(columns) - 1)
-    widths = [
-        min(max(_printed_len(x) for x in column), max_col_width) for column in columns
-    ]
-
-    # Determine the full width of the table
-    total_width = sum([w + 3 for w in widths]) + 1
-    table_width = max(min(total_width, max_width), min_width)
-    usable_table_width = table_width - 1
+    # Determine the raw max width of each column and lay out the table
+    widths = [max(printed_len(x) for x in column) for column in columns]
+    col_widths, table_width = _table_layout(widths, width, max_width, min_width)
+    lines = _iter_table_lines(
+        zip(*columns),
+        col_widths=col_widths,
+        table_width=table_width,
+        row_dividers=row_dividers,
+        header=header,
+        hframe_char=hframe_char,
+        vframe_char=vframe_char,
+        corner_char=corner_char,
+        header_char=header_char,
+    )
+    return "".join(line + "\n" for line in lines)
+
+
+def table_stream(
+    rows: Iterable[Sequence[Any]],
+    widths: Optional[Sequence[int]] = None,
+    sample_size: int = 100,
+    width: Optional[int] = None,
+    max_width: Optional[int] = None,
+    min_width: Optional[int] = None,
+    row_dividers: bool = True,
+    header: bool = True,
+    hframe_char: str = "-",
+    vframe_char: str = "|",
+    corner_char: str = "+",
+    header_char: str = "=",
+) -> Iterator[str]:
+    """Lazily encode the given rows as an ascii table, one line at a time. This
+    produces the same framing as table, but only holds the sampled rows (or a
+    single row when widths are given) in memory, so it can be used to render
+    arbitrarily large tables straight to a file or a RefreshPrinter.
 
-    # For each column, determine the width as a percentage of the total width
-    pcts = [float(w) / float(total_width) for w in widths]
-    col_widths = [int(p * usable_table_width) + 3 for p in pcts]
-    if col_widths:
-        col_widths[-1] = usable_table_width - sum(col_widths[:-1])
-    else:
-        col_widths = [0]
+    Since the rows are not all available up front, the column widths must
+    either be given explicitly or are estimated from the first sample_size
+    rows. Content in later rows that is wider than the estimate is wrapped.
 
-    # Prepare the rows
-    wrapped_cols = []
-    for i, col in enumerate(columns):
-        wrapped_cols.append([])
-        for entry in col:
-            if col_widths[i] - 2 <= 1:
-                raise ValueError(f"Column width collapsed for col {i}")
-            wrapped, _ = _word_wrap_to_len(entry, col_widths[i] - 2)
-            wrapped_cols[-1].append(wrapped)
-
-    # Go row-by-row and add to the output
-    out = _make_hline(table_width, char=hframe_char, edge=corner_char)
-    n_rows = max([len(col) for col in columns]) if columns else 0
-    if not n_rows:
-        if header:
-            out += _make_hline(table_width, char=header_char, edge=vframe_char)
-        out += _make_hline(table_width, char=hframe_char, edge=corner_char)
-    for r in range(n_rows):
-        entries = [col[r] if r < len(col) else [""] for col in wrapped_cols]
-        most_sublines = max([len(e) for e in entries])
-        for i in range(most_sublines):
-            line = ""
-            for c, entry in enumerate(entries):
-                val = entry[i] if len(entry) > i else ""
-                line += "{} {}{}".format(
-                    vframe_char, val, " " * (col_widths[c] - _printed_len(val) - 2)
-                )
-            line += f"{vframe_char}\n"
-            out += line
-        if r == 0:
-            if header:
-                out += _make_hline(table_width, char=header_char, edge=vframe_char)
-            elif row_dividers:
-                out += _make_hline(table_width, char=hframe_char, edge=vframe_char)
-        elif r < n_rows - 1:
-            if row_dividers:
-                out += _make_hline(table_width, char=hframe_char, edge=vframe_char)
-        else:
-            out += _make_hline(table_width, char=hframe_char, edge=corner_char)
+    Args:
+        rows (Iterable[Sequence[Any]]): Iterable of rows, each consisting of a
+            sequence of entries. The first row is considered the header row
+        widths (Optional[Sequence[int]]): The content width of each column. If
+            not given, widths are estimated from the first sample_size rows
+        sample_size (int): Number of rows to sample when estimating widths
+        width (Optional[int]): The width of the table (defaults to terminal)
+        max_width (Optional[int]): If no width given, upper bound on computed
+            width based on content
+        min_width (Optional[int]): If no width given, the lower bound on
+            computed width based on content
+        row_dividers (bool): Include dividers between rows
+        header (bool): Include a special divider between header and rows
+        hframe_char (str): Single character for horizontal frame lines
+        vframe_char (str): Single character for vertical frame lines
+        corner_char (str): Single character for corners
+        header_char (str): Single character for the header horizontal divider
 
-    return out
+    Returns:
+        lines (Iterator[str]): Generator of the formatted table lines (without
+            trailing newlines)
+    """
+    _validate_table_chars(hframe_char, vframe_char, corner_char, header_char)
+    rows = iter(rows)
+    if widths is None:
+        sample = [[str(val) for val in row] for row in islice(rows, sample_size)]
+        n_cols = max((len(row) for row in sample), default=0)
+        widths = [
+            max((printed_len(row[c]) for row in sample if c < len(row)), default=0)
+            for c in range(n_cols)
+        ]
+        rows = chain(sample, rows)
+    col_widths, table_width = _table_layout(widths, width, max_width, min_width)
+    return _iter_table_lines(
+        rows,
+        col_widths=col_widths,
+        table_width=table_width,
+        row_dividers=row_dividers,
+        header=header,
+        hframe_char=hframe_char,
+        vframe_char=vframe_char,
+        corner_char=corner_char,
+        header_char=header_char,
+    )
 
 
 ## Impl ########################################################################
 
 
-def _printed_len(x: str) -> int:
-    """Get the length of the given string with non-printed characters removed"""
-    return len(decolorize(x))
-
-
 def _word_wrap_to_len(line: str, max_len: int) -> Tuple[List[str], int]:
     """Wrap the given line into a list of lines, each no longer than max_len
     using whitespace tokenization for word splitting.
@@ -225,34 +235,175 @@ def _word_wrap_to_len(line: str, max_len: int) -> Tuple[List[str], int]:
         sublines (List[str]): The lines wrapped to the target length
         longest (int): The length of the longest wrapped line (<= max_len)
     """
-    if (printed_len := _printed_len(line)) <= max_len:
-        return [line], printed_len
+    sublines = []
+    longest = 0
+    for subline, subline_len in _iter_word_wrap(line, max_len):
+        sublines.append(subline)
+        longest = max(longest, subline_len)
+    return sublines, longest
+
+
+def _iter_word_wrap(line: str, max_len: int) -> Iterator[Tuple[str, int]]:
+    """Lazily wrap the given line into sublines no longer than max_len using
+    whitespace tokenization for word splitting. Words longer than max_len are
+    split with a trailing hyphen.
+
+    The line is tokenized once and the printed width of each word is computed
+    once, so wrapping is linear in the length of the line.
+
+    Args:
+        line (str): The input line to be wrapped
+        max_len (int): The max len for lines in the wrapped output
+
+    Yields:
+        subline (str): The next wrapped line
+        subline_len (int): The printed length of the wrapped line
+    """
+    if (line_len := printed_len(line)) <= max_len:
+        yield line, line_len
+        return
+
+    # The current subline is accumulated as a list of parts, each word followed
+    # by a single space, and its printed width (including the trailing space)
+    # is tracked as words are added
+    parts = []
+    width = 0
+    for word in line.split(" "):
+        word_len = printed_len(word)
+        while True:
+            if width + word_len <= max_len:
+                parts.append(word)
+                parts.append(" ")
+                width += word_len + 1
+                break
+            if word_len > max_len and (cutoff := max_len - width - 1) > 0:
+                head = word[:cutoff]
+                parts.append(head)
+                parts.append("- ")
+                width += printed_len(head) + 2
+                word = word[cutoff:]
+                word_len = printed_len(word)
+                continue
+            if not parts:
+                raise ValueError(f"Cannot wrap words to max_len {max_len}")
+            parts[-1] = parts[-1][:-1]
+            yield "".join(parts), width - 1
+            parts = []
+            width = 0
+    parts[-1] = parts[-1][:-1]
+    yield "".join(parts), width - 1
+
+
+def _validate_table_chars(*chars: str):
+    """Make sure that all table framing characters are single characters"""
+    if any(len(char) != 1 for char in chars):
+        raise ValueError("*_char args must be a single character")
+
+
+def _table_layout(
+    widths: Sequence[int],
+    width: Optional[int],
+    max_width: Optional[int],
+    min_width: Optional[int],
+) -> Tuple[List[int], int]:
+    """Determine the width of each column (including framing) and of the full
+    table given the content width of each column
+
+    Args:
+        widths (Sequence[int]): The printed width of the content of each column
+        width (Optional[int]): The width of the table (defaults to terminal)
+        max_width (Optional[int]): If no width given, upper bound on computed
+            width based on content
+        min_width (Optional[int]): If no width given, the lower bound on
+            computed width based on content
+
+    Returns:
+        col_widths (List[int]): The width of each column
+        table_width (int): The width of the full table
+    """
+    if max_width is None:
+        max_width = get_terminal_size().columns
+    if min_width is None:
+        min_width = 2 * len(widths) + 1 if width is None else width
+
+    # Clip each column to the max usable width
+    max_col_width = max_width - 3 - 2 * (len(widths) - 1)
+    widths = [min(w, max_col_width) for w in widths]
+
+    # Determine the full width of the table
+    total_width = sum([w + 3 for w in widths]) + 1
+    table_width = max(min(total_width, max_width), min_width)
+    usable_table_width = table_width - 1
+
+    # For each column, determine the width as a percentage of the total width
+    pcts = [float(w) / float(total_width) for w in widths]
+    col_widths = [int(p * usable_table_width) + 3 for p in pcts]
+    if col_widths:
+        col_widths[-1] = usable_table_width - sum(col_widths[:-1])
     else:
-        longest = 0
-        sublines = []
-        words = line.split(" ")
-        while len(words):
-            subline = ""
-            while len(words):
-                if _printed_len(subline) + _printed_len(words[0]) <= max_len:
-                    subline += words[0] + " "
-                    words = words[1:]
-                elif _printed_len(words[0]) > max_len:
-                    cutoff = max_len - _printed_len(subline) - 1
-                    if cutoff <= 0:
-                        break
-                    else:
-                        subline += words[0][:cutoff] + "- "
-                        words[0] = words[0][cutoff:]
-                else:
-                    # NOTE: This _is_ covered in tests, but the coverage engine
-                    #   doesn't pick it up for some reason!
-                    break  # pragma: no cover
-            subline = subline[:-1]
-            longest = max(longest, _printed_len(subline))
-            sublines.append(subline)
-        return sublines, longest
+        col_widths = [0]
+    for i, col_width in enumerate(col_widths[: len(widths)]):
+        if col_width - 2 <= 1:
+            raise ValueError(f"Column width collapsed for col {i}")
+    return col_widths, table_width
+
+
+def _iter_table_lines(
+    rows: Iterable[Sequence[Any]],
+    col_widths: List[int],
+    table_width: int,
+    row_dividers: bool,
+    header: bool,
+    hframe_char: str,
+    vframe_char: str,
+    corner_char: str,
+    header_char: str,
+) -> Iterator[str]:
+    """Generate the lines of a table row-by-row. Dividers are emitted before
+    each row (rather than after) so that the end of the rows does not need to be
+    known in advance.
+    """
+    yield _make_hline(table_width, char=hframe_char, edge=corner_char)
+    row_div = _make_hline(table_width, char=hframe_char, edge=vframe_char)
+    header_div = _make_hline(table_width, char=header_char, edge=vframe_char)
+    n_rows = 0
+    n_cols = len(col_widths)
+    for r, row in enumerate(rows):
+        if len(row) != n_cols:
+            raise ValueError(f"Row {r} has {len(row)} entries, expected {n_cols}")
+        if r == 1:
+            if header:
+                yield header_div
+            elif row_dividers:
+                yield row_div
+        elif r > 1 and row_dividers:
+            yield row_div
+        yield from _iter_table_row(row, col_widths, vframe_char)
+        n_rows += 1
+    if n_rows <= 1 and header:
+        yield header_div
+    yield _make_hline(table_width, char=hframe_char, edge=corner_char)
+
+
+def _iter_table_row(
+    row: Sequence[Any], col_widths: List[int], vframe_char: str
+) -> Iterator[str]:
+    """Generate the (possibly multiple) lines for a single table row"""
+    entries = [
+        list(_iter_word_wrap(str(val), col_width - 2))
+        for val, col_width in zip(row, col_widths)
+    ]
+    most_sublines = max(len(entry) for entry in entries)
+    for i in range(most_sublines):
+        parts = []
+        for c, entry in enumerate(entries):
+            val, val_len = entry[i] if len(entry) > i else ("", 0)
+            parts.append(
+                "{} {}{}".format(vframe_char, val, " " * (col_widths[c] - val_len - 2))
+            )
+        parts.append(vframe_char)
+        yield "".join(parts)
 
 
 def _make_hline(table_width: int, char: str, edge: str) -> str:
-    return "{}{}{}\n".format(edge, char * (table_width - 2), edge)
+    return "{}{}{}".format(edge, char * (table_width - 2), edge)
@@ -0,0 +1,286 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+Opt-in instrumentation of how much work drawing frames takes. For example:
+
+stats = RenderStats(hook=lambda frame: send_to_monitoring(frame.render_time))
+app = TerminalApp(stats=stats, stats_footer=True)
+...
+print(stats.percentile("render_time", 0.99))
+
+When a RenderStats is given to a RefreshPrinter (or TerminalApp), each written
+frame records its total render time (from the start of the app's draw when used
+in a TerminalApp), the time spent evaluating and wrapping content, the time
+spent writing, the number of bytes written and the number of lines that
+changed. Frames skipped because of refresh_rate are counted, and a TerminalApp
+also counts captured log records. The most recent frames are kept in a rolling
+window for percentiles, and the hook (if any) is called with each frame's
+FrameStats.
+
+Without stats, the printer and app only pay for a check that the stats are not
+None.
+"""
+
+# Standard
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+import threading
+import time
+
+## Public ######################################################################
+
+
+class FrameStats:
+    """The measurements for a single frame"""
+
+    __slots__ = (
+        "time",
+        "render_time",
+        "wrap_time",
+        "write_time",
+        "bytes_written",
+        "lines_changed",
+        "skipped",
+        "log_records",
+    )
+
+    def __init__(
+        self,
+        time: float,
+        render_time: float,
+        wrap_time: float,
+        write_time: float,
+        bytes_written: int,
+        lines_changed: int,
+        skipped: int,
+        log_records: int,
+    ):
+        """
+        Args:
+            time (float): The time.perf_counter() value when the frame finished
+            render_time (float): Seconds to draw the whole frame
+            wrap_time (float): Seconds spent evaluating and wrapping content
+            write_time (float): Seconds spent writing to the output stream
+            bytes_written (int): The number of bytes written (UTF-8 encoded)
+            lines_changed (int): The number of lines that differ from the
+                previous frame
+            skipped (int): The number of frames skipped by refresh_rate since
+                the previous frame
+            log_records (int): The total number of log records captured when
+                the frame finished
+        """
+        self.time = time
+        self.render_time = render_time
+        self.wrap_time = wrap_time
+        self.write_time = write_time
+        self.bytes_written = bytes_written
+        self.lines_changed = lines_changed
+        self.skipped = skipped
+        self.log_records = log_records
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"FrameStats({fields})"
+
+
+class RenderStats:
+    __doc__ = __doc__
+
+    # The per-frame measurements that percentiles can be computed for
+    FIELDS = (
+        "render_time",
+        "wrap_time",
+        "write_time",
+        "bytes_written",
+        "lines_changed",
+    )
+
+    def __init__(
+        self,
+        window: int = 600,
+        hook: Optional[Callable[[FrameStats], None]] = None,
+    ):
+        """Set up the stats
+
+        Args:
+            window (int): The number of most recent frames to keep
+            hook (Optional[Callable[[FrameStats], None]]): Function to call with
+                the stats of each frame when it finishes
+        """
+        if window < 1:
+            raise ValueError(f"Invalid stats window: {window}")
+        self.hook = hook
+        self.frames: Deque[FrameStats] = deque(maxlen=window)
+        self.n_frames = 0
+        self.skipped = 0
+        self.log_records = 0
+
+        # Log records may be captured on any thread
+        self._log_lock = threading.Lock()
+
+        # Set by the app when it starts drawing a frame so that the frame's
+        # render time covers the whole draw
+        self.frame_start: Optional[float] = None
+
+        # Measurements accumulated for the frame being drawn
+        self._write_time = 0.0
+        self._bytes_written = 0
+        self._lines_changed = 0
+        self._skipped = 0
+
+    ## Interface #################################################################
+
+    def percentile(self, field: str, q: float) -> Optional[float]:
+        """Get a percentile of a measurement over the recent frames
+
+        Args:
+            field (str): One of FIELDS
+            q (float): The quantile in [0, 1]
+
+        Returns:
+            value (Optional[float]): The nearest-rank percentile, or None if no
+                frames have been recorded
+        """
+        if field not in self.FIELDS:
+            raise ValueError(f"Unknown stats field: {field}")
+        values = sorted(getattr(frame, field) for frame in list(self.frames))
+        if not values:
+            return None
+        q = max(0.0, min(1.0, q))
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def log_rate(self) -> float:
+        """Get the number of log records captured per second over the recent
+        frames
+        """
+        frames = list(self.frames)
+        if len(frames) < 2 or frames[-1].time <= frames[0].time:
+            return 0.0
+        return (frames[-1].log_records - frames[0].log_records) / (
+            frames[-1].time - frames[0].time
+        )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Get the p50, p90, p99 and max of each measurement over the recent
+        frames, plus the totals
+        """
+        out = {
+            field: {
+                f"p{int(q * 100)}": self.percentile(field, q) for q in (0.5, 0.9, 0.99)
+            }
+            for field in self.FIELDS
+        }
+        for field in self.FIELDS:
+            out[field]["max"] = self.percentile(field, 1.0)
+        out["totals"] = {
+            "frames": self.n_frames,
+            "skipped": self.skipped,
+            "log_records": self.log_records,
+            "log_rate": self.log_rate(),
+        }
+        return out
+
+    def footer(self, width: int) -> str:
+        """Render a one-line summary of the recent frames
+
+        Args:
+            width (int): The maximum line width
+
+        Returns:
+            line (str): The summary line
+        """
+        if not self.frames:
+            return f"frames 0 | skipped {self.skipped}"[:width]
+        render_p50 = self.percentile("render_time", 0.5) * 1000
+        render_p99 = self.percentile("render_time", 0.99) * 1000
+        wrap_p50 = self.percentile("wrap_time", 0.5) * 1000
+        write_p50 = self.percentile("write_time", 0.5) * 1000
+        return (
+            f"frame p50 {render_p50:.1f}ms p99 {render_p99:.1f}ms"
+            f" | wrap {wrap_p50:.1f}ms | write {write_p50:.1f}ms"
+            f" | {self.percentile('bytes_written', 0.5)}B"
+            f" {self.percentile('lines_changed', 0.5)} lines"
+            f" | skipped {self.skipped} | {self.log_rate():.0f} logs/s"
+        )[:width]
+
+    ## Recording #################################################################
+
+    def add_write(self, n_bytes: int, elapsed: float):
+        """Record a write to the output stream"""
+        self._bytes_written += n_bytes
+        self._write_time += elapsed
+
+    def add_lines_changed(self, n_lines: int):
+        """Record the number of lines changed by a rendered frame"""
+        self._lines_changed += n_lines
+
+    def count_log_record(self):
+        """Record a captured log record. This is safe to call from any thread."""
+        with self._log_lock:
+            self.log_records += 1
+
+    def skip_frame(self):
+        """Record a frame that was skipped by refresh_rate"""
+        self.skipped += 1
+        self._skipped += 1
+        self.frame_start = None
+
+    def end_frame(self, start: float, wrap_time: float) -> FrameStats:
+        """Record the end of a frame
+
+        Args:
+            start (float): The time.perf_counter() value when the frame started
+                (ignored if the app set frame_start)
+            wrap_time (float): Seconds spent evaluating and wrapping content
+
+        Returns:
+            frame (FrameStats): The stats of the frame
+        """
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            start, self.frame_start = self.frame_start, None
+        frame = FrameStats(
+            time=now,
+            render_time=now - start,
+            wrap_time=wrap_time,
+            write_time=self._write_time,
+            bytes_written=self._bytes_written,
+            lines_changed=self._lines_changed,
+            skipped=self._skipped,
+            log_records=self.log_records,
+        )
+        self._write_time = 0.0
+        self._bytes_written = 0
+        self._lines_changed = 0
+        self._skipped = 0
+        self.frames.append(frame)
+        self.n_frames += 1
+        if self.hook is not None:
+            self.hook(frame)
+        return frame
+
+
+## Impl ########################################################################
+
+
+def _count_changed_lines(last_report: Optional[list], report: list) -> int:
+    """Count the lines of a frame that differ from the previous frame,
+    including lines that were removed
+    """
+    if not last_report:
+        return len(report)
+    n_changed = sum(1 for a, b in zip(last_report, report) if a != b)
+    return n_changed + abs(len(report) - len(last_report))
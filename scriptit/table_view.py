@@ -0,0 +1,176 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+The TableView is a virtualized, scrollable table widget. Rows are stored as
+they are added and the width of each column is tracked incrementally, so each
+frame only formats and wraps the rows that fall inside the visible viewport.
+The view either follows the tail of the table (showing the most recent rows)
+or shows the rows starting at an explicit scroll offset. The header row is
+always pinned at the top.
+
+The framing and column layout are the same as shape.table.
+"""
+
+# Standard
+from typing import Any, Iterable, List, Optional, Sequence
+
+# Local
+from .color import printed_len
+from .shape import _iter_table_row, _make_hline, _table_layout, _validate_table_chars
+from .widget import Widget
+
+
+class TableView(Widget):
+    __doc__ = __doc__
+
+    def __init__(
+        self,
+        header: Sequence[Any],
+        rows: Optional[Iterable[Sequence[Any]]] = None,
+        follow_tail: bool = True,
+        row_dividers: bool = True,
+        header_divider: bool = True,
+        hframe_char: str = "-",
+        vframe_char: str = "|",
+        corner_char: str = "+",
+        header_char: str = "=",
+    ):
+        """Set up the view
+
+        Args:
+            header (Sequence[Any]): The entries of the header row
+            rows (Optional[Iterable[Sequence[Any]]]): Initial data rows
+            follow_tail (bool): Show the most recent rows rather than the rows
+                at the scroll offset
+            row_dividers (bool): Include dividers between rows
+            header_divider (bool): Use header_char for the divider below the
+                header row
+            hframe_char (str): Single character for horizontal frame lines
+            vframe_char (str): Single character for vertical frame lines
+            corner_char (str): Single character for corners
+            header_char (str): Single character for the header horizontal
+                divider
+        """
+        _validate_table_chars(hframe_char, vframe_char, corner_char, header_char)
+        self.follow_tail = follow_tail
+        self.row_dividers = row_dividers
+        self.header_divider = header_divider
+        self.hframe_char = hframe_char
+        self.vframe_char = vframe_char
+        self.corner_char = corner_char
+        self.header_char = header_char
+        self.offset = 0
+        self.header = [str(val) for val in header]
+        self._widths = [printed_len(val) for val in self.header]
+        self._rows: List[List[str]] = []
+        if rows is not None:
+            self.extend(rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    ## Interface #################################################################
+
+    def append(self, row: Sequence[Any]):
+        """Add a single row to the table
+
+        Args:
+            row (Sequence[Any]): The entries for the row
+        """
+        if len(row) != len(self.header):
+            raise ValueError(f"Row has {len(row)} entries, expected {len(self.header)}")
+        row = [str(val) for val in row]
+        self._widths = [max(w, printed_len(val)) for w, val in zip(self._widths, row)]
+        self._rows.append(row)
+
+    def extend(self, rows: Iterable[Sequence[Any]]):
+        """Add multiple rows to the table
+
+        Args:
+            rows (Iterable[Sequence[Any]]): The rows to add
+        """
+        for row in rows:
+            self.append(row)
+
+    def scroll_to(self, offset: int):
+        """Show the rows starting at the given offset and stop following the
+        tail of the table
+
+        Args:
+            offset (int): Index of the first data row to show
+        """
+        self.follow_tail = False
+        self.offset = max(0, min(offset, len(self._rows) - 1))
+
+    def scroll(self, delta: int):
+        """Scroll the view by the given number of rows
+
+        Args:
+            delta (int): Number of rows to scroll (negative to scroll up)
+        """
+        self.scroll_to(self.offset + delta)
+
+    def render(self, width: int, height: int) -> List[str]:
+        """Render the rows of the table that fit in the viewport
+
+        Args:
+            width (int): The maximum width of the table
+            height (int): The maximum number of lines
+
+        Returns:
+            lines (List[str]): The lines of the table
+        """
+        col_widths, table_width = _table_layout(self._widths, None, width, None)
+        edge = _make_hline(table_width, char=self.hframe_char, edge=self.corner_char)
+        row_div = _make_hline(table_width, char=self.hframe_char, edge=self.vframe_char)
+        if self.header_divider:
+            header_div = _make_hline(
+                table_width, char=self.header_char, edge=self.vframe_char
+            )
+        else:
+            header_div = row_div if self.row_dividers else None
+
+        # Pinned header
+        top = [edge]
+        top.extend(_iter_table_row(self.header, col_widths, self.vframe_char))
+        if header_div is not None and self._rows:
+            top.append(header_div)
+        budget = height - len(top) - 1
+
+        # Visible rows
+        body = []
+        if self.follow_tail:
+            for row in reversed(self._rows):
+                if len(body) >= budget:
+                    break
+                if body and self.row_dividers:
+                    body.append(row_div)
+                body.extend(
+                    reversed(list(_iter_table_row(row, col_widths, self.vframe_char)))
+                )
+            body = list(reversed(body[:budget])) if budget > 0 else []
+        else:
+            for idx in range(self.offset, len(self._rows)):
+                if len(body) >= budget:
+                    break
+                if body and self.row_dividers:
+                    body.append(row_div)
+                body.extend(
+                    _iter_table_row(self._rows[idx], col_widths, self.vframe_char)
+                )
+            body = body[: max(0, budget)]
+
+        return (top + body + [edge])[:height]
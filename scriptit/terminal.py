@@ -0,0 +1,122 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+Shared, cached access to the geometry of the terminal. Looking up the terminal
+size requires an environment lookup and an ioctl, so the result is cached and
+invalidated when the terminal is resized (SIGWINCH). When the signal handler
+cannot be installed (no SIGWINCH on the platform, or first use outside of the
+main thread) or another handler replaces it, the cache falls back to expiring
+after a fixed time-to-live.
+"""
+
+# Standard
+from typing import Optional
+import os
+import shutil
+import signal
+import threading
+import time
+
+## Public ######################################################################
+
+
+class TerminalGeometry:
+    __doc__ = __doc__
+
+    def __init__(self, ttl: float = 0.5):
+        """Set up the cache
+
+        Args:
+            ttl (float): Number of seconds a cached size remains valid when
+                resize signals are not available
+        """
+        self.ttl = ttl
+        self._size: Optional[os.terminal_size] = None
+        self._expires = 0.0
+        self._handler_installed = False
+        self._prev_handler = None
+
+    def get(self) -> os.terminal_size:
+        """Get the current terminal size, using the cached value if valid
+
+        Returns:
+            size (os.terminal_size): The columns and lines of the terminal
+        """
+        size = self._size
+        if size is not None and (
+            self._signal_active() or time.monotonic() < self._expires
+        ):
+            return size
+        if not self._handler_installed:
+            self._install_handler()
+        size = shutil.get_terminal_size()
+        self._size = size
+        self._expires = time.monotonic() + self.ttl
+        return size
+
+    def invalidate(self):
+        """Drop the cached size so that the next lookup queries the terminal"""
+        self._size = None
+
+    ## Implementation ############################################################
+
+    def _signal_active(self) -> bool:
+        """Check whether the resize handler is installed and still current"""
+        return (
+            self._handler_installed
+            and signal.getsignal(signal.SIGWINCH) == self._on_resize
+        )
+
+    def _install_handler(self):
+        """Install the SIGWINCH handler if possible, chaining any existing
+        handler
+        """
+        if (
+            not hasattr(signal, "SIGWINCH")
+            or threading.current_thread() is not threading.main_thread()
+        ):
+            return
+        try:
+            self._prev_handler = signal.signal(signal.SIGWINCH, self._on_resize)
+        except ValueError:  # pragma: no cover
+            # Signals are unavailable (e.g. in an embedded interpreter)
+            return
+        self._handler_installed = True
+
+    def _on_resize(self, signum, frame):
+        """Signal handler that invalidates the cache"""
+        self.invalidate()
+        if callable(self._prev_handler):
+            self._prev_handler(signum, frame)
+
+
+def get_terminal_size() -> os.terminal_size:
+    """Get the (cached) size of the terminal
+
+    Returns:
+        size (os.terminal_size): The columns and lines of the terminal
+    """
+    return _GEOMETRY.get()
+
+
+def invalidate():
+    """Drop the cached terminal size"""
+    _GEOMETRY.invalidate()
+
+
+## Impl ########################################################################
+
+_GEOMETRY = TerminalGeometry()
@@ -0,0 +1,48 @@
+################################################################################
+# Copyright The Script It Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+"""
+A Widget is a piece of content that renders itself to fit a viewport. Widgets
+can be added to a RefreshPrinter or TerminalApp like any other content, but
+rather than being stringified in full and then truncated, they are asked to
+render only the lines that fit in the space available.
+"""
+
+# Standard
+from typing import List
+import abc
+
+# Local
+from .terminal import get_terminal_size
+
+
+class Widget(abc.ABC):
+    __doc__ = __doc__
+
+    @abc.abstractmethod
+    def render(self, width: int, height: int) -> List[str]:
+        """Render the widget to fit the given viewport
+
+        Args:
+            width (int): The maximum number of printed characters per line
+            height (int): The maximum number of lines
+
+        Returns:
+            lines (List[str]): The rendered lines
+        """
+
+    def __str__(self) -> str:
+        term_size = get_terminal_size()
+        return "\n".join(self.render(term_size.columns, term_size.lines))
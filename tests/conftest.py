@@ -4,6 +4,13 @@ Shared testing utilities
 
 # Standard
 import io
+import re
+
+# Third Party
+import pytest
+
+# Local
+from scriptit import terminal
 
 
 class ResettableStringIO(io.StringIO):
@@ -11,3 +18,69 @@ class ResettableStringIO(io.StringIO):
 
     def reset(self):
         io.StringIO.__init__(self)
+
+
+class FakeScreen:
+    """Minimal terminal emulator that understands the cursor movement and
+    clearing sequences emitted by RefreshPrinter. Lines never wrap.
+    """
+
+    ESCAPE_SEQUENCE = re.compile(r"\033\[(\d*)([A-Za-z])")
+
+    def __init__(self):
+        self.rows = [[]]
+        self.row = 0
+        self.col = 0
+
+    @property
+    def lines(self):
+        return ["".join(row).rstrip() for row in self.rows]
+
+    def write(self, text: str):
+        pos = 0
+        while pos < len(text):
+            match = self.ESCAPE_SEQUENCE.match(text, pos)
+            if match:
+                self._escape(int(match.group(1) or 1), match.group(2))
+                pos = match.end()
+                continue
+            char = text[pos]
+            pos += 1
+            if char == "\n":
+                self._move_to(self.row + 1)
+            elif char == "\r":
+                self.col = 0
+            else:
+                row = self.rows[self.row]
+                row.extend(" " * max(0, self.col + 1 - len(row)))
+                row[self.col] = char
+                self.col += 1
+
+    def _move_to(self, row: int):
+        self.row = max(0, row)
+        self.col = 0
+        while len(self.rows) <= self.row:
+            self.rows.append([])
+
+    def _escape(self, num: int, code: str):
+        if code == "F":
+            self._move_to(self.row - num)
+        elif code == "E":
+            self._move_to(self.row + num)
+        elif code == "K":
+            del self.rows[self.row][self.col :]
+        elif code == "J":
+            del self.rows[self.row][self.col :]
+            del self.rows[self.row + 1 :]
+        else:
+            raise ValueError(f"Unsupported escape code: {code}")
+
+
+@pytest.fixture(autouse=True)
+def reset_terminal_geometry():
+    """Make sure that each test sees a fresh terminal size lookup so that
+    patches to shutil.get_terminal_size take effect
+    """
+    terminal.invalidate()
+    yield
+    terminal.invalidate()
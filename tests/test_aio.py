@@ -0,0 +1,133 @@
+"""
+Tests for the asyncio printer and app
+"""
+
+# Standard
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+# Third Party
+import pytest
+
+from tests.conftest import ResettableStringIO
+from tests.test_app import reset_logging
+
+# Local
+from scriptit.aio import AsyncRefreshPrinter, AsyncTerminalApp
+
+
+def _read_all(read_fd):
+    """Read everything from the read end of a pipe until it is closed"""
+    chunks = []
+    while chunk := os.read(read_fd, 65536):
+        chunks.append(chunk)
+    os.close(read_fd)
+    return b"".join(chunks).decode("utf-8")
+
+
+def test_printer_fallback_without_fileno():
+    """Make sure that streams without a file descriptor are written directly"""
+    stream = ResettableStringIO()
+
+    async def run():
+        async with AsyncRefreshPrinter(write_stream=stream) as printer:
+            assert not printer.connected
+            printer.add("hello")
+            printer.refresh()
+
+    asyncio.run(run())
+    assert stream.getvalue() == "hello\n"
+
+
+def test_printer_writes_through_pipe():
+    """Make sure that frames are written through the pipe transport and the
+    original file descriptor is restored to blocking mode
+    """
+    read_fd, write_fd = os.pipe()
+    stream = os.fdopen(write_fd, "w")
+    reader_out = []
+    reader = threading.Thread(target=lambda: reader_out.append(_read_all(read_fd)))
+    reader.start()
+
+    async def run():
+        async with AsyncRefreshPrinter(write_stream=stream) as printer:
+            assert printer.connected
+            assert not os.get_blocking(write_fd)
+            for i in range(3):
+                printer.add(f"frame {i}")
+                printer.refresh()
+
+    asyncio.run(run())
+    assert os.get_blocking(write_fd)
+    stream.close()
+    reader.join(5)
+    output = reader_out[0]
+    assert all(f"frame {i}" in output for i in range(3))
+    assert output.endswith("frame 2\n")
+
+
+def test_app_draws_on_tick():
+    """Make sure that refresh only marks the app dirty and frames are drawn by
+    the drawing task at most fps times per second
+    """
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+
+        async def run():
+            async with AsyncTerminalApp(
+                write_stream=stream, log_console_size=4, fps=10
+            ) as app:
+                app.add("content")
+                app.refresh()
+                assert app.printer.refreshes == 0
+                await asyncio.sleep(0.02)
+                assert app.printer.refreshes == 1
+                for i in range(10):
+                    log.warning("record %d", i)
+                assert app.printer.refreshes == 1
+                await asyncio.sleep(0.15)
+                assert app.printer.refreshes == 2
+                log.warning("final")
+            return app
+
+        app = asyncio.run(run())
+        assert app.printer.refreshes == 3
+        lines = stream.getvalue().split("\n")
+        assert "final" in lines[-4]
+        assert "content" in lines[-2]
+
+
+def test_app_log_from_thread():
+    """Make sure that records logged from other threads wake the drawing task"""
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+
+        async def run():
+            async with AsyncTerminalApp(write_stream=stream, log_console_size=4):
+                await asyncio.get_running_loop().run_in_executor(
+                    None, log.warning, "from thread"
+                )
+                await asyncio.sleep(0.05)
+                assert "from thread" in stream.getvalue()
+
+        asyncio.run(run())
+
+
+def test_app_invalid_fps():
+    """Make sure that a non-positive fps is rejected"""
+    with pytest.raises(ValueError):
+        AsyncTerminalApp(fps=0)
+
+
+def test_not_imported_by_package():
+    """Make sure that importing scriptit does not pay for asyncio or
+    multiprocessing
+    """
+    code = "import scriptit, sys; print('asyncio' in sys.modules, 'multiprocessing' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["False", "False"]
@@ -8,11 +8,17 @@ from unittest import mock
 import logging
 import os
 import tempfile
+import threading
+
+# Third Party
+import pytest
 
 from tests.conftest import ResettableStringIO
 
 # Local
-from scriptit import RefreshPrinter, TerminalApp
+from scriptit import RefreshPrinter, TableView, TerminalApp
+from scriptit.app import HandlerWrapper
+from scriptit.metrics import MetricsRegistry
 
 
 @contextmanager
@@ -175,3 +181,425 @@ def test_app_wrap_long_log_lines():
         log.warning(msg)
         lines = stream.getvalue().split("\n")
         assert len(lines) == 6
+
+
+def test_app_log_buffer_size():
+    """Make sure that the number of retained log lines is bounded"""
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_buffer_size=3)
+        for i in range(10):
+            log.warning("line %d", i)
+        assert len(app.log_buffer) == 3
+        assert "line 9" in app.log_buffer.getvalue()
+        assert "line 6" not in app.log_buffer.getvalue()
+
+
+def test_app_max_fps():
+    """Make sure that log-triggered redraws are coalesced when rate limited and
+    that the final frame is flushed on close
+    """
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+        with TerminalApp(write_stream=stream, max_fps=0.5) as app:
+            app.add("content")
+            app.refresh()
+            stream.reset()
+            for i in range(100):
+                log.warning("line %d", i)
+            assert app.printer.refreshes <= 2
+        lines = stream.getvalue().split("\n")
+        assert any("line 99" in line for line in lines)
+        assert any(line.strip() == "content" for line in lines)
+
+
+def test_app_widget_content():
+    """Make sure that widgets are rendered to fit the content panel"""
+    with reset_logging():
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=3)
+        app.add(TableView(["Index", "Value"], ([i, i] for i in range(1000))))
+        app.refresh()
+        lines = stream.getvalue().split("\n")
+        assert lines[-2].startswith("+")
+        assert lines[-3].startswith("| 999")
+
+
+def test_app_log_file_async():
+    """Make sure that the log file can be written from a background thread"""
+    with tempfile.TemporaryDirectory() as workdir, reset_logging() as log:
+        log_file = os.path.join(workdir, "test.log")
+        stream = ResettableStringIO()
+        with TerminalApp(write_stream=stream, log_file=log_file, log_file_async=True):
+            for i in range(100):
+                log.warning("line %d", i)
+            assert "line 99" in stream.getvalue()
+        with open(log_file, "r") as handle:
+            log_file_lines = list(handle.readlines())
+        assert len(log_file_lines) == 100
+
+
+def test_app_close_stops_capture():
+    """Make sure that closing the app puts the original handlers back so that
+    records logged afterwards are not written to the closed log file
+    """
+    with tempfile.TemporaryDirectory() as workdir, reset_logging() as log:
+        log_file = os.path.join(workdir, "test.log")
+        handler = logging.root.handlers[0]
+        stream = ResettableStringIO()
+        with TerminalApp(write_stream=stream, log_file=log_file) as app:
+            assert isinstance(logging.root.handlers[0], HandlerWrapper)
+            log.warning("captured")
+        assert logging.root.handlers == [handler]
+        assert "addHandler" not in vars(logging.root)
+        with mock.patch.object(handler, "emit") as emit_mock:
+            log.warning("after close")
+            new_handler = logging.StreamHandler(ResettableStringIO())
+            logging.root.addHandler(new_handler)
+            logging.getLogger("new.logger").addHandler(logging.NullHandler())
+        assert emit_mock.call_count == 1
+        assert logging.root.handlers == [handler, new_handler]
+        new_logger = logging.getLogger("new.logger")
+        assert not isinstance(new_logger.handlers[0], HandlerWrapper)
+        assert "after close" not in app.log_buffer.getvalue()
+        with open(log_file) as handle:
+            assert handle.read().count("\n") == 1
+
+
+def test_app_capture_error():
+    """Make sure that a failure to capture a record is reported through the
+    handler's handleError rather than raised from the logging call
+    """
+    with reset_logging() as log:
+        app = TerminalApp(write_stream=ResettableStringIO())
+        wrapper = logging.root.handlers[0]
+        wrapper.handleError = mock.MagicMock()
+        with mock.patch.object(app.log_buffer, "write", side_effect=OSError):
+            log.warning("lost")
+        wrapper.handleError.assert_called_once()
+        log.warning("kept")
+        assert "kept" in app.log_buffer.getvalue()
+
+
+def test_app_lazy_log_format():
+    """Make sure that only visible records are formatted in lazy mode and that
+    all records still go to the log file
+    """
+    with tempfile.TemporaryDirectory() as workdir, reset_logging() as log:
+        log_file = os.path.join(workdir, "test.log")
+        stream = ResettableStringIO()
+        app = TerminalApp(
+            write_stream=stream,
+            log_console_size=5,
+            lazy_log_format=True,
+            max_fps=0.5,
+        )
+        formatter = logging.root.handlers[0].wrapped_handler.formatter
+        with mock.patch.object(
+            formatter, "format", side_effect=formatter.format
+        ) as format_mock:
+            for i in range(100):
+                log.warning("line %d", i)
+            app.close()
+            assert format_mock.call_count <= 10
+            n_calls = format_mock.call_count
+            app.refresh()
+            assert format_mock.call_count == n_calls
+        lines = stream.getvalue().split("\n")
+        assert "line 99" in lines[-3]
+
+        app = TerminalApp(write_stream=stream, log_file=log_file, lazy_log_format=True)
+        log.warning("hello")
+        app.close()
+        with open(log_file, "r") as handle:
+            assert "hello" in handle.read()
+
+
+@pytest.mark.parametrize("dedupe", [True, False])
+def test_app_dedupe_log_records(dedupe):
+    """Make sure that records passing through multiple handlers are captured
+    once when deduplicating
+    """
+    with reset_logging():
+        stream = ResettableStringIO()
+        logging.root.addHandler(logging.StreamHandler(ResettableStringIO()))
+        app = TerminalApp(write_stream=stream, dedupe_log_records=dedupe)
+        log = logging.getLogger("a.b")
+        log.addHandler(logging.StreamHandler())
+        logging.getLogger("a").addHandler(logging.StreamHandler())
+        with mock.patch.object(app, "_refresh") as refresh_mock:
+            log.warning("hello")
+        n_handlers = 4  # basicConfig + root + a + a.b
+        exp_captures = 1 if dedupe else n_handlers
+        assert len(app.log_buffer) == exp_captures
+        assert refresh_mock.call_count == exp_captures
+
+
+def test_app_threaded_content_merged_in_order():
+    """Make sure that content added from multiple threads is merged in the
+    order it was added and that buffers of finished threads are dropped
+    """
+    with reset_logging():
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=3)
+        barrier = threading.Barrier(4)
+
+        def worker(idx):
+            barrier.wait()
+            for i in range(50):
+                app.add(f"worker {idx} line {i}")
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        app.add("main")
+        pending = app.content_entries
+        assert len(pending) == 201
+        assert pending[-1] == "main"
+        for idx in range(4):
+            mine = [entry for entry in pending if entry.startswith(f"worker {idx} ")]
+            assert mine == [f"worker {idx} line {i}" for i in range(50)]
+
+        app.refresh()
+        assert app.previous_content_entities == pending
+        assert app.content_entries == []
+        assert len(app._content_buffers) == 1
+
+
+def test_app_content_entries_assignable():
+    """Make sure that the pending content can still be replaced by assigning
+    content_entries
+    """
+    with reset_logging():
+        app = TerminalApp(write_stream=ResettableStringIO())
+        app.add("first")
+        app.content_entries = ["second", "third"]
+        assert app.content_entries == ["second", "third"]
+        app.content_entries = []
+        assert app.content_entries == []
+
+
+def test_app_log_does_not_consume_content():
+    """Make sure that a redraw triggered by a log record shows the content from
+    the last refresh and leaves newly added content for the next one
+    """
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=3)
+        app.add("first")
+        app.refresh()
+        app.add("second")
+        stream.reset()
+        log.warning("hello")
+        assert "first" in stream.getvalue()
+        assert "second" not in stream.getvalue()
+        assert app.content_entries == ["second"]
+        app.refresh()
+        assert "second" in stream.getvalue()
+
+
+def test_app_log_from_thread_does_not_block():
+    """Make sure that a log record emitted while another thread is drawing does
+    not wait for it and that the drawing thread redraws to include the record
+    """
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=4)
+        started = threading.Event()
+        release = threading.Event()
+        real_refresh = app.printer.refresh
+
+        def slow_refresh(*args, **kwargs):
+            if not started.is_set():
+                started.set()
+                assert release.wait(5)
+            real_refresh(*args, **kwargs)
+
+        with mock.patch.object(app.printer, "refresh", slow_refresh):
+            drawer = threading.Thread(target=app.refresh)
+            drawer.start()
+            assert started.wait(5)
+
+            # The emitting thread returns while the drawer is still writing
+            emitter = threading.Thread(target=log.warning, args=("from worker",))
+            emitter.start()
+            emitter.join(5)
+            assert not emitter.is_alive()
+            assert "from worker" not in stream.getvalue()
+
+            release.set()
+            drawer.join(5)
+            app.close()
+        assert "from worker" in stream.getvalue().split("\n")[-3]
+        assert app.printer.refreshes == 2
+
+
+def test_app_owner_draw_outside_handler_lock():
+    """Make sure that while the owner thread draws for a record it logged, a
+    worker logging through the same handler does not wait for the draw
+    """
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=4)
+        started = threading.Event()
+        release = threading.Event()
+        events = []
+        real_refresh = app.printer.refresh
+
+        def slow_refresh(*args, **kwargs):
+            if not started.is_set():
+                started.set()
+                events.append("released" if release.wait(2) else "timed out")
+            real_refresh(*args, **kwargs)
+
+        def worker():
+            assert started.wait(5)
+            log.warning("from worker")
+            events.append("emitted")
+            release.set()
+
+        with mock.patch.object(app.printer, "refresh", slow_refresh):
+            emitter = threading.Thread(target=worker)
+            emitter.start()
+            log.warning("from owner")
+            emitter.join(5)
+            app.close()
+        assert events == ["emitted", "released"]
+        assert "from worker" in stream.getvalue()
+
+
+def test_app_log_from_worker_thread_handed_off():
+    """Make sure that records logged on threads other than the one that created
+    the app are drawn by the background drawing thread
+    """
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=8)
+        drawing_threads = set()
+        real_refresh = app.printer.refresh
+
+        def record_refresh(*args, **kwargs):
+            drawing_threads.add(threading.get_ident())
+            real_refresh(*args, **kwargs)
+
+        with mock.patch.object(app.printer, "refresh", record_refresh):
+            log.warning("from main")
+            assert drawing_threads == {threading.get_ident()}
+            drawing_threads.clear()
+
+            workers = [
+                threading.Thread(target=log.warning, args=(f"from worker {i}",))
+                for i in range(4)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            app.close()
+        assert not drawing_threads & {worker.ident for worker in workers}
+        assert app._handoff_scheduler._thread.ident in drawing_threads
+        assert all(f"from worker {i}" in stream.getvalue() for i in range(4))
+
+
+def test_app_metrics_panel():
+    """Make sure that the metrics panel is drawn below the log console and takes
+    its lines from the content
+    """
+    term_size_mock = mock.MagicMock()
+    term_size_mock.columns = 80
+    term_size_mock.lines = 24
+    with reset_logging() as log, mock.patch(
+        "shutil.get_terminal_size", return_value=term_size_mock
+    ):
+        stream = ResettableStringIO()
+        metrics = MetricsRegistry()
+        counter = metrics.counter("items")
+        app = TerminalApp(write_stream=stream, log_console_size=4, metrics=metrics)
+        counter.inc(3)
+        log.warning("hello")
+        for i in range(30):
+            app.add(f"line {i}")
+        stream.reset()
+        app.refresh()
+        # Skip the line clearing for the frame drawn for the log record
+        lines = stream.getvalue().split("\n")[1:]
+        assert lines[0].startswith(TerminalApp.CONSOLE_START)
+        assert "hello" in lines[1]
+        assert lines[2].startswith(TerminalApp.METRICS_START)
+        assert lines[3].rstrip() == "items 3 (0/s)"
+        assert lines[4] == "=" * 80
+        assert lines[5].startswith("line 12")
+        assert lines[-2].startswith("line 29")
+        assert len(lines) == 24
+
+
+def test_app_lazy_content():
+    """Make sure that lazy content is only evaluated when it is visible and
+    that it is evaluated once
+    """
+    term_size_mock = mock.MagicMock()
+    term_size_mock.columns = 80
+    term_size_mock.lines = 24
+    with reset_logging(), mock.patch(
+        "shutil.get_terminal_size", return_value=term_size_mock
+    ):
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=4)
+        thunks = [mock.MagicMock(return_value=f"line {i}") for i in range(100)]
+        for thunk in thunks:
+            app.add(thunk)
+        app.add(iter_line for iter_line in ["gen line"])
+        app.refresh()
+        app._redraw()
+        n_visible = 24 - 4 - 1
+        assert all(thunk.call_count == 0 for thunk in thunks[: 100 - n_visible])
+        assert all(thunk.call_count == 1 for thunk in thunks[100 - n_visible :])
+        lines = stream.getvalue().split("\n")
+        assert lines[-3].rstrip() == "line 99"
+        assert lines[-2].rstrip() == "gen line"
+
+
+def test_app_embedded_mode():
+    """Make sure that with an append-only printer, the app writes only new log
+    lines and changed content lines
+    """
+
+    def run(append_only):
+        with reset_logging() as log:
+            stream = ResettableStringIO()
+            app = TerminalApp(write_stream=stream, append_only=append_only)
+            for i in range(20):
+                log.warning("message %d", i)
+                app.add("header")
+                app.add(lambda i=i: f"status {i // 10}")
+                app.refresh()
+            return stream.getvalue()
+
+    output = run(append_only=True)
+    assert output.split("\n")[:4] == [
+        "WARNING:TEST:message 0",
+        "header",
+        "status 0",
+        "WARNING:TEST:message 1",
+    ]
+    assert output.count("header") == 1
+    assert output.count("status 1") == 1
+    assert output.count("message") == 20
+    assert output.endswith("WARNING:TEST:message 19\n")
+    assert "\033" not in output
+    assert len(output) * 20 < len(run(append_only=False))
+
+
+def test_app_log_string_output_deprecated():
+    """Make sure that the deprecated log_string_output alias still exposes the
+    captured log lines
+    """
+    with reset_logging() as log:
+        app = TerminalApp(write_stream=ResettableStringIO())
+        log.warning("hello")
+        with pytest.warns(DeprecationWarning):
+            output = app.log_string_output
+        assert output is app.log_buffer
+        assert "hello" in output.getvalue()
@@ -0,0 +1,117 @@
+"""
+Tests for BackgroundWriter
+"""
+
+# Standard
+import threading
+import time
+
+# Third Party
+import pytest
+
+from tests.conftest import ResettableStringIO
+
+# Local
+from scriptit.background_writer import BackgroundWriter
+
+
+class SlowStream(ResettableStringIO):
+    """Stream that blocks writes until released and records write sizes"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.writes = []
+        self.closed_value = None
+
+    def write(self, text):
+        self.release.wait()
+        self.writes.append(text)
+        return super().write(text)
+
+    def close(self):
+        self.closed_value = self.getvalue()
+        super().close()
+
+
+def test_background_writer_batches():
+    """Make sure that queued writes are batched into a small number of writes
+    on the wrapped stream and drained on close
+    """
+    stream = SlowStream()
+    writer = BackgroundWriter(stream)
+    for i in range(1000):
+        writer.write(f"line {i}\n")
+    writer.flush()
+    stream.release.set()
+    writer.close()
+    assert stream.closed_value == "".join(f"line {i}\n" for i in range(1000))
+    assert len(stream.writes) < 1000
+
+
+def test_background_writer_drop_on_full():
+    """Make sure that writes are dropped and counted when the queue is full
+    and blocking is disabled
+    """
+    stream = SlowStream()
+    writer = BackgroundWriter(stream, queue_size=5, block_on_full=False)
+    n_written = sum(1 for i in range(100) if writer.write(f"{i}\n"))
+    assert writer.dropped == 100 - n_written
+    assert writer.dropped > 0
+    stream.release.set()
+    writer.close()
+    assert len(stream.closed_value.split()) == n_written
+
+
+def test_background_writer_closed():
+    """Make sure that writes after close are dropped and closing is
+    idempotent
+    """
+    stream = SlowStream()
+    stream.release.set()
+    writer = BackgroundWriter(stream, flush_interval=0.01)
+    writer.write("hello\n")
+    writer.close()
+    writer.close()
+    assert stream.closed_value == "hello\n"
+    assert writer.write("world\n") == 0
+    assert writer.dropped == 1
+
+
+def test_background_writer_write_error():
+    """Make sure that a failed write doesn't stop the background thread or
+    raise from write, and is raised from close
+    """
+
+    class FailingStream(ResettableStringIO):
+        def __init__(self):
+            super().__init__()
+            self.fail = threading.Event()
+
+        def write(self, text):
+            if self.fail.is_set():
+                self.fail.clear()
+                raise OSError("disk full")
+            return super().write(text)
+
+    def wait_for(condition):
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        raise AssertionError("Timed out")
+
+    stream = FailingStream()
+    stream.fail.set()
+    writer = BackgroundWriter(stream, queue_size=1, flush_interval=0.01)
+    writer.write("lost\n")
+    wait_for(lambda: writer._error is not None)
+
+    # The thread keeps draining after the error and the error is raised from
+    # close
+    writer.write("kept\n")
+    wait_for(lambda: "kept" in stream.getvalue())
+    assert "lost" not in stream.getvalue()
+    with pytest.raises(OSError):
+        writer.close()
+    assert not writer._thread.is_alive()
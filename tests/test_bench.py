@@ -0,0 +1,76 @@
+"""
+Tests for the benchmark suite
+"""
+
+# Standard
+import json
+import os
+import tempfile
+
+# Third Party
+import pytest
+
+# Local
+from scriptit import bench, terminal
+
+
+def test_all_benchmarks_run():
+    """Make sure that every benchmark runs with the fixed terminal geometry and
+    the geometry is restored afterwards
+    """
+    columns = terminal.get_terminal_size().columns
+    results = bench.run_benchmarks(min_time=1e-6, repeat=1, columns=33)
+    assert list(results) == list(bench.BENCHMARKS)
+    for result in results.values():
+        assert result["seconds"] > 0
+        assert result["min"] <= result["seconds"]
+        assert result["number"] >= 1
+    assert terminal.get_terminal_size().columns == columns
+
+
+def test_fake_terminal():
+    """Make sure that the fake terminal counts what is written"""
+    stream = bench.FakeTerminal()
+    assert stream.isatty()
+    assert stream.write("hello") == 5
+    stream.flush()
+    assert stream.chars == 5
+
+
+def test_baseline_comparison(capsys):
+    """Make sure that results are written as JSON and compared to a baseline"""
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, "out.json")
+        args = ["-k", "color.decolorize[10]", "--min-time", "1e-4", "--repeat", "2"]
+        assert bench.main(args + ["-o", output]) == 0
+        with open(output) as handle:
+            report = json.load(handle)
+        assert list(report["results"]) == ["color.decolorize[10]"]
+        assert json.loads(capsys.readouterr().out) == report
+
+        # Compare against a baseline that is much faster
+        report["results"]["color.decolorize[10]"]["seconds"] = 1e-12
+        with open(output, "w") as handle:
+            json.dump(report, handle)
+        assert bench.main(args + ["-b", output, "--max-ratio", "2"]) == 1
+        report = json.loads(capsys.readouterr().out)
+        result = report["results"]["color.decolorize[10]"]
+        assert result["baseline"] == 1e-12
+        assert result["ratio"] > 2
+        assert report["slower"] == ["color.decolorize[10]"]
+
+        # Benchmarks that are not in the baseline are reported
+        args = ["-k", "shape.box[10]", "--min-time", "1e-4", "--repeat", "1"]
+        assert bench.main(args + ["-b", output, "--max-ratio", "2"]) == 0
+        report = json.loads(capsys.readouterr().out)
+        assert report["missing_from_baseline"] == ["shape.box[10]"]
+
+
+def test_cli_errors(capsys):
+    """Make sure that invalid arguments and baselines are rejected"""
+    assert bench.main(["--list"]) == 0
+    assert capsys.readouterr().out.split() == list(bench.BENCHMARKS)
+    with pytest.raises(SystemExit):
+        bench.main(["--repeat", "0"])
+    with pytest.raises(SystemExit):
+        bench.main(["--baseline", "/does/not/exist.json"])
@@ -33,3 +33,28 @@ def test_invalid_color():
     """Make sure that a ValueError is raised on an invalid color"""
     with pytest.raises(ValueError):
         color.colorize("hey there", "not valid")
+
+
+@pytest.mark.parametrize(
+    ["text", "expected"],
+    [
+        # Plain text is untouched, including text that looks like color codes
+        ("1.0mb free", "1.0mb free"),
+        ("0;31m", "0;31m"),
+        # Nested and adjacent colors
+        (
+            color.colorize("a", "red") + color.bg_colorize("b", "light_blue"),
+            "ab",
+        ),
+        # Arbitrary SGR and cursor sequences
+        ("\033[1;4;38;5;208mbold\033[m \033[2K\033[3Fx", "bold x"),
+        # OSC hyperlink
+        ("\033]8;;http://x\033\\link\033]8;;\007", "link"),
+    ],
+)
+def test_decolorize_sequences(text, expected):
+    """Make sure that decolorize strips all escape sequences and only escape
+    sequences
+    """
+    assert color.decolorize(text) == expected
+    assert color.printed_len(text) == len(expected)
@@ -0,0 +1,154 @@
+"""
+Tests for LogBuffer
+"""
+
+# Standard
+import logging
+import threading
+import time
+
+# Third Party
+import pytest
+
+# Local
+from scriptit.log_buffer import LogBuffer
+
+
+def test_log_buffer_lines():
+    """Make sure that written text is split into lines and blank lines are
+    dropped
+    """
+    buf = LogBuffer()
+    buf.write("one\n\ntwo\n   \n")
+    assert len(buf) == 2
+    assert buf.tail(10) == ["one", "two"]
+    assert buf.getvalue() == "one\ntwo\n"
+
+
+def test_log_buffer_partial_lines():
+    """Make sure that partial lines are held until the newline arrives"""
+    buf = LogBuffer()
+    buf.write("hello ")
+    assert len(buf) == 0
+    buf.write("world\nfoo")
+    assert buf.tail(10) == ["hello world"]
+    buf.write("\n")
+    assert buf.tail(10) == ["hello world", "foo"]
+
+
+def test_log_buffer_capacity():
+    """Make sure that only the most recent lines are retained"""
+    buf = LogBuffer(capacity=3)
+    for i in range(10):
+        buf.write(f"line {i}\n")
+    assert len(buf) == 3
+    assert buf.tail(10) == ["line 7", "line 8", "line 9"]
+    with pytest.raises(ValueError):
+        LogBuffer(capacity=0)
+
+
+def test_log_buffer_tail_wrapped():
+    """Make sure that tail wraps lines to the width and only returns the
+    requested number of wrapped lines
+    """
+    buf = LogBuffer()
+    buf.write("a\n")
+    buf.write("b" * 10 + "\n")
+    assert buf.tail(3, 4) == ["bbbb", "bbbb", "bb"]
+    assert buf.tail(5, 4) == ["a", "bbbb", "bbbb", "bb"]
+    assert buf.tail(2, 5) == ["bbbbb", "bbbbb"]
+    assert buf.tail(0, 5) == []
+
+
+def test_log_buffer_lazy_records():
+    """Make sure that appended records are only formatted when read and only
+    formatted once
+    """
+    formatted = []
+
+    def formatter(record):
+        formatted.append(record.msg)
+        return f"{record.msg}\nsecond line"
+
+    buf = LogBuffer()
+    for i in range(100):
+        buf.append_record(logging.makeLogRecord({"msg": f"msg {i}"}), formatter)
+    assert not formatted
+    assert buf.tail(3, 80) == ["second line", "msg 99", "second line"]
+    assert formatted == ["msg 99", "msg 98"]
+    buf.tail(3, 5)
+    assert formatted == ["msg 99", "msg 98"]
+    entry = buf.append_record(logging.makeLogRecord({"msg": "last"}), formatter)
+    assert entry.text == "last\nsecond line"
+    assert formatted[-1] == "last"
+    assert buf.getvalue().endswith("last\nsecond line\n")
+
+
+def test_log_buffer_lines_since():
+    """Make sure that lines_since returns only the entries appended after the
+    mark, skipping entries that were already dropped
+    """
+    buf = LogBuffer(capacity=3)
+    buf.write("line 0\nline 1\n")
+    lines, mark = buf.lines_since(0)
+    assert lines == ["line 0", "line 1"]
+    assert buf.lines_since(mark) == ([], mark)
+    buf.write("multi\nline\n" + "x" * 100 + "\n")
+    buf.write("last\n")
+    lines, mark = buf.lines_since(mark)
+    assert lines == ["line", "x" * 100, "last"]
+    assert mark == 6
+
+
+def test_log_buffer_lazy_record_format_error():
+    """Make sure that a record that fails to format is shown as its raw message
+    instead of raising when it is read
+    """
+    buffer = LogBuffer()
+    record = logging.LogRecord(
+        "test", logging.INFO, __file__, 1, "%d items", ("x",), None
+    )
+    entry = buffer.append_record(record, logging.Formatter().format)
+    assert entry.text.startswith("%d items [format error: TypeError(")
+    assert buffer.tail(1) == [entry.text]
+
+
+def test_log_buffer_format_once_across_threads():
+    """Make sure that a record read by several threads at once is formatted
+    once and that formatting happens outside of the buffer's lock
+    """
+    buf = LogBuffer()
+    formatted = []
+
+    def formatter(record):
+        assert not buf._lock.locked()
+        formatted.append(record.msg)
+        time.sleep(0.01)
+        return record.msg
+
+    buf.append_record(logging.makeLogRecord({"msg": "hello"}), formatter)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def reader():
+        barrier.wait()
+        results.append(buf.tail(1))
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert formatted == ["hello"]
+    assert results == [["hello"]] * 8
+
+
+def test_log_buffer_tail_skips_blank_records():
+    """Make sure that the tail reaches past records that format to nothing"""
+    buf = LogBuffer(capacity=20)
+    buf.write("first\n")
+    for i in range(10):
+        buf.append_record(logging.makeLogRecord({"msg": ""}), lambda record: "")
+    assert buf.tail(2) == ["first"]
+    buf.write("last\n")
+    assert buf.tail(2) == ["first", "last"]
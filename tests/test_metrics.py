@@ -0,0 +1,120 @@
+"""
+Tests for the metrics registry and panel
+"""
+
+# Standard
+from unittest import mock
+import threading
+
+# Third Party
+import pytest
+
+# Local
+from scriptit.metrics import MetricsPanel, MetricsRegistry
+
+
+def test_counter_threads():
+    """Make sure that counter increments from many threads are all counted"""
+    registry = MetricsRegistry()
+    counter = registry.counter("count")
+    assert registry.counter("count") is counter
+
+    def worker():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(0.5)
+    assert registry.snapshot() == {"count": 40000.5}
+
+
+def test_gauge_and_histogram():
+    """Make sure that gauges hold the last value and histograms count values
+    in their buckets
+    """
+    registry = MetricsRegistry()
+    gauge = registry.gauge("gauge")
+    gauge.set(3)
+    gauge.set(1.5)
+    hist = registry.histogram("hist", buckets=[1, 2, 4])
+    for value in [0.5, 1, 1.5, 3, 10]:
+        hist.observe(value)
+    snapshot = registry.snapshot()
+    assert snapshot["gauge"] == 1.5
+    assert snapshot["hist"] == [2, 1, 1, 1, 16]
+
+
+def test_registry_errors():
+    """Make sure that invalid registrations are rejected"""
+    registry = MetricsRegistry(capacity=4)
+    registry.counter("a")
+    with pytest.raises(ValueError):
+        registry.gauge("a")
+    with pytest.raises(ValueError):
+        registry.histogram("h", buckets=[2, 1])
+    with pytest.raises(ValueError):
+        registry.histogram("h", buckets=[1, 2])
+    registry.histogram("h", buckets=[1])
+    with pytest.raises(ValueError):
+        registry.counter("b")
+    with pytest.raises(ValueError):
+        MetricsRegistry(capacity=0)
+
+
+def test_panel_rates():
+    """Make sure that the panel computes rates between renders"""
+    registry = MetricsRegistry()
+    counter = registry.counter("requests")
+    registry.gauge("depth").set(7)
+    hist = registry.histogram("latency", buckets=[1, 2])
+    panel = MetricsPanel(registry)
+    with mock.patch("time.monotonic", return_value=10.0):
+        lines = panel.render(80, 10)
+    assert lines == ["requests 0", "depth    7", "latency  n=0"]
+    counter.inc(20)
+    for value in [0.5, 0.5, 1.5, 1.5]:
+        hist.observe(value)
+    with mock.patch("time.monotonic", return_value=12.0):
+        lines = panel.render(80, 10)
+    assert lines[0] == "requests 20 (10/s)"
+    assert lines[2] == "latency  n=4 mean=1 p50=1 p90=1.8 p99=1.98 (2/s)"
+    assert len(panel.render(80, 2)) == 2
+    assert all(len(line) <= 10 for line in panel.render(10, 10))
+
+
+def test_dead_thread_rows_folded():
+    """Make sure that the values of threads that have exited are kept once
+    their arrays are released
+    """
+    registry = MetricsRegistry()
+    counter = registry.counter("count")
+    hist = registry.histogram("hist", buckets=[1])
+
+    def worker():
+        counter.inc(2)
+        hist.observe(0.5)
+
+    for _ in range(5):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    assert len(registry._rows) == 1
+    counter.inc()
+    assert registry.snapshot() == {"count": 11, "hist": [5, 0, 2.5]}
+    assert len(registry._rows) == 1
+
+
+def test_panel_edge_values():
+    """Make sure that non-finite values are formatted and a negative height
+    renders nothing
+    """
+    registry = MetricsRegistry()
+    registry.gauge("nan").set(float("nan"))
+    registry.gauge("inf").set(float("inf"))
+    panel = MetricsPanel(registry)
+    assert panel.render(80, 10) == ["nan nan", "inf inf"]
+    assert panel.render(80, -1) == []
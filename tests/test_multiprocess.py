@@ -0,0 +1,186 @@
+"""
+Tests for multi-process aggregation
+"""
+
+# Standard
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import logging
+import multiprocessing
+import pickle
+import queue
+
+# Third Party
+import pytest
+
+from tests.conftest import ResettableStringIO
+from tests.test_app import reset_logging
+
+# Local
+from scriptit import TerminalApp, multiprocess
+from scriptit.progress import ProgressGroup
+
+
+def _worker_task(i):
+    """Task run in the worker processes"""
+    logging.getLogger("worker").warning("log from task %d", i)
+    multiprocess.add(f"content from task {i}")
+    return i
+
+
+def _logging_state_task(_):
+    """Task that reports how logging is set up in the worker process"""
+    root = logging.getLogger()
+    return (
+        [type(handler).__name__ for handler in root.handlers],
+        "addHandler" in vars(root),
+        type(logging.getLogger("worker.new")) is logging.Logger,
+        [type(handler).__name__ for handler in logging.getLogger("named").handlers],
+    )
+
+
+def _counter_task(counters, slot, n):
+    """Task that reports its progress through shared counters"""
+    for _ in range(n):
+        counters.add(slot)
+    counters.close()
+    return slot
+
+
+def test_process_pool_aggregation():
+    """Make sure that logs and content from pool workers end up in the app"""
+    ctx = multiprocessing.get_context("spawn")
+    with reset_logging():
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=10)
+        with multiprocess.ProcessCollector(app, context=ctx) as collector:
+            with ProcessPoolExecutor(
+                max_workers=2,
+                mp_context=ctx,
+                initializer=multiprocess.init_worker,
+                initargs=(collector.queue,),
+            ) as pool:
+                assert sorted(pool.map(_worker_task, range(4))) == list(range(4))
+        log_text = app.log_buffer.getvalue()
+        assert all(f"log from task {i}" in log_text for i in range(4))
+        app.refresh()
+        output = stream.getvalue()
+        assert all(f"content from task {i}" in output for i in range(4))
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="fork is not available",
+)
+def test_process_pool_aggregation_fork():
+    """Make sure that forked workers, which inherit the app's logging patches,
+    forward their logs to the parent rather than capturing them themselves
+    """
+    ctx = multiprocessing.get_context("fork")
+    with reset_logging():
+        logging.getLogger("named").addHandler(logging.NullHandler())
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=10)
+        with multiprocess.ProcessCollector(app, context=ctx) as collector:
+            with ProcessPoolExecutor(
+                max_workers=2,
+                mp_context=ctx,
+                initializer=multiprocess.init_worker,
+                initargs=(collector.queue,),
+            ) as pool:
+                assert sorted(pool.map(_worker_task, range(4))) == list(range(4))
+                states = list(pool.map(_logging_state_task, range(2)))
+        assert states == [(["_ForwardingHandler"], False, True, [])] * 2
+        log_text = app.log_buffer.getvalue()
+        assert all(f"log from task {i}" in log_text for i in range(4))
+        app.close()
+
+
+def test_worker_batching():
+    """Make sure that worker messages are sent in batches"""
+    sent = queue.Queue()
+    with reset_logging():
+        multiprocess.init_worker(sent, batch_size=10, flush_interval=1000)
+        log = logging.getLogger("batched")
+        for i in range(25):
+            log.warning("message %d", i)
+        assert sent.qsize() == 2
+        multiprocess.add("content")
+        multiprocess.flush()
+        batches = [sent.get_nowait() for _ in range(3)]
+        assert [len(batch) for batch in batches] == [10, 10, 6]
+        assert batches[0][0][1]["msg"] == "message 0"
+        assert batches[-1][-1] == ("content", "content")
+        multiprocess._SENDER.close()
+        multiprocess._SENDER = None
+
+
+def test_collector_level_filtering():
+    """Make sure that records below the parent's logger level are ignored"""
+    with reset_logging():
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream)
+        collector = multiprocess.ProcessCollector(app)
+        info = logging.makeLogRecord(
+            {"name": "foo", "levelno": logging.INFO, "msg": "hidden"}
+        )
+        warn = logging.makeLogRecord(
+            {"name": "foo", "levelno": logging.WARNING, "msg": "shown"}
+        )
+        collector._handle_batch([("log", info.__dict__), ("log", warn.__dict__)])
+        assert "shown" in app.log_buffer.getvalue()
+        assert "hidden" not in app.log_buffer.getvalue()
+
+
+def test_add_without_init():
+    """Make sure that sending before init_worker raises"""
+    with pytest.raises(RuntimeError):
+        multiprocess.add("content")
+
+
+def test_shared_counters():
+    """Make sure that counters attached by name share the same values"""
+    with multiprocess.SharedCounters(3) as counters:
+        assert counters.values() == [0, 0, 0]
+        counters.add(1, 5)
+        attached = pickle.loads(pickle.dumps(counters))
+        assert not attached.owner
+        assert attached.name == counters.name
+        attached.add(2)
+        assert counters.values() == [0, 5, 1]
+        assert attached.get(1) == 5
+        assert counters[2] == 1
+        attached.close()
+        attached.close()
+        assert len(counters) == 3
+    with pytest.raises(FileNotFoundError):
+        multiprocess.SharedCounters(3, name=counters.name, create=False)
+
+
+def test_shared_counters_invalid_size():
+    """Make sure that counters must have at least one slot"""
+    with pytest.raises(ValueError):
+        multiprocess.SharedCounters(0)
+
+
+def test_shared_counters_process_pool():
+    """Make sure that pool workers can report progress through shared counters
+    and that the parent can show it in a ProgressGroup
+    """
+    ctx = multiprocessing.get_context("spawn")
+    group = ProgressGroup()
+    with multiprocess.SharedCounters(4) as counters:
+        for slot in range(4):
+            group.add_task(
+                f"task {slot}", total=100, counter=partial(counters.get, slot)
+            )
+        with ProcessPoolExecutor(max_workers=2, mp_context=ctx) as pool:
+            futures = [
+                pool.submit(_counter_task, counters, slot, 25 * (slot + 1))
+                for slot in range(4)
+            ]
+            assert [future.result() for future in futures] == list(range(4))
+        assert counters.values() == [25, 50, 75, 100]
+        lines = group.render(80, 10)
+    assert "[3 active, 1 done]" in lines[-1]
+    assert lines[0].split()[3:5] == ["25%", "25/100"]
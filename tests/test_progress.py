@@ -0,0 +1,174 @@
+"""
+Tests for progress tracking
+"""
+
+# Standard
+from unittest import mock
+import threading
+
+# Third Party
+import pytest
+
+from tests.conftest import ResettableStringIO
+
+# Local
+from scriptit import RefreshPrinter, progress, track
+from scriptit.progress import ProgressGroup
+
+
+def test_advance_from_threads():
+    """Make sure that concurrent advances from many threads are all counted"""
+    group = ProgressGroup()
+    task = group.add_task("task", total=8000)
+
+    def worker():
+        for _ in range(1000):
+            task.advance()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert task.completed == 8000
+
+
+def test_top_k_most_recent():
+    """Make sure that only the most recently active tasks are shown, in the
+    order they were added, followed by the summary
+    """
+    group = ProgressGroup(top_k=2)
+    tasks = [group.add_task(f"task-{i}", total=10) for i in range(5)]
+    with mock.patch("time.monotonic", return_value=1.0):
+        group.render(80, 10)
+    tasks[3].advance()
+    tasks[1].advance()
+    with mock.patch("time.monotonic", return_value=2.0):
+        lines = group.render(80, 10)
+    assert len(lines) == 3
+    assert lines[0].startswith("task-1 ")
+    assert lines[1].startswith("task-3 ")
+    assert lines[2].startswith("total ")
+    assert "[5 active, 0 done]" in lines[2]
+    assert all(len(line) <= 80 for line in lines)
+
+    # The height limits the number of tasks shown
+    with mock.patch("time.monotonic", return_value=3.0):
+        assert len(group.render(80, 2)) == 2
+
+
+def test_rate_and_eta():
+    """Make sure that throughput and ETA are computed from the samples"""
+    group = ProgressGroup(sample_window=10)
+    task = group.add_task("task", total=100)
+    with mock.patch("time.monotonic", return_value=0.0):
+        group.render(80, 10)
+    task.advance(20)
+    with mock.patch("time.monotonic", return_value=2.0):
+        lines = group.render(80, 10)
+    assert lines[0].split()[2:] == ["20%", "20/100", "10/s", "ETA", "00:08"]
+
+    # Samples older than the window no longer count
+    task.advance(10)
+    with mock.patch("time.monotonic", return_value=20.0):
+        group.render(80, 10)
+    with mock.patch("time.monotonic", return_value=22.0):
+        lines = group.render(80, 10)
+    assert lines[0].split()[2:] == ["30%", "30/100", "0/s", "ETA", "--:--"]
+
+
+def test_finished_tasks():
+    """Make sure that finished and complete tasks are not shown as active"""
+    group = ProgressGroup()
+    done = group.add_task("done", total=5)
+    done.advance(5)
+    finished = group.add_task("finished")
+    finished.finish()
+    group.add_task("running")
+    lines = group.render(80, 10)
+    assert [line.split()[0] for line in lines] == ["running", "total"]
+    assert "[1 active, 2 done]" in lines[-1]
+
+
+def test_bar_only_rebuilt_on_cell_change():
+    """Make sure that a task's bar is only rebuilt when its number of filled
+    cells changes
+    """
+    group = ProgressGroup(top_k=1)
+    task = group.add_task("task", total=1000)
+    with mock.patch.object(
+        progress, "progress_bar", wraps=progress.progress_bar
+    ) as bar_mock:
+        group.render(80, 10)
+        n_calls = bar_mock.call_count
+        task.advance(1)
+        group.render(80, 10)
+        assert bar_mock.call_count == n_calls
+        task.advance(500)
+        group.render(80, 10)
+        assert bar_mock.call_count > n_calls
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"top_k": -1}, {"done_char": "=="}, {"head_char": ""}]
+)
+def test_invalid_args(kwargs):
+    """Make sure that invalid arguments are rejected"""
+    with pytest.raises(ValueError):
+        ProgressGroup(**kwargs)
+
+
+def test_track_with_len():
+    """Make sure that track yields all values and shows the final state"""
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream)
+    assert list(track(range(50), name="loop", printer=printer)) == list(range(50))
+    last_line = stream.getvalue().split("\n")[-2]
+    assert last_line.startswith("loop [")
+    assert "100% 50/50" in last_line
+
+
+def test_track_without_len():
+    """Make sure that iterables without a length are tracked by count"""
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream)
+    values = (i for i in range(20))
+    assert sum(track(values, name="gen", printer=printer)) == sum(range(20))
+    last_line = stream.getvalue().split("\n")[-2]
+    assert last_line.split()[:2] == ["gen", "20"]
+    assert "[" not in last_line
+
+
+def test_track_adaptive_clock_checks():
+    """Make sure that the clock is read far less often than once per iteration"""
+    printer = RefreshPrinter(write_stream=ResettableStringIO())
+    with mock.patch("time.perf_counter", wraps=progress.time.perf_counter) as clock:
+        for _ in track(range(100000), printer=printer):
+            pass
+    assert clock.call_count < 1000
+
+
+def test_track_nested():
+    """Make sure that nested loops share the outer loop's printer and are shown
+    indented below it
+    """
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream, diff=True)
+    for _ in track(range(2), name="outer", printer=printer, refresh_interval=0):
+        for _ in track(iter(range(5)), name="inner"):
+            pass
+    output = stream.getvalue()
+    assert "outer [" in output
+    assert "  inner 5 " in output
+    assert progress._TRACK_LOCAL.display is None
+
+
+def test_track_break():
+    """Make sure that breaking out of a tracked loop cleans up the display"""
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream)
+    for i in track(range(10), printer=printer):
+        if i == 3:
+            break
+    assert progress._TRACK_LOCAL.display is None
+    assert "3/10" in stream.getvalue().split("\n")[-2]
@@ -3,11 +3,14 @@ Tests for RefreshPrinter
 """
 # Standard
 from unittest import mock
+import os
+import threading
+import time
 
 # Third Party
 import pytest
 
-from tests.conftest import ResettableStringIO
+from tests.conftest import FakeScreen, ResettableStringIO
 
 # Local
 from scriptit import RefreshPrinter
@@ -90,3 +93,250 @@ def test_clear_last_report_chars():
     assert len(printed_lines) == 3  # Clear, 1 new, final \n
     assert printed_lines[0].count(RefreshPrinter.UP_LINE) == 2
     assert printed_lines[1].strip() == "two"
+
+
+def _diff_frames(frames):
+    """Render a sequence of frames with a diff printer, returning the screen
+    and the output written for each frame
+    """
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream, diff=True)
+    screen = FakeScreen()
+    outputs = []
+    for frame in frames:
+        for line in frame:
+            printer.add(line)
+        printer.refresh()
+        outputs.append(stream.getvalue())
+        screen.write(stream.getvalue())
+        stream.reset()
+        assert screen.lines[:-1] == frame
+        assert screen.row == len(frame)
+    return screen, outputs
+
+
+def test_refresh_printer_diff_unchanged_lines():
+    """Make sure that only the changed lines are rewritten in diff mode"""
+    _, outputs = _diff_frames(
+        [
+            ["Status", "iteration: 1", "footer"],
+            ["Status", "iteration: 2", "footer"],
+            ["Status", "iteration: 2", "footer"],
+        ]
+    )
+    assert outputs[0] == "Status\niteration: 1\nfooter\n"
+    assert "Status" not in outputs[1]
+    assert "footer" not in outputs[1]
+    assert "iteration: 2" in outputs[1]
+    assert RefreshPrinter.UP_LINE not in outputs[1]
+    assert "iteration" not in outputs[2]
+
+
+def test_refresh_printer_diff_shorter_lines():
+    """Make sure that lines that get shorter have their tails cleared"""
+    _, outputs = _diff_frames([["Line one", "x"], ["two", "x"], ["three", "x"]])
+    assert RefreshPrinter.CLEAR_LINE_END in outputs[1]
+    assert RefreshPrinter.CLEAR_LINE_END not in outputs[2]
+
+
+@pytest.mark.parametrize(
+    "frames",
+    [
+        [["a", "b", "c", "d"], ["a", "B"], ["A"], []],
+        [["a"], ["a", "b", "c"], ["x", "b", "c", "d"]],
+        [["a", "b", "c"], ["a", "b"], ["a", "b", "c", "d"]],
+    ],
+)
+def test_refresh_printer_diff_resize(frames):
+    """Make sure that reports can grow and shrink in diff mode"""
+    _diff_frames(frames)
+
+
+def test_refresh_printer_diff_mute():
+    """Make sure that nothing is written in diff mode when muted"""
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream, diff=True, mute=True)
+    for _ in range(2):
+        printer.add("Line")
+        printer.refresh()
+    assert not stream.getvalue()
+
+
+class CountingStringIO(ResettableStringIO):
+    """Stream that counts calls to write and flush"""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.flushes = 0
+
+    def write(self, *args, **kwargs):
+        self.writes += 1
+        return super().write(*args, **kwargs)
+
+    def flush(self):
+        self.flushes += 1
+        return super().flush()
+
+
+@pytest.mark.parametrize("diff", [True, False])
+def test_refresh_printer_one_write_per_frame(diff):
+    """Make sure that each frame is sent with exactly one write and flush,
+    regardless of the number of lines in the frame
+    """
+    stream = CountingStringIO()
+    printer = RefreshPrinter(write_stream=stream, diff=diff)
+    n_frames = 10
+    for frame in range(n_frames):
+        for line in range(50):
+            printer.add(f"Line {line}: {frame}")
+        printer.refresh()
+    assert stream.writes == n_frames
+    assert stream.flushes == n_frames
+
+
+def test_refresh_printer_sync_output():
+    """Make sure that synchronized output wraps each frame"""
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream, sync_output=True)
+    printer.add("Line one")
+    printer.refresh()
+    output = stream.getvalue()
+    assert output.startswith(RefreshPrinter.SYNC_START)
+    assert output.endswith(RefreshPrinter.SYNC_END)
+    assert output.count(RefreshPrinter.SYNC_START) == 1
+
+
+def test_refresh_printer_lazy_content():
+    """Make sure that callables and generators are evaluated only when a frame
+    is written
+    """
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream, refresh_rate=2)
+    thunk = mock.MagicMock(return_value="from thunk")
+
+    def lines():
+        yield "gen one"
+        yield "gen two"
+
+    printer.add(thunk)
+    printer.add(lines())
+    printer.refresh()
+    assert thunk.call_count == 1
+    assert stream.getvalue() == "from thunk\ngen one\ngen two\n"
+
+    # The second refresh is skipped, so nothing is evaluated
+    printer.add(thunk)
+    printer.refresh()
+    assert thunk.call_count == 1
+    assert printer.current_report == []
+
+
+def test_refresh_printer_append_only():
+    """Make sure that append-only frames only contain new lines and no cursor
+    control
+    """
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream, append_only=True, sync_output=True)
+    printer.add("header")
+    printer.add("x" * 200)
+    printer.refresh()
+    assert stream.getvalue() == "header\n" + "x" * 200 + "\n"
+    stream.reset()
+    for line in ["header", "a", "a", "x" * 200]:
+        printer.add(line)
+    printer.refresh()
+    assert stream.getvalue() == "a\na\n"
+    stream.reset()
+    printer.emit(["log line"])
+    printer.add("header")
+    printer.add("a")
+    printer.refresh()
+    assert stream.getvalue() == "log line\n"
+
+
+def test_refresh_printer_append_only_detection():
+    """Make sure that append-only mode is enabled for non-terminal file
+    descriptors but not for in-memory streams
+    """
+    assert not RefreshPrinter(write_stream=ResettableStringIO()).append_only
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(read_fd) as _, os.fdopen(write_fd, "w") as pipe:
+        assert RefreshPrinter(write_stream=pipe).append_only
+        assert not RefreshPrinter(write_stream=pipe, append_only=False).append_only
+
+
+class SlowStream(ResettableStringIO):
+    """Stream whose writes take a fixed amount of time"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text):
+        time.sleep(self.delay)
+        self.writes += 1
+        return super().write(text)
+
+
+@pytest.mark.parametrize("diff", [True, False])
+def test_refresh_printer_adaptive_skips_frames(diff):
+    """Make sure that an adaptive printer skips frames when writes are slow and
+    still ends on the latest frame
+    """
+    stream = SlowStream(0.02)
+    printer = RefreshPrinter(write_stream=stream, diff=diff, adaptive=True)
+    start = time.monotonic()
+    for i in range(30):
+        printer.add("header")
+        printer.add(f"frame {i}")
+        printer.refresh()
+    elapsed = time.monotonic() - start
+    printer.flush_pending()
+    assert printer.skipped > 0
+    assert stream.writes < 30
+    assert elapsed < 30 * 0.02
+    assert printer.write_latency >= 0.02
+    screen = FakeScreen()
+    screen.write(stream.getvalue())
+    assert [line for line in screen.lines if line] == ["header", "frame 29"]
+
+
+def test_refresh_printer_adaptive_does_not_wait_for_other_writer():
+    """Make sure that a refresh while another thread is writing returns without
+    waiting and that its frame is written once the other write finishes
+    """
+    writing = threading.Event()
+    release = threading.Event()
+
+    class BlockingStream(ResettableStringIO):
+        def write(self, text):
+            if not writing.is_set():
+                writing.set()
+                assert release.wait(5)
+            return super().write(text)
+
+    stream = BlockingStream()
+    printer = RefreshPrinter(write_stream=stream, adaptive=True)
+    printer.add("first")
+    writer = threading.Thread(target=printer.refresh)
+    writer.start()
+    assert writing.wait(5)
+
+    printer.add("second")
+    start = time.monotonic()
+    printer.refresh()
+    assert time.monotonic() - start < 1
+    assert "second" not in stream.getvalue()
+
+    release.set()
+    writer.join(5)
+    for _ in range(100):
+        if "second" in stream.getvalue():
+            break
+        time.sleep(0.01)
+    screen = FakeScreen()
+    screen.write(stream.getvalue())
+    assert [line for line in screen.lines if line] == ["second"]
+    printer.flush_pending()
@@ -0,0 +1,130 @@
+"""
+Tests for recording and replay
+"""
+
+# Standard
+from unittest import mock
+import io
+import json
+import os
+import tempfile
+
+# Third Party
+import pytest
+
+from tests.conftest import FakeScreen, ResettableStringIO
+from tests.test_app import reset_logging
+
+# Local
+from scriptit import RefreshPrinter, TerminalApp
+from scriptit.replay import Recording, main
+
+
+def _record(frames, **kwargs):
+    """Record the given frames at one frame per second and return the recording
+    along with the screen after each frame
+    """
+    clock = [0.0]
+    stream = ResettableStringIO()
+    record = io.StringIO()
+    screens = []
+    with mock.patch("time.monotonic", lambda: clock[0]):
+        printer = RefreshPrinter(write_stream=stream, record=record, **kwargs)
+        for frame in frames:
+            for line in frame:
+                printer.add(line)
+            printer.refresh()
+            screen = FakeScreen()
+            screen.write(stream.getvalue())
+            screens.append([line for line in screen.lines if line])
+            clock[0] += 1
+    record.seek(0)
+    return Recording.load(record), screens
+
+
+def _screen(text):
+    screen = FakeScreen()
+    screen.write(text)
+    return [line for line in screen.lines if line]
+
+
+FRAMES = [[f"header {i % 3}", f"line {i}"] + ["tail"] * (i % 4) for i in range(20)]
+
+
+@pytest.mark.parametrize("diff", [True, False])
+def test_record_and_play(diff):
+    """Make sure that playing a recording reproduces the printer's output"""
+    recording, screens = _record(FRAMES, diff=diff, keyframe_interval=5)
+    assert recording.header["version"] == 2
+    assert len(recording.keyframes) == 4
+    assert recording.duration == 19
+    out = ResettableStringIO()
+    with mock.patch("time.sleep"):
+        recording.play(out)
+    assert _screen(out.getvalue()) == screens[-1]
+
+
+@pytest.mark.parametrize("diff", [True, False])
+def test_seek(diff):
+    """Make sure that seeking from a keyframe shows the same screen as playing
+    from the start
+    """
+    recording, screens = _record(FRAMES, diff=diff, keyframe_interval=5)
+    for position in [0, 3, 5, 7.5, 12, 19, 100]:
+        text, _ = recording.seek(position)
+        assert _screen(text) == screens[min(int(position), 19)]
+
+
+def test_seek_uses_keyframes():
+    """Make sure that seeking only writes the events since the last keyframe"""
+    recording, _ = _record(FRAMES, diff=True, keyframe_interval=5)
+    text, next_idx = recording.seek(12)
+    assert "line 9" not in text
+    assert "line 10" in text
+    assert recording.events[next_idx][0] > 12
+
+
+def test_play_timing():
+    """Make sure that playback waits between events according to the speed and
+    the maximum wait
+    """
+    recording, _ = _record([["a"], ["b"], ["c"]], diff=True)
+    recording.events.insert(2, (10.0, "m", "marker"))
+    recording.events[-1] = (11.0, "o", recording.events[-1][2])
+    with mock.patch("time.sleep") as sleep_mock:
+        recording.play(ResettableStringIO(), speed=2, max_wait=3)
+    assert [call.args[0] for call in sleep_mock.call_args_list] == [0.5, 3]
+    with pytest.raises(ValueError):
+        recording.play(ResettableStringIO(), speed=0)
+
+
+def test_app_recording():
+    """Make sure that an app records its frames to a file that is closed with
+    the app and can be replayed from the command line
+    """
+    with tempfile.TemporaryDirectory() as workdir, reset_logging() as log:
+        path = os.path.join(workdir, "session.cast")
+        stream = ResettableStringIO()
+        with TerminalApp(write_stream=stream, record=path, diff=True) as app:
+            log.warning("hello")
+            app.add("content")
+            app.refresh()
+        assert app.printer.recorder.stream is None
+        with open(path) as handle:
+            events = [json.loads(line) for line in handle]
+        assert events[0]["version"] == 2
+        assert events[1] == [mock.ANY, "m", mock.ANY]
+        assert all(event[1] in "om" for event in events[1:])
+
+        out = ResettableStringIO()
+        with mock.patch("sys.stdout", out), mock.patch("time.sleep"):
+            main([path, "--speed", "2"])
+        assert _screen(out.getvalue()) == _screen(stream.getvalue())
+
+
+def test_invalid_recording():
+    """Make sure that recordings in other formats are rejected"""
+    with pytest.raises(ValueError):
+        Recording.load(io.StringIO(json.dumps({"version": 1}) + "\n"))
+    with pytest.raises(ValueError):
+        RefreshPrinter(record=io.StringIO(), keyframe_interval=0)
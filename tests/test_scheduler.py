@@ -0,0 +1,114 @@
+"""
+Tests for FrameScheduler
+"""
+
+# Standard
+from unittest import mock
+import threading
+import time
+
+# Third Party
+import pytest
+
+# Local
+from scriptit.scheduler import FrameScheduler
+
+
+def test_scheduler_coalesces_frames():
+    """Make sure that a burst of requests results in a small number of frames"""
+    frames = []
+    sched = FrameScheduler(lambda: frames.append(time.monotonic()), max_fps=10)
+    try:
+        for _ in range(10000):
+            sched.mark_dirty()
+        time.sleep(0.05)
+        assert 1 <= len(frames) <= 2
+    finally:
+        sched.stop()
+    assert not sched.running
+
+
+def test_scheduler_rate_limited():
+    """Make sure that frames are not rendered faster than max_fps"""
+    frames = []
+    sched = FrameScheduler(lambda: frames.append(time.monotonic()), max_fps=20)
+    try:
+        end = time.monotonic() + 0.3
+        while time.monotonic() < end:
+            sched.mark_dirty()
+            time.sleep(0.001)
+    finally:
+        sched.stop()
+    deltas = [b - a for a, b in zip(frames, frames[1:])]
+    assert deltas
+    assert min(deltas) >= 0.04
+
+
+def test_scheduler_final_flush():
+    """Make sure that a pending frame is rendered when the scheduler stops"""
+    frames = []
+    sched = FrameScheduler(lambda: frames.append(1), max_fps=0.5)
+    sched.mark_dirty()
+    time.sleep(0.01)
+    n_frames = len(frames)
+    sched.mark_dirty()
+    sched.stop()
+    assert len(frames) == n_frames + 1
+
+    # Stopping again is a no-op
+    sched.stop()
+    assert len(frames) == n_frames + 1
+
+
+def test_scheduler_flush():
+    """Make sure that flush renders synchronously only when pending"""
+    calls = []
+    sched = FrameScheduler(lambda: calls.append(threading.get_ident()), max_fps=0.5)
+    try:
+        sched.mark_dirty()
+        time.sleep(0.01)
+        calls.clear()
+        sched.flush()
+        assert not calls
+        sched.mark_dirty()
+        sched.flush()
+        assert calls == [threading.get_ident()]
+    finally:
+        sched.stop()
+
+
+def test_scheduler_invalid_fps():
+    """Make sure that a non-positive max_fps is rejected"""
+    with pytest.raises(ValueError):
+        FrameScheduler(lambda: None, max_fps=0)
+
+
+def test_scheduler_render_error():
+    """Make sure that an exception from a background render is reported and
+    later frames are still rendered
+    """
+    frames = []
+    rendered = threading.Event()
+
+    def render():
+        frames.append(1)
+        if len(frames) == 1:
+            raise ValueError("bad frame")
+        rendered.set()
+
+    with mock.patch("threading.excepthook") as excepthook_mock:
+        sched = FrameScheduler(render, max_fps=100)
+        try:
+            sched.mark_dirty()
+            for _ in range(500):
+                if excepthook_mock.called:
+                    break
+                time.sleep(0.01)
+            sched.mark_dirty()
+            assert rendered.wait(5)
+        finally:
+            sched.stop()
+    assert excepthook_mock.call_count == 1
+    args = excepthook_mock.call_args.args[0]
+    assert args.exc_type is ValueError
+    assert args.thread is sched._thread
@@ -2,13 +2,16 @@
 Tests for the shape module
 """
 # Standard
+from itertools import islice
+import random
 import re
+import string
 
 # Third Party
 import pytest
 
 # Local
-from scriptit import shape
+from scriptit import color, shape
 
 
 def test_progress_bar():
@@ -165,3 +168,118 @@ def test_table_invalid(columns, kwargs):
     """Make sure all invalid kwarg options raise ValueError"""
     with pytest.raises(ValueError):
         shape.table(columns, **kwargs)
+
+
+def _legacy_word_wrap_to_len(line, max_len):
+    """Reference copy of the original quadratic word wrapping implementation"""
+    if (line_len := color.printed_len(line)) <= max_len:
+        return [line], line_len
+    longest = 0
+    sublines = []
+    words = line.split(" ")
+    while len(words):
+        subline = ""
+        while len(words):
+            if color.printed_len(subline) + color.printed_len(words[0]) <= max_len:
+                subline += words[0] + " "
+                words = words[1:]
+            elif color.printed_len(words[0]) > max_len:
+                cutoff = max_len - color.printed_len(subline) - 1
+                if cutoff <= 0:
+                    break
+                subline += words[0][:cutoff] + "- "
+                words[0] = words[0][cutoff:]
+            else:
+                break
+        subline = subline[:-1]
+        longest = max(longest, color.printed_len(subline))
+        sublines.append(subline)
+    return sublines, longest
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("max_len", [2, 3, 7, 20, 80])
+def test_word_wrap_matches_reference(seed, max_len):
+    """Make sure that the linear word wrapper produces identical output to the
+    original implementation, including hyphen splitting and colored words
+    """
+    rand = random.Random(seed)
+    words = []
+    for _ in range(rand.randint(1, 60)):
+        word = "".join(
+            rand.choice(string.ascii_letters) for _ in range(rand.randint(0, 30))
+        )
+        if word and rand.random() < 0.2:
+            word = color.colorize(word, rand.choice(list(color.Colors)))
+        words.append(word)
+    line = " ".join(words)
+    assert shape._word_wrap_to_len(line, max_len) == _legacy_word_wrap_to_len(
+        line, max_len
+    )
+
+
+def test_word_wrap_lazy():
+    """Make sure that wrapping can be consumed lazily"""
+    wrapped = shape._iter_word_wrap("word " * 1000, 10)
+    assert next(wrapped) == ("word word", 9)
+
+
+def test_word_wrap_too_narrow():
+    """Make sure that wrapping to an unusable width raises"""
+    with pytest.raises(ValueError):
+        shape._word_wrap_to_len("abc", 1)
+
+
+def test_table_single_row():
+    """Make sure that a table with only a header row is closed"""
+    table_lines = shape.table([["Name"], ["Value"]]).strip().split("\n")
+    assert table_lines[-1] == table_lines[0]
+    assert table_lines[-1].startswith("+")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{}, {"header": False}, {"row_dividers": False}, {"max_width": 20}],
+)
+def test_table_stream_matches_table(kwargs):
+    """Make sure that streaming with the same widths produces the same output
+    as the full table
+    """
+    columns = [
+        ["First", "Gabe", "Me", "Someone with a long name"],
+        ["Last", "Goodhart", "You", "X"],
+    ]
+    widths = [max(len(x) for x in column) for column in columns]
+    lines = shape.table_stream(zip(*columns), widths=widths, **kwargs)
+    assert "".join(line + "\n" for line in lines) == shape.table(columns, **kwargs)
+
+
+def test_table_stream_sampled_widths():
+    """Make sure that widths can be estimated from a sample of the rows and
+    that rows are consumed lazily
+    """
+    consumed = []
+
+    def rows():
+        yield ["Index", "Square"]
+        for i in range(100000):
+            consumed.append(i)
+            yield [i, i * i]
+
+    lines = shape.table_stream(rows(), sample_size=10, max_width=40)
+    assert len(consumed) == 9
+    first_lines = list(islice(lines, 30))
+    assert len(consumed) < 20
+    assert first_lines[0].startswith("+")
+    assert set(first_lines[2][1:-1]) == {"="}
+    assert first_lines[3].startswith("| 0 ")
+    assert all(len(line) == len(first_lines[0]) for line in first_lines)
+    assert first_lines[-1].startswith("| 13 ")
+
+
+def test_table_stream_errors():
+    """Make sure that invalid streamed tables raise ValueError"""
+    with pytest.raises(ValueError):
+        shape.table_stream([["a", "b"]], hframe_char="--")
+    with pytest.raises(ValueError):
+        list(shape.table_stream([["abc", "def"], ["abc"]]))
@@ -0,0 +1,142 @@
+"""
+Tests for render statistics
+"""
+
+# Standard
+import threading
+
+# Third Party
+import pytest
+
+from tests.conftest import ResettableStringIO
+from tests.test_app import reset_logging
+
+# Local
+from scriptit import RefreshPrinter, TerminalApp
+from scriptit.stats import FrameStats, RenderStats
+
+
+def _frame(**kwargs):
+    values = dict(
+        time=0.0,
+        render_time=0.0,
+        wrap_time=0.0,
+        write_time=0.0,
+        bytes_written=0,
+        lines_changed=0,
+        skipped=0,
+        log_records=0,
+    )
+    values.update(kwargs)
+    return FrameStats(**values)
+
+
+def test_printer_stats():
+    """Make sure that the printer records each written frame and counts the
+    frames skipped by refresh_rate
+    """
+    frames = []
+    stats = RenderStats(hook=frames.append)
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(
+        write_stream=stream, refresh_rate=2, diff=True, stats=stats
+    )
+    for i in range(5):
+        printer.add("header")
+        printer.add(f"line {i}")
+        if i == 4:
+            printer.add("é")
+        printer.refresh()
+    assert stats.n_frames == len(frames) == 3
+    assert list(stats.frames) == frames
+    assert stats.skipped == 2
+    assert [frame.skipped for frame in frames] == [0, 1, 1]
+    assert [frame.lines_changed for frame in frames] == [2, 1, 2]
+    assert sum(frame.bytes_written for frame in frames) == len(
+        stream.getvalue().encode("utf-8")
+    )
+    for frame in frames:
+        assert frame.render_time >= frame.wrap_time + frame.write_time
+        assert frame.write_time > 0
+
+
+def test_percentiles_and_summary():
+    """Make sure that percentiles are computed over the rolling window"""
+    stats = RenderStats(window=100)
+    assert stats.percentile("render_time", 0.5) is None
+    assert stats.log_rate() == 0
+    assert stats.footer(80) == "frames 0 | skipped 0"
+    for i in range(200):
+        stats.frames.append(
+            _frame(time=i / 10, render_time=i / 1000, log_records=i * 3)
+        )
+    assert stats.percentile("render_time", 0) == 0.1
+    assert stats.percentile("render_time", 0.5) == 0.15
+    assert stats.percentile("render_time", 0.99) == 0.199
+    assert stats.percentile("render_time", 1) == 0.199
+    assert stats.log_rate() == pytest.approx(30)
+    summary = stats.summary()
+    assert summary["render_time"] == {
+        "p50": 0.15,
+        "p90": 0.19,
+        "p99": 0.199,
+        "max": 0.199,
+    }
+    assert summary["totals"]["log_rate"] == pytest.approx(30)
+    footer = stats.footer(200)
+    assert footer.startswith("frame p50 150.0ms p99 199.0ms")
+    assert footer.endswith("30 logs/s")
+    assert len(stats.footer(20)) == 20
+
+
+def test_invalid_args():
+    """Make sure that invalid arguments are rejected"""
+    with pytest.raises(ValueError):
+        RenderStats(window=0)
+    with pytest.raises(ValueError):
+        RenderStats().percentile("skipped", 0.5)
+
+
+def test_app_stats_footer():
+    """Make sure that the app counts log records, measures the whole draw and
+    shows the footer below the content
+    """
+    with reset_logging() as log:
+        stream = ResettableStringIO()
+        app = TerminalApp(write_stream=stream, log_console_size=4, stats_footer=True)
+        assert app.printer.stats is app.stats
+        log.warning("hello")
+        log.warning("world")
+        app.add("content")
+        app.refresh()
+        assert app.stats.log_records == 2
+        assert app.stats.n_frames == 3
+        lines = stream.getvalue().split("\n")
+        assert lines[-3].strip() == "content"
+        assert lines[-2].startswith("frame p50 ")
+        assert "skipped 0" in lines[-2]
+
+
+def test_app_without_stats():
+    """Make sure that no stats are recorded unless requested"""
+    with reset_logging() as log:
+        app = TerminalApp(write_stream=ResettableStringIO())
+        log.warning("hello")
+        assert app.stats is None
+        assert app.printer.stats is None
+
+
+def test_count_log_records_from_threads():
+    """Make sure that log records counted on several threads are not lost"""
+    stats = RenderStats()
+
+    def count():
+        for _ in range(1000):
+            stats.count_log_record()
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stats.log_records == 4000
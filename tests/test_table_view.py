@@ -0,0 +1,82 @@
+"""
+Tests for TableView
+"""
+
+# Third Party
+import pytest
+
+from tests.conftest import ResettableStringIO
+
+# Local
+from scriptit import RefreshPrinter, TableView, shape
+
+
+def test_table_view_matches_table():
+    """Make sure that a view with room for all rows renders like shape.table"""
+    header = ["First", "Last"]
+    rows = [["Gabe", "Goodhart"], ["Me", "You"]]
+    view = TableView(header, rows)
+    columns = [list(col) for col in zip(header, *rows)]
+    assert "\n".join(view.render(80, 100)) + "\n" == shape.table(columns, max_width=80)
+
+
+def test_table_view_follow_tail():
+    """Make sure that following the tail only shows the most recent rows"""
+    view = TableView(["Index", "Value"], row_dividers=False)
+    view.extend([i, f"value {i}"] for i in range(100000))
+    lines = view.render(40, 10)
+    assert len(lines) == 10
+    assert lines[1].startswith("| Index")
+    assert set(lines[2][1:-1]) == {"="}
+    assert lines[-2].startswith("| 99999")
+    assert lines[3].startswith("| 99994")
+    assert lines[-1] == lines[0]
+
+
+def test_table_view_scroll():
+    """Make sure that scrolling shows the rows at the offset"""
+    view = TableView(["Index", "Value"])
+    view.extend([i, f"value {i}"] for i in range(1000))
+    view.scroll_to(10)
+    assert not view.follow_tail
+    lines = view.render(40, 10)
+    assert len(lines) == 10
+    assert lines[3].startswith("| 10 ")
+    assert lines[5].startswith("| 11 ")
+    view.scroll(-20)
+    assert view.offset == 0
+    view.scroll(5000)
+    assert view.offset == 999
+
+
+def test_table_view_small_viewport():
+    """Make sure that the view never renders more lines than the viewport"""
+    view = TableView(["A", "B"], [["aa", "bb"]])
+    assert len(view.render(20, 2)) == 2
+    assert len(view.render(20, 0)) == 0
+
+
+def test_table_view_no_header_divider():
+    """Make sure that the header divider can be disabled"""
+    view = TableView(["AA", "BB"], [["aa", "bb"]], header_divider=False)
+    assert not any("=" in line for line in view.render(20, 10))
+    view.row_dividers = False
+    assert len(view.render(20, 10)) == 4
+
+
+def test_table_view_invalid_row():
+    """Make sure that rows with the wrong number of entries are rejected"""
+    view = TableView(["A", "B"])
+    with pytest.raises(ValueError):
+        view.append(["a"])
+
+
+def test_table_view_printer():
+    """Make sure that a view can be added to a printer"""
+    stream = ResettableStringIO()
+    printer = RefreshPrinter(write_stream=stream)
+    view = TableView(["Index", "Value"], ([i, i] for i in range(1000)))
+    printer.add(view)
+    printer.refresh()
+    assert "| 999" in stream.getvalue()
+    assert str(view).split("\n")[0].startswith("+")
@@ -0,0 +1,91 @@
+"""
+Tests for the terminal geometry cache
+"""
+
+# Standard
+from unittest import mock
+import os
+import signal
+import threading
+
+# Third Party
+import pytest
+
+# Local
+from scriptit import terminal
+from scriptit.terminal import TerminalGeometry
+
+
+@pytest.fixture
+def restore_sigwinch():
+    """Restore the SIGWINCH handler after the test"""
+    prev = signal.getsignal(signal.SIGWINCH)
+    yield
+    signal.signal(signal.SIGWINCH, prev)
+
+
+def test_geometry_cached_with_signal(restore_sigwinch):
+    """Make sure that the size is cached until a resize signal arrives"""
+    geo = TerminalGeometry(ttl=0)
+    with mock.patch(
+        "shutil.get_terminal_size", return_value=os.terminal_size((80, 24))
+    ) as size_mock:
+        assert geo.get().columns == 80
+        assert geo.get().columns == 80
+        assert size_mock.call_count == 1
+        size_mock.return_value = os.terminal_size((100, 30))
+        assert geo.get().columns == 80
+        os.kill(os.getpid(), signal.SIGWINCH)
+        assert geo.get().columns == 100
+        assert size_mock.call_count == 2
+
+
+def test_geometry_chains_handler(restore_sigwinch):
+    """Make sure that a previously installed handler is still called"""
+    calls = []
+    signal.signal(signal.SIGWINCH, lambda *_: calls.append(1))
+    geo = TerminalGeometry()
+    geo.get()
+    os.kill(os.getpid(), signal.SIGWINCH)
+    assert calls == [1]
+
+
+def test_geometry_ttl_off_main_thread():
+    """Make sure that the cache expires by TTL when signals can't be used"""
+    geo = TerminalGeometry(ttl=0)
+    with mock.patch(
+        "shutil.get_terminal_size", return_value=os.terminal_size((80, 24))
+    ) as size_mock:
+        thread = threading.Thread(target=lambda: [geo.get(), geo.get()])
+        thread.start()
+        thread.join()
+        assert size_mock.call_count == 2
+
+
+def test_geometry_ttl_handler_replaced(restore_sigwinch):
+    """Make sure that the cache falls back to the TTL if another handler
+    replaces the resize handler
+    """
+    geo = TerminalGeometry(ttl=1000)
+    with mock.patch(
+        "shutil.get_terminal_size", return_value=os.terminal_size((80, 24))
+    ) as size_mock:
+        geo.get()
+        signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+        geo.get()
+        assert size_mock.call_count == 1
+        geo.ttl = 0
+        geo.invalidate()
+        geo.get()
+        geo.get()
+        assert size_mock.call_count == 3
+
+
+def test_module_functions():
+    """Make sure the module level helpers use the shared cache"""
+    with mock.patch(
+        "shutil.get_terminal_size", return_value=os.terminal_size((42, 24))
+    ):
+        assert terminal.get_terminal_size().columns == 42
+    terminal.invalidate()
+    assert terminal.get_terminal_size().columns != 42